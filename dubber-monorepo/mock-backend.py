@@ -1,163 +1,289 @@
-"""
-Mock Backend API for Dubber Global Translator
-Provides the same API endpoints as Spring Boot backend, but runs in Python
-"""
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
-from werkzeug.utils import secure_filename
-import os
-import uuid
-import json
-from datetime import datetime
-from pathlib import Path
-import threading
-import time
-
-app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": ["http://localhost:4201", "http://localhost:4200"]}})
-
-# Configuration
-UPLOAD_FOLDER = "uploads"
-ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mkv', 'mov', 'flv', 'webm'}
-MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
-
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# In-memory job store
-jobs_store = {}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_file_size_mb(filepath):
-    return os.path.getsize(filepath) / (1024 * 1024)
-
-def process_job_background(job_id, file_path, source_language, target_language):
-    """Simulate video processing in background"""
-    time.sleep(2)  # Simulate processing
-    jobs_store[job_id]['status'] = 'COMPLETED'
-    jobs_store[job_id]['completedAt'] = datetime.utcnow().isoformat()
-    jobs_store[job_id]['downloadUrl'] = f"/api/v1/job/{job_id}/download"
-
-@app.route('/api/v1/upload', methods=['POST'])
-def upload_file():
-    """Upload a video file for translation"""
-    try:
-        # Check if file is in request
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        source_language = request.form.get('sourceLanguage', 'en')
-        target_language = request.form.get('targetLanguage', 'es')
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Allowed: mp4, avi, mkv, mov, flv, webm'}), 400
-        
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({'error': f'File too large. Max size: 500MB, Got: {file_size/(1024*1024):.1f}MB'}), 413
-        
-        # Save file
-        job_id = str(uuid.uuid4())
-        filename = secure_filename(f"{job_id}_{file.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        
-        # Create job record
-        job = {
-            'id': job_id,
-            'filename': file.filename,
-            'status': 'PROCESSING',
-            'sourceLanguage': source_language,
-            'targetLanguage': target_language,
-            'fileSize': get_file_size_mb(filepath),
-            'uploadedAt': datetime.utcnow().isoformat(),
-            'completedAt': None,
-            'downloadUrl': None
-        }
-        jobs_store[job_id] = job
-        
-        # Start background processing
-        thread = threading.Thread(
-            target=process_job_background,
-            args=(job_id, filepath, source_language, target_language)
-        )
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify(job), 201
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/v1/job/<job_id>', methods=['GET'])
-def get_job_status(job_id):
-    """Get job status"""
-    if job_id not in jobs_store:
-        return jsonify({'error': 'Job not found'}), 404
-    
-    return jsonify(jobs_store[job_id]), 200
-
-@app.route('/api/v1/job/<job_id>/download', methods=['GET'])
-def download_file(job_id):
-    """Download processed file (mock - returns original file)"""
-    if job_id not in jobs_store:
-        return jsonify({'error': 'Job not found'}), 404
-    
-    job = jobs_store[job_id]
-    if job['status'] != 'COMPLETED':
-        return jsonify({'error': 'Job not yet completed'}), 400
-    
-    # For mock, we'll just return a dummy file
-    # In real implementation, this would be the processed video
-    try:
-        file_path = None
-        for file in os.listdir(UPLOAD_FOLDER):
-            if file.startswith(job_id):
-                file_path = os.path.join(UPLOAD_FOLDER, file)
-                break
-        
-        if file_path:
-            return send_file(file_path, as_attachment=True, download_name=job['filename'])
-        else:
-            return jsonify({'error': 'File not found'}), 404
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'dubber-api'}), 200
-
-@app.route('/api/v1', methods=['GET'])
-def api_info():
-    """API information"""
-    return jsonify({
-        'service': 'Dubber Global Translator API',
-        'version': '1.0.0',
-        'mode': 'mock',
-        'endpoints': {
-            'upload': 'POST /api/v1/upload',
-            'job_status': 'GET /api/v1/job/{id}',
-            'download': 'GET /api/v1/job/{id}/download',
-            'health': 'GET /health'
-        }
-    }), 200
-
-if __name__ == '__main__':
-    print("=" * 60)
-    print("🎬 Dubber Mock Backend API")
-    print("=" * 60)
-    print("Starting on http://localhost:8080")
-    print("CORS enabled for: http://localhost:4201, http://localhost:4200")
-    print("Upload folder: ./uploads")
-    print("=" * 60)
-    app.run(host='0.0.0.0', port=8080, debug=False)
+"""
+Mock Backend API for Dubber Global Translator
+Provides the same API endpoints as Spring Boot backend, but runs in Python
+
+Uploaded files are written straight into the upload folder while the request
+body streams in (no spooled copy), and the size limit is enforced as bytes
+arrive. Jobs and their file paths are indexed by job id, in memory or, with
+MOCK_JOBS_DB set, in SQLite so they survive a restart. Downloads support
+Range and conditional (ETag / If-Modified-Since) requests; under a WSGI
+server with wsgi.file_wrapper (e.g. gunicorn) they are sent with sendfile,
+and MOCK_USE_X_SENDFILE=true hands them to a fronting nginx/Apache instead.
+"""
+from flask import Flask, Request, request, jsonify, send_file
+from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+import io
+import os
+import uuid
+import json
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+import threading
+import time
+
+# Configuration
+UPLOAD_FOLDER = "uploads"
+ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mkv', 'mov', 'flv', 'webm'}
+MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+MAX_FORM_OVERHEAD = 1024 * 1024  # multipart headers and form fields on top of the file
+JOBS_DB = os.getenv('MOCK_JOBS_DB', '')  # SQLite file; empty keeps jobs in memory only
+USE_X_SENDFILE = os.getenv('MOCK_USE_X_SENDFILE', 'false').lower() == 'true'
+
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+class UploadStream(io.FileIO):
+    """Partial upload in UPLOAD_FOLDER; refuses to grow past the size limit"""
+
+    def __init__(self, folder, limit):
+        fd, self.path = tempfile.mkstemp(dir=folder, prefix='.upload-', suffix='.part')
+        super().__init__(fd, 'rb+')
+        self.limit = limit
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        if self.written > self.limit:
+            raise RequestEntityTooLarge(f'File too large. Max size: {self.limit // (1024 * 1024)}MB')
+        return super().write(data)
+
+    def save_as(self, path):
+        """Move the finished upload into place (a rename, not a copy)"""
+        self.close()
+        os.replace(self.path, path)
+        self.path = None
+
+    def discard(self):
+        self.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+class UploadRequest(Request):
+    """Streams multipart file parts to disk instead of spooling them to a temp file"""
+    max_content_length = MAX_FILE_SIZE + MAX_FORM_OVERHEAD
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = UploadStream(UPLOAD_FOLDER, MAX_FILE_SIZE)
+        self.__dict__.setdefault('upload_streams', []).append(stream)
+        return stream
+
+    def close(self):
+        # Parts that were never saved (rejected, or the client went away) are removed
+        super().close()
+        for stream in self.__dict__.get('upload_streams', []):
+            stream.discard()
+
+app = Flask(__name__)
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = UploadRequest.max_content_length
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE
+CORS(app, resources={r"/api/*": {"origins": ["http://localhost:4201", "http://localhost:4200"]}})
+
+class JobStore:
+    """Thread-safe jobs by id plus a job id -> upload path index, optionally backed by SQLite"""
+
+    def __init__(self, db_path=''):
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.paths = {}
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL, path TEXT)')
+            self.db.commit()
+            for job_id, data, path in self.db.execute('SELECT id, data, path FROM jobs'):
+                self.jobs[job_id] = json.loads(data)
+                self.paths[job_id] = path
+
+    def _persist(self, job_id):
+        # Caller holds self.lock
+        if self.db is not None:
+            self.db.execute('INSERT OR REPLACE INTO jobs (id, data, path) VALUES (?, ?, ?)',
+                            (job_id, json.dumps(self.jobs[job_id]), self.paths.get(job_id)))
+            self.db.commit()
+
+    def add(self, job, path):
+        with self.lock:
+            self.jobs[job['id']] = dict(job)
+            self.paths[job['id']] = path
+            self._persist(job['id'])
+
+    def get(self, job_id):
+        """A copy of the job, or None"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            if job_id not in self.jobs:
+                return None
+            self.jobs[job_id].update(fields)
+            self._persist(job_id)
+            return dict(self.jobs[job_id])
+
+    def path(self, job_id):
+        with self.lock:
+            return self.paths.get(job_id)
+
+    def with_status(self, status):
+        with self.lock:
+            return [job_id for job_id, job in self.jobs.items() if job['status'] == status]
+
+jobs_store = JobStore(JOBS_DB)
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def get_file_size_mb(filepath):
+    return os.path.getsize(filepath) / (1024 * 1024)
+
+def process_job_background(job_id, file_path, source_language, target_language):
+    """Simulate video processing in background"""
+    time.sleep(2)  # Simulate processing
+    jobs_store.update(
+        job_id,
+        status='COMPLETED',
+        completedAt=datetime.utcnow().isoformat(),
+        downloadUrl=f"/api/v1/job/{job_id}/download"
+    )
+
+def start_processing(job_id, file_path, source_language, target_language):
+    thread = threading.Thread(
+        target=process_job_background,
+        args=(job_id, file_path, source_language, target_language)
+    )
+    thread.daemon = True
+    thread.start()
+
+@app.route('/api/v1/upload', methods=['POST'])
+def upload_file():
+    """Upload a video file for translation"""
+    try:
+        # Reading request.files streams the body to disk; UploadStream enforces MAX_FILE_SIZE
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        source_language = request.form.get('sourceLanguage', 'en')
+        target_language = request.form.get('targetLanguage', 'es')
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type. Allowed: mp4, avi, mkv, mov, flv, webm'}), 400
+        
+        # Save file (already on disk, just moved into place)
+        job_id = str(uuid.uuid4())
+        filename = secure_filename(f"{job_id}_{file.filename}")
+        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        if isinstance(file.stream, UploadStream):
+            file_size = file.stream.written
+            file.stream.save_as(filepath)
+        else:
+            file.save(filepath)
+            file_size = os.path.getsize(filepath)
+        
+        # Create job record
+        job = {
+            'id': job_id,
+            'filename': file.filename,
+            'status': 'PROCESSING',
+            'sourceLanguage': source_language,
+            'targetLanguage': target_language,
+            'fileSize': file_size / (1024 * 1024),
+            'uploadedAt': datetime.utcnow().isoformat(),
+            'completedAt': None,
+            'downloadUrl': None
+        }
+        jobs_store.add(job, filepath)
+        
+        # Start background processing
+        start_processing(job_id, filepath, source_language, target_language)
+        
+        return jsonify(job), 201
+    
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'File too large. Max size: {MAX_FILE_SIZE // (1024 * 1024)}MB'}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/v1/job/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get job status"""
+    job = jobs_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job), 200
+
+@app.route('/api/v1/job/<job_id>/download', methods=['GET'])
+def download_file(job_id):
+    """Download processed file (mock - returns original file)"""
+    job = jobs_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job['status'] != 'COMPLETED':
+        return jsonify({'error': 'Job not yet completed'}), 400
+    
+    # For mock, we'll just return a dummy file
+    # In real implementation, this would be the processed video
+    try:
+        file_path = jobs_store.path(job_id)
+        if not file_path or not os.path.isfile(file_path):
+            return jsonify({'error': 'File not found'}), 404
+        
+        # A path (not an open file) lets the server use sendfile; conditional handles Range/ETag/304
+        return send_file(
+            os.path.abspath(file_path),
+            as_attachment=True,
+            download_name=job['filename'],
+            conditional=True,
+            etag=True
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check endpoint"""
+    return jsonify({'status': 'healthy', 'service': 'dubber-api'}), 200
+
+@app.route('/api/v1', methods=['GET'])
+def api_info():
+    """API information"""
+    return jsonify({
+        'service': 'Dubber Global Translator API',
+        'version': '1.0.0',
+        'mode': 'mock',
+        'endpoints': {
+            'upload': 'POST /api/v1/upload',
+            'job_status': 'GET /api/v1/job/{id}',
+            'download': 'GET /api/v1/job/{id}/download',
+            'health': 'GET /health'
+        }
+    }), 200
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("🎬 Dubber Mock Backend API")
+    print("=" * 60)
+    print("Starting on http://localhost:8080")
+    print("CORS enabled for: http://localhost:4201, http://localhost:4200")
+    print("Upload folder: ./uploads")
+    print(f"Job store: {JOBS_DB or 'in memory'}")
+    print("=" * 60)
+    # Jobs restored from the database that were still processing finish again
+    for job_id in jobs_store.with_status('PROCESSING'):
+        job = jobs_store.get(job_id)
+        start_processing(job_id, jobs_store.path(job_id), job['sourceLanguage'], job['targetLanguage'])
+    app.run(host='0.0.0.0', port=8080, debug=False)
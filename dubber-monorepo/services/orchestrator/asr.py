@@ -0,0 +1,131 @@
+"""
+Chunked, multi-process transcription for long videos.
+
+A single model.transcribe() call decodes the whole file sequentially. For
+long inputs the 16 kHz mono WAV is cut at quiet points into chunks that are
+transcribed in parallel by a pool of worker processes, each holding its own
+model. Chunks overlap slightly so Whisper has context at the edges; a
+segment is kept only by the chunk that owns its midpoint, so nothing at a
+cut is dropped or emitted twice. Segments are yielded in timeline order as
+soon as the chunk they belong to (and every chunk before it) is done.
+
+With a VoiceActivity map (vad.py), each chunk only decodes its speech
+spans and chunks without speech are not sent to a worker at all.
+"""
+import os
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from asr_worker import ASR_CPU_THREADS, transcribe_range, wav_pcm
+from metrics import child_cpu
+
+# Configuration
+ASR_WORKERS = int(os.getenv("ASR_WORKERS", "2"))
+ASR_BEAM_SIZE = int(os.getenv("ASR_BEAM_SIZE", "5"))
+ASR_CHUNK_SECONDS = float(os.getenv("ASR_CHUNK_SECONDS", "300"))
+ASR_MIN_CHUNKED_SECONDS = float(os.getenv("ASR_MIN_CHUNKED_SECONDS", "600"))
+ASR_CHUNK_OVERLAP_SECONDS = float(os.getenv("ASR_CHUNK_OVERLAP_SECONDS", "1.5"))
+ASR_SPLIT_SEARCH_SECONDS = float(os.getenv("ASR_SPLIT_SEARCH_SECONDS", "20"))
+
+ASR_SAMPLE_RATE = 16000
+ENERGY_FRAME_SECONDS = 0.03
+
+Segment = namedtuple("Segment", ["start", "end", "text"])
+
+
+def find_cut_points(pcm, sample_rate, chunk_seconds=ASR_CHUNK_SECONDS, search_seconds=ASR_SPLIT_SEARCH_SECONDS):
+    """Chunk boundaries (seconds) placed at the quietest frame near every chunk_seconds"""
+    total = len(pcm) / sample_rate
+    frame = int(ENERGY_FRAME_SECONDS * sample_rate)
+    cuts = [0.0]
+    nominal = chunk_seconds
+    while nominal < total - chunk_seconds / 2:
+        lo = int(max(cuts[-1] + chunk_seconds / 2, nominal - search_seconds) * sample_rate)
+        hi = int(min(total, nominal + search_seconds) * sample_rate)
+        window = pcm[lo:hi, 0].astype(np.float32)
+        n = len(window) // frame
+        if n == 0:
+            cut = nominal
+        else:
+            energy = np.square(window[:n * frame].reshape(n, frame)).mean(axis=1)
+            cut = (lo + int(np.argmin(energy)) * frame + frame // 2) / sample_rate
+        cuts.append(cut)
+        nominal = cut + chunk_seconds
+    cuts.append(total)
+    return cuts
+
+
+def owned_segments(segments, offset, lo, hi, total):
+    """The (start, end, text) segments a chunk [lo, hi) owns, shifted by offset
+
+    Overlap regions are transcribed by two chunks; the one that owns a
+    segment's midpoint keeps it.
+    """
+    kept = []
+    for start, end, text in segments:
+        start, end = start + offset, min(total, end + offset)
+        midpoint = (start + end) / 2
+        if lo <= midpoint < hi or (hi == total and midpoint >= hi):
+            kept.append((start, end, text))
+    return kept
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def asr_executor(workers=ASR_WORKERS):
+    """Process pool shared by all jobs so worker models stay loaded between jobs"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the orchestrator is multi-threaded, so forking it is unsafe. Workers
+            # only import asr_worker; main.py skips its setup when re-run as __mp_main__
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def should_chunk(duration, workers=ASR_WORKERS):
+    return workers > 1 and duration >= ASR_MIN_CHUNKED_SECONDS
+
+
+def transcribe_chunked(path, model_size, beam_size=ASR_BEAM_SIZE, executor=None, overlap=ASR_CHUNK_OVERLAP_SECONDS,
+                       vad=None):
+    """Yield Segments for the WAV at path, transcribing chunks in parallel (only their speech, given vad)
+
+    The workers' CPU time is added to the consuming thread's metrics.child_cpu().
+    """
+    pcm, sample_rate = wav_pcm(path)
+    cuts = find_cut_points(pcm, sample_rate)
+    total = cuts[-1]
+    del pcm
+    executor = executor or asr_executor()
+    print(f"Transcribing {total:.0f}s of audio in {len(cuts) - 1} chunks")
+
+    futures = []
+    skipped = 0
+    for lo, hi in zip(cuts, cuts[1:]):
+        start = max(0.0, lo - overlap)
+        end = min(total, hi + overlap)
+        clips = vad.speech_clips(lo=start, hi=end) if vad is not None else None
+        if clips == []:
+            skipped += 1
+            continue
+        futures.append((lo, hi, executor.submit(transcribe_range, path, start, end, model_size, beam_size, clips)))
+    if skipped:
+        print(f"Skipped {skipped} chunks without speech")
+
+    cpu = child_cpu()
+    try:
+        for lo, hi, future in futures:
+            segments, seconds = future.result()
+            cpu.add(seconds)
+            for start, end, text in owned_segments(segments, 0.0, lo, hi, total):
+                yield Segment(start, end, text)
+    finally:
+        for _, _, future in futures:
+            future.cancel()
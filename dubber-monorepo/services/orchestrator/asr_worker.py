@@ -0,0 +1,61 @@
+"""
+Entry point of the ASR worker processes (asr.asr_executor).
+
+The pool uses the spawn start method, so each worker imports the module
+of the function it runs. This module only imports numpy and model_pool:
+loading a worker must not open service clients, start threads or touch
+the job queue. model_pool in a worker is that worker's own pool.
+"""
+import os
+import time
+import struct
+
+import numpy as np
+
+from model_pool import model_pool
+
+# Configuration
+ASR_CPU_THREADS = int(os.getenv("ASR_CPU_THREADS", "2"))  # per worker process
+
+
+def wav_pcm(path):
+    """Memory-map the samples of a 16-bit PCM WAV; returns (int16 [frames, channels], sample_rate)"""
+    with open(path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{path} is not a WAV file")
+        channels = sample_rate = bits = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                _, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            elif chunk_id == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+    if bits != 16:
+        raise ValueError(f"{path} is {bits}-bit, expected 16-bit PCM")
+    # ffmpeg writes a placeholder size when streaming; trust the file length instead
+    frames = (os.path.getsize(path) - offset) // (2 * channels)
+    pcm = np.memmap(path, dtype=np.int16, mode="r", offset=offset, shape=(frames, channels))
+    return pcm, sample_rate
+
+
+def transcribe_range(path, start, end, model_size, beam_size, clips=None):
+    """Transcribe [start, end) of the WAV at path; returns (segments, CPU seconds spent decoding)"""
+    pcm, sample_rate = wav_pcm(path)
+    audio = pcm[int(start * sample_rate):int(end * sample_rate)].mean(axis=1).astype(np.float32) / 32768.0
+    model = model_pool.get(model_size, cpu_threads=ASR_CPU_THREADS)
+    cpu0 = time.process_time()  # every thread of this process, CTranslate2's included
+    options = {}
+    if clips is not None:
+        # Speech spans, relative to this range; the silence between them is never decoded
+        options["clip_timestamps"] = [round(t - start, 3) for clip in clips for t in clip]
+    segments, _ = model.transcribe(audio, beam_size=beam_size, **options)
+    segments = [(s.start + start, s.end + start, s.text) for s in segments]
+    return segments, time.process_time() - cpu0
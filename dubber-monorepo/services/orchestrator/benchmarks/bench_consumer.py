@@ -0,0 +1,74 @@
+"""
+Throughput of JobConsumer against the in-memory broker.
+
+Each fake job spends part of its time in GIL-releasing CPU work (hashing,
+standing in for CTranslate2/ffmpeg) and part waiting on I/O, which is the
+shape of a real dubbing job. Run from services/orchestrator:
+
+    python benchmarks/bench_consumer.py --jobs 64 --workers 1,2,4,8
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import JobConsumer
+from fakes import InMemoryBroker
+
+QUEUE = "job.created"
+
+
+def fake_job(cpu_mb, io_ms):
+    payload = os.urandom(1024 * 1024)
+
+    def handler(body):
+        for _ in range(cpu_mb):
+            hashlib.sha256(payload).digest()
+        time.sleep(io_ms / 1000)
+
+    return handler
+
+
+def run(workers, jobs, cpu_mb, io_ms):
+    broker = InMemoryBroker()
+    for i in range(jobs):
+        broker.publish(QUEUE, json.dumps({"jobId": i}).encode())
+
+    consumer = JobConsumer(broker.connect, fake_job(cpu_mb, io_ms), queue=QUEUE, workers=workers, prefetch=workers)
+    thread = threading.Thread(target=consumer.run)
+    started = time.perf_counter()
+    thread.start()
+    while broker.acked < jobs:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    consumer.stop()
+    thread.join()
+    return {"workers": workers, "jobs": jobs, "seconds": round(elapsed, 3), "jobsPerSecond": round(jobs / elapsed, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}")
+    parser.add_argument("--cpu-mb", type=int, default=40, help="MB hashed per job")
+    parser.add_argument("--io-ms", type=int, default=50, help="simulated I/O wait per job")
+    args = parser.parse_args()
+
+    results = []
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+        result = run(workers, args.jobs, args.cpu_mb, args.io_ms)
+        results.append(result)
+        print(f"workers={workers:<3} {result['jobsPerSecond']:>8} jobs/s  ({result['seconds']}s)", file=sys.stderr)
+    base = results[0]["jobsPerSecond"]
+    for r in results:
+        r["speedup"] = round(r["jobsPerSecond"] / base, 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
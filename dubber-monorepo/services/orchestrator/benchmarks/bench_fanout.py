@@ -0,0 +1,139 @@
+"""
+CPU time of one multi-language job vs. one single-language job per language.
+
+Both modes run the orchestrator's real dubbing path (StreamingPipeline,
+time stretch, TimelineMixer) for every language. The shared stages are
+simulated with CPU-bound stand-ins that cost about as much per second of
+audio as their real counterparts:
+
+- "extract" resamples 48 kHz stereo to 16 kHz mono
+- "ASR" runs --asr-passes FFT passes over the audio and emits a segment
+  every few seconds
+
+Translation is a string transform and TTS generates a tone, so the
+per-language work is mostly stretch and mix. Run from services/orchestrator:
+
+    python benchmarks/bench_fanout.py --seconds 300 --languages hi,te,ta,bn,mr
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asr import Segment
+from fanout import SharedSegments, run_languages
+from mixer import TimelineMixer
+from pipeline import StreamingPipeline
+from stretch import fit_to_duration
+
+SOURCE_RATE = 48000
+ASR_RATE = 16000
+TTS_RATE = 22050
+
+
+def make_source(seconds, seed=3):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SOURCE_RATE)) / SOURCE_RATE
+    voice = np.sin(2 * np.pi * 180 * t) * (np.sin(2 * np.pi * 0.3 * t) > 0)
+    left = 0.3 * voice + 0.01 * rng.standard_normal(len(t))
+    return np.stack([left, left[::-1]], axis=1).astype(np.float32)
+
+
+def extract(source):
+    """48 kHz stereo -> 16 kHz mono"""
+    mono = source.mean(axis=1)
+    positions = np.arange(int(len(mono) * ASR_RATE / SOURCE_RATE)) * (SOURCE_RATE / ASR_RATE)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def fake_asr(audio, passes, segment_seconds=3.0):
+    """Yields a segment per segment_seconds after spending FFT work on its audio"""
+    step = int(segment_seconds * ASR_RATE)
+    frame = 400
+    for index, start in enumerate(range(0, len(audio), step)):
+        window = audio[start:start + step]
+        frames = window[:len(window) // frame * frame].reshape(-1, frame)
+        for _ in range(passes):
+            np.abs(np.fft.rfft(frames * np.hanning(frame), axis=1)).sum()
+        begin = start / ASR_RATE
+        end = min(len(audio), start + step) / ASR_RATE
+        yield Segment(begin, end - 0.2, f"segment {index} says something worth dubbing today")
+
+
+def dub_fn(lang):
+    def dub(i, segment):
+        text = f"[{lang}] {segment.text}"
+        seconds = max(0.5, len(text) / 15)
+        t = np.arange(int(seconds * TTS_RATE)) / TTS_RATE
+        samples = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+        samples = fit_to_duration(samples, TTS_RATE, segment.end - segment.start)
+        return int(segment.start * 1000), samples, TTS_RATE
+    return dub
+
+
+def dub_language(lang, segments, duration, scratch):
+    mixer = TimelineMixer(duration)
+    pipeline = StreamingPipeline(dub_fn(lang), lambda result: mixer.add(*result))
+    pipeline.run(segments, duration)
+    mixer.export_wav(os.path.join(scratch, f"final_audio.{lang}.wav"))
+    return pipeline.mixed
+
+
+def measure(fn):
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    result = fn()
+    return result, time.perf_counter() - wall0, time.process_time() - cpu0
+
+
+def run_separate(source, duration, languages, passes, scratch):
+    """One complete job per language, one after another"""
+    def jobs():
+        for lang in languages:
+            audio = extract(source)
+            dub_language(lang, fake_asr(audio, passes), duration, scratch)
+    _, wall, cpu = measure(jobs)
+    return {"mode": "separate", "jobs": len(languages), "wallSeconds": round(wall, 2), "cpuSeconds": round(cpu, 2)}
+
+
+def run_fanout(source, duration, languages, passes, scratch):
+    """One job: shared extract + ASR, languages dubbed in parallel"""
+    def job():
+        audio = extract(source)
+        shared = SharedSegments(fake_asr(audio, passes)).start()
+        results = run_languages(languages, lambda lang: dub_language(lang, shared.reader(), duration, scratch))
+        shared.wait()
+        failed = [lang for lang, (_, error) in results.items() if error is not None]
+        assert not failed, f"languages failed: {failed}"
+    _, wall, cpu = measure(job)
+    return {"mode": "fanout", "jobs": 1, "wallSeconds": round(wall, 2), "cpuSeconds": round(cpu, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=120, help="length of the source audio")
+    parser.add_argument("--languages", default="hi,te,ta,bn,mr")
+    parser.add_argument("--asr-passes", type=int, default=40, help="FFT passes per ASR segment (ASR cost)")
+    args = parser.parse_args()
+
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    source = make_source(args.seconds)
+    with tempfile.TemporaryDirectory(prefix="bench-fanout-") as scratch:
+        separate = run_separate(source, args.seconds, languages, args.asr_passes, scratch)
+        fanout = run_fanout(source, args.seconds, languages, args.asr_passes, scratch)
+    for result in (separate, fanout):
+        print(json.dumps(result))
+    print(json.dumps({
+        "languages": len(languages),
+        "cpuSaved": round(1 - fanout["cpuSeconds"] / separate["cpuSeconds"], 3) if separate["cpuSeconds"] else 0.0,
+        "wallSpeedup": round(separate["wallSeconds"] / fanout["wallSeconds"], 2) if fanout["wallSeconds"] else 0.0,
+    }))
+
+
+if __name__ == "__main__":
+    main()
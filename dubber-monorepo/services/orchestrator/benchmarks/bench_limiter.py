@@ -0,0 +1,115 @@
+"""
+Fixed vs. adaptive concurrency against a backend with limited capacity.
+
+The fake backend serves --capacity calls at its base latency; past that,
+calls queue (latency grows with the load), and past twice that it answers
+429. Several jobs share one limiter, each dubbing its segments on
+DUB_WORKERS threads and retrying throttled calls after a short backoff,
+like BatchTranslator does. Run from services/orchestrator:
+
+    python benchmarks/bench_limiter.py --jobs 4 --segments 200 --capacity 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limiter import AdaptiveLimiter
+
+
+class Throttled(Exception):
+    status_code = 429
+
+    def __init__(self):
+        super().__init__("429 Too Many Requests")
+        self.response = self
+
+
+class CapacityBackend:
+    def __init__(self, capacity, latency_ms):
+        self.capacity = capacity
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def call(self):
+        with self.lock:
+            if self.in_flight >= 2 * self.capacity:
+                self.rejected += 1
+                raise Throttled()
+            self.in_flight += 1
+            load = self.in_flight
+        try:
+            time.sleep(self.latency * max(1.0, load / self.capacity))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def run(mode, args):
+    backend = CapacityBackend(args.capacity, args.latency_ms)
+    if mode == "adaptive":
+        limiter = AdaptiveLimiter("bench", args.initial, args.max_limit, adaptive=True)
+    else:
+        limiter = AdaptiveLimiter("bench", int(mode), int(mode), adaptive=False)
+    latencies = []
+    lock = threading.Lock()
+
+    def segment(_):
+        started = time.perf_counter()
+        while True:
+            try:
+                limiter.call(backend.call)
+                break
+            except Throttled:
+                time.sleep(args.retry_ms / 1000)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    def job(_):
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(segment, range(args.segments)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.jobs) as jobs:
+        list(jobs.map(job, range(args.jobs)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    stats = limiter.stats()
+    return {
+        "mode": mode if mode == "adaptive" else f"fixed-{mode}",
+        "seconds": round(elapsed, 2),
+        "segmentsPerSecond": round(len(latencies) / elapsed, 1),
+        "p50Ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95Ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        "throttled": backend.rejected,
+        "finalLimit": stats["limit"],
+        "peakInFlight": stats["peakInFlight"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=4, help="concurrent jobs sharing the backend")
+    parser.add_argument("--segments", type=int, default=200, help="segments per job")
+    parser.add_argument("--workers", type=int, default=16, help="dub threads per job")
+    parser.add_argument("--capacity", type=int, default=8, help="calls the backend serves at base latency")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--retry-ms", type=float, default=50, help="backoff before retrying a throttled call")
+    parser.add_argument("--initial", type=int, default=4, help="starting limit of the adaptive mode")
+    parser.add_argument("--max-limit", type=int, default=64)
+    parser.add_argument("--fixed", default="5,64", help="fixed limits to compare against")
+    args = parser.parse_args()
+
+    for mode in [m.strip() for m in args.fixed.split(",") if m.strip()] + ["adaptive"]:
+        print(json.dumps(run(mode, args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+TimelineMixer versus the old AudioSegment.overlay loop.
+
+Builds a timeline of the given length from synthetic speech-length segments
+(1-6 s of noise at the TTS sample rate) and times both approaches. The
+overlay loop copies the whole track per segment, so on long timelines only
+the first --overlay-limit segments are timed and the rest is extrapolated.
+Run from services/orchestrator:
+
+    python benchmarks/bench_mixer.py --hours 1,3 --segments-per-minute 15
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mixer import TimelineMixer
+
+SEGMENT_RATE = 24000  # gTTS output rate
+
+
+def make_segments(duration_s, per_minute, seed=1):
+    rng = np.random.default_rng(seed)
+    count = int(duration_s / 60 * per_minute)
+    starts = np.sort(rng.uniform(0, duration_s - 6, count))
+    segments = []
+    for start in starts:
+        length = int(rng.uniform(1, 6) * SEGMENT_RATE)
+        samples = (rng.standard_normal(length) * 3000).astype(np.int16)
+        segments.append((int(start * 1000), samples))
+    return segments
+
+
+def bench_mixer(duration_s, segments):
+    started = time.perf_counter()
+    mixer = TimelineMixer(duration_s)
+    for pos_ms, samples in segments:
+        mixer.add(pos_ms, samples, SEGMENT_RATE)
+    mixed = time.perf_counter() - started
+    path = f"bench_mix_{os.getpid()}.wav"
+    try:
+        mixer.export_wav(path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return {"mixSeconds": round(mixed, 3), "totalSeconds": round(time.perf_counter() - started, 3)}
+
+
+def bench_overlay(duration_s, segments, limit):
+    try:
+        from pydub import AudioSegment
+    except ImportError:
+        return None
+    timed = segments[:limit]
+    started = time.perf_counter()
+    final_audio = AudioSegment.silent(duration=int(duration_s * 1000))
+    for pos_ms, samples in timed:
+        audio = AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=SEGMENT_RATE, channels=1)
+        audio = audio.set_frame_rate(44100)
+        final_audio = final_audio.overlay(audio, position=pos_ms)
+    elapsed = time.perf_counter() - started
+    per_segment = elapsed / max(1, len(timed))
+    return {
+        "timedSegments": len(timed),
+        "mixSeconds": round(elapsed, 3),
+        "extrapolatedSeconds": round(per_segment * len(segments), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hours", default="1,3")
+    parser.add_argument("--segments-per-minute", type=float, default=15)
+    parser.add_argument("--overlay-limit", type=int, default=50)
+    args = parser.parse_args()
+
+    results = []
+    for hours in [float(h) for h in args.hours.split(",")]:
+        duration_s = hours * 3600
+        segments = make_segments(duration_s, args.segments_per_minute)
+        result = {"hours": hours, "segments": len(segments), "mixer": bench_mixer(duration_s, segments)}
+        overlay = bench_overlay(duration_s, segments, args.overlay_limit)
+        if overlay:
+            result["overlay"] = overlay
+            result["speedup"] = round(overlay["extrapolatedSeconds"] / result["mixer"]["totalSeconds"], 1)
+        results.append(result)
+        print(f"{hours}h, {len(segments)} segments: mixer {result['mixer']['totalSeconds']}s"
+              + (f", overlay ~{overlay['extrapolatedSeconds']}s" if overlay else " (pydub not installed, overlay skipped)"),
+              file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
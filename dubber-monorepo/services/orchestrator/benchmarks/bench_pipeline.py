@@ -0,0 +1,438 @@
+"""
+End-to-end process_job benchmark on synthetic videos with local stand-ins.
+
+Generates test videos (a test pattern plus voiced "speech" of configurable
+length and speech density), publishes one job per video to an in-memory
+broker and lets the real JobConsumer run main.process_job on them. MinIO,
+the gateway's PATCH /api/v1/job/{id}, translation and TTS are local fakes
+(benchmarks/fakes.py, TRANSLATE_BACKEND=fake). ffmpeg, VAD, faster-whisper
+(the tiny model by default), the dubbing pipeline, mixer, mux and
+checkpoints are the real code.
+
+Per job it reports the stage wall/CPU seconds from the job's timing report,
+process CPU, peak RSS sampled while the job ran, and the realtime factor.
+Results are JSON (one line per job, --output for the whole run). --compare
+checks them against an earlier run on the same videos and exits with 1
+when a stage got slower than --tolerance allows. Run from
+services/orchestrator (needs the orchestrator requirements):
+
+    python benchmarks/bench_pipeline.py --seconds 60,300 --density 0.3,0.8 --output baseline.json
+    python benchmarks/bench_pipeline.py --seconds 60,300 --density 0.3,0.8 --compare baseline.json
+    python benchmarks/bench_pipeline.py --asr oracle --seconds 1800   # mixer/mux without ASR
+
+Synthetic speech makes Whisper decode, but not say much; --speech-wav cuts
+the utterances from a real recording instead.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import platform
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from types import SimpleNamespace
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from fakes import FakeGateway, FakeTtsBackend, InMemoryBroker, SlowObjectStore
+
+SAMPLE_RATE = 16000
+BUCKET = "dubber-videos"
+# First three formants of a few vowels (Hz)
+VOWEL_FORMANTS = np.array([(730, 1090, 2440), (270, 2290, 3010), (530, 1840, 2480),
+                           (570, 840, 2410), (300, 870, 2240)], dtype=np.float32)
+
+
+# Synthetic media
+def speech_timeline(seconds, density, rng):
+    """[(start, end)] utterances covering about `density` of the timeline"""
+    density = min(1.0, max(0.05, density))
+    spans = []
+    t = rng.uniform(0.3, 1.5)
+    while t < seconds - 1.0:
+        length = min(rng.uniform(1.5, 6.0), seconds - t)
+        spans.append((round(t, 3), round(t + length, 3)))
+        gap = length * (1 - density) / density * rng.uniform(0.5, 1.5)
+        t += length + max(0.2, gap)
+    return spans
+
+
+def synth_voice(seconds, rng):
+    """A harmonic series at a wandering pitch through vowel formants, in ~4 Hz syllables"""
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+    f0 = rng.uniform(100, 210) * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.3, 1.0) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    rate = rng.uniform(3.0, 5.0)
+    syllables = (t * rate).astype(np.int64)
+    formants = VOWEL_FORMANTS[rng.integers(0, len(VOWEL_FORMANTS), size=syllables[-1] + 1)][syllables]
+    voice = np.zeros(n, dtype=np.float32)
+    for k in range(1, 25):
+        gain = np.exp(-(((k * f0)[:, None] - formants) / 120) ** 2).sum(axis=1) + 0.02
+        voice += gain / np.sqrt(k) * np.sin(k * phase)
+    voice *= np.abs(np.sin(np.pi * t * rate)) ** 0.6
+    return 0.4 * voice / (np.abs(voice).max() or 1.0)
+
+
+def load_recording(path):
+    """A speech recording as 16 kHz mono float"""
+    import soundfile as sf
+    samples, rate = sf.read(path, dtype="float32", always_2d=True)
+    mono = samples.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(int(len(mono) * SAMPLE_RATE / rate)) * (rate / SAMPLE_RATE)
+        mono = np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+    return mono
+
+
+def synth_audio(seconds, spans, rng, recording=None):
+    audio = (0.003 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+    cursor = 0
+    for start, end in spans:
+        first, last = int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)
+        if recording is None:
+            voice = synth_voice(end - start, rng)
+        else:
+            # Consecutive slices of the recording, wrapping around
+            idx = (cursor + np.arange(last - first)) % len(recording)
+            voice = recording[idx]
+            cursor = idx[-1] + 1
+        audio[first:first + len(voice)] += voice[:len(audio) - first]
+    return np.clip(audio, -1, 1)
+
+
+def make_video(path, seconds, density, seed, size, recording=None):
+    """Writes the test video; returns the speech spans it contains"""
+    rng = np.random.default_rng(seed)
+    spans = speech_timeline(seconds, density, rng)
+    audio = synth_audio(seconds, spans, rng, recording)
+    wav_path = path + ".wav"
+    with wave.open(wav_path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((audio * 32767).astype(np.int16).tobytes())
+    try:
+        run_ffmpeg([
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=25", "-i", wav_path, "-t", f"{seconds:g}",
+            "-map", "0:v", "-map", "1:a", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart", path,
+        ])
+    finally:
+        os.remove(wav_path)
+    return spans
+
+
+def prepare_videos(args):
+    """[(name, path, seconds, density, spans)], generated once per parameter set into --media-dir"""
+    recording = load_recording(args.speech_wav) if args.speech_wav else None
+    voice = "rec" if args.speech_wav else "synth"
+    os.makedirs(args.media_dir, exist_ok=True)
+    videos = []
+    for seconds in args.seconds:
+        for density in args.density:
+            name = f"{seconds:g}s-d{density:g}-{voice}-{args.size}-s{args.seed}"
+            path = os.path.join(args.media_dir, name + ".mp4")
+            sidecar = path + ".json"
+            if os.path.exists(path) and os.path.exists(sidecar):
+                with open(sidecar) as f:
+                    spans = [tuple(s) for s in json.load(f)]
+            else:
+                print(f"Generating {name}.mp4...", file=sys.stderr)
+                spans = make_video(path, seconds, density, args.seed, args.size, recording)
+                with open(sidecar, "w") as f:
+                    json.dump(spans, f)
+            videos.append((name, path, seconds, density, spans))
+    return videos
+
+
+def run_ffmpeg(ffmpeg_args):
+    from media import ffmpeg_binary
+    cmd = [ffmpeg_binary(), "-hide_banner", "-nostdin", "-y", "-loglevel", "error"] + ffmpeg_args
+    subprocess.run(cmd, check=True)
+
+
+# ASR without Whisper
+class OracleModelPool:
+    """Stands in for model_pool with --asr oracle: the generated utterances are the transcript"""
+
+    def __init__(self, current):
+        self.current = current
+
+    def get(self, size=None, compute_type=None, cpu_threads=None):
+        return self
+
+    def transcribe(self, audio, beam_size=5, **kwargs):
+        from asr import Segment
+        spans = self.current.spans  # set on the job's thread before process_job runs
+        segments = [Segment(start, end, f"utterance {i} of the synthetic test video, spoken at {start:.1f} seconds")
+                    for i, (start, end) in enumerate(spans)]
+        return iter(segments), SimpleNamespace(duration=spans[-1][1] if spans else 0.0)
+
+    def warm(self):
+        pass
+
+    def stats(self):
+        return {"oracle": True}
+
+
+# Measurement
+class RssSampler(threading.Thread):
+    """Samples this process's resident memory so each job's peak can be read afterwards"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.running = True
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def rss(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self.page_size
+        except OSError:
+            # Not Linux: only the peak so far is known (KB on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+
+    def run(self):
+        while self.running:
+            self.samples.append((time.time(), self.rss()))
+            time.sleep(self.interval)
+
+    def peak(self, start, end):
+        window = [rss for t, rss in self.samples if start <= t <= end]
+        return max(window) if window else self.rss()
+
+    def stop(self):
+        self.running = False
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args, gateway_url):
+    """Settings main.py reads at import time"""
+    os.environ["API_GATEWAY_URL"] = gateway_url
+    os.environ["TRANSLATE_BACKEND"] = "fake"
+    os.environ["WHISPER_MODEL_SIZE"] = args.model
+    os.environ["WHISPER_WARM_MODELS"] = args.model
+    os.environ.setdefault("METRICS_PORT", "0")
+    if not args.warm_cache:
+        # Every run measures real translate/TTS work, not cache hits from the previous video
+        os.environ["CACHE_STORE"] = "none"
+        os.environ["CACHE_MEMORY_MB"] = "0"
+    if args.no_checkpoint:
+        os.environ["CHECKPOINT_ENABLED"] = "false"
+    if args.asr == "oracle":
+        os.environ["ASR_MIN_CHUNKED_SECONDS"] = "inf"
+
+
+def run_jobs(args, videos):
+    gateway = FakeGateway().start()
+    configure_environment(args, gateway.url)
+    import main as orchestrator
+    from consumer import JobConsumer
+    from tts import tts_limiter
+
+    store = SlowObjectStore(latency_ms=args.store_latency_ms, mbps=args.store_mbps)
+    orchestrator.minio_client = store
+    orchestrator.object_store = store
+    orchestrator.tts_backend = FakeTtsBackend(latency_ms=args.tts_latency_ms)
+    orchestrator.tts_calls = tts_limiter(orchestrator.tts_backend)
+    current = threading.local()
+    if args.asr == "oracle":
+        orchestrator.model_pool = OracleModelPool(current)
+    else:
+        # Loaded before the clock starts, like a worker warming its models at startup
+        print(f"Loading Whisper model '{args.model}'...", file=sys.stderr)
+        try:
+            orchestrator.model_pool.get(args.model)
+        except Exception as e:
+            gateway.stop()
+            sys.exit(f"Could not load Whisper model '{args.model}' ({e}); "
+                     "pass a downloaded model directory with --model, or use --asr oracle")
+
+    jobs = {}
+    for n, (name, path, seconds, density, spans) in enumerate(videos):
+        job_id = f"bench-{n}"
+        source_key = f"bench/{name}.mp4"
+        with open(path, "rb") as f:
+            store.put_bytes(BUCKET, source_key, f.read(), "video/mp4")
+        jobs[job_id] = {"video": name, "seconds": seconds, "density": density, "spans": spans,
+                        "sourceKey": source_key}
+
+    windows = {}
+
+    def handler(body):
+        job_id = json.loads(body)["jobId"]
+        current.spans = jobs[job_id]["spans"]
+        cpu0, children0 = time.process_time(), os.times()
+        started = time.time()
+        orchestrator.process_job(body)
+        children1 = os.times()
+        child_cpu = (children1.children_user + children1.children_system
+                     - children0.children_user - children0.children_system)
+        windows[job_id] = (started, time.time(), time.process_time() - cpu0 + child_cpu)
+
+    broker = InMemoryBroker()
+    consumer = JobConsumer(broker.connect, handler, workers=args.workers, prefetch=args.workers)
+    for job_id, job in jobs.items():
+        broker.publish(consumer.queue, json.dumps({
+            "jobId": job_id, "sourceObjectKey": job["sourceKey"], "targetLanguage": args.languages,
+            "optionsJson": "{}",
+        }).encode())
+
+    sampler = RssSampler()
+    sampler.start()
+    thread = threading.Thread(target=consumer.run, name="consumer")
+    started = time.time()
+    thread.start()
+    while broker.acked + broker.nacked < len(jobs):
+        time.sleep(0.05)
+    elapsed = time.time() - started
+    consumer.stop()
+    thread.join()
+    sampler.stop()
+    orchestrator.status_reporter.close(timeout=30)
+    gateway.stop()
+
+    results = []
+    for job_id, job in jobs.items():
+        job_start, job_end, process_cpu = windows.get(job_id, (started, started, 0.0))
+        try:
+            report = json.loads(store.get_bytes(BUCKET, f"dubbed_{job_id}.timing.json"))
+        except KeyError:
+            report = {}
+        results.append({
+            "video": job["video"],
+            "mediaSeconds": job["seconds"],
+            "speechDensity": job["density"],
+            "status": gateway.status(job_id),
+            "wallSeconds": round(job_end - job_start, 3),
+            "realtimeFactor": round((job_end - job_start) / job["seconds"], 4),
+            "processCpuSeconds": round(process_cpu, 3),
+            "peakRssMb": round(sampler.peak(job_start, job_end) / (1024 * 1024), 1),
+            "segments": report.get("pipeline", {}).get("segments"),
+            "stages": {name: {"wallSeconds": s["wallSeconds"], "cpuSeconds": s["cpuSeconds"]}
+                       for name, s in report.get("stages", {}).items()},
+            "vad": report.get("vad"),
+        })
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    summary = {
+        "jobs": len(jobs),
+        "failed": sum(1 for r in results if r["status"] != "COMPLETED"),
+        "wallSeconds": round(elapsed, 3),
+        "mediaSeconds": sum(job["seconds"] for job in jobs.values()),
+        "realtimeFactor": round(elapsed / sum(job["seconds"] for job in jobs.values()), 4),
+        "peakRssMb": round(max((rss for _, rss in sampler.samples), default=0) / (1024 * 1024), 1),
+        "peakChildRssMb": round(children_peak / 1024, 1) if sys.platform != "darwin" else None,
+        "ttsCalls": orchestrator.tts_backend.calls,
+    }
+    return results, summary
+
+
+def compare(results, baseline, tolerance, min_seconds, min_rss_mb):
+    """Metrics that got worse than tolerance allows, against jobs on the same videos"""
+    previous = {job["video"]: job for job in baseline.get("jobs", [])}
+    regressions = []
+
+    def check(video, metric, new, old, floor):
+        if new is None or old is None:
+            return
+        if new > old * (1 + tolerance) and new - old >= floor:
+            regressions.append({"video": video, "metric": metric, "baseline": old, "current": new,
+                                "change": round(new / old - 1, 3) if old else None})
+
+    for job in results:
+        old = previous.get(job["video"])
+        if old is None:
+            continue
+        check(job["video"], "wallSeconds", job["wallSeconds"], old["wallSeconds"], min_seconds)
+        check(job["video"], "processCpuSeconds", job["processCpuSeconds"], old["processCpuSeconds"], min_seconds)
+        check(job["video"], "peakRssMb", job["peakRssMb"], old["peakRssMb"], min_rss_mb)
+        for stage, s in job["stages"].items():
+            o = old.get("stages", {}).get(stage)
+            if o:
+                check(job["video"], f"{stage}.wallSeconds", s["wallSeconds"], o["wallSeconds"], min_seconds)
+                check(job["video"], f"{stage}.cpuSeconds", s["cpuSeconds"], o["cpuSeconds"], min_seconds)
+    return regressions
+
+
+def float_list(value):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float_list, default=[60.0], help="video lengths, comma separated")
+    parser.add_argument("--density", type=float_list, default=[0.6], help="shares of speech, comma separated")
+    parser.add_argument("--size", default="640x360", help="video frame size")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--speech-wav", help="cut utterances from this recording instead of synthesizing them")
+    parser.add_argument("--media-dir", default=os.path.join(tempfile.gettempdir(), "dubber-bench-media"))
+    parser.add_argument("--asr", choices=["whisper", "oracle"], default="whisper",
+                        help="oracle: the generated utterances are the transcript (no Whisper)")
+    parser.add_argument("--model", default="tiny", help="Whisper size or local model directory")
+    parser.add_argument("--languages", default="hi", help="target languages, comma separated")
+    parser.add_argument("--workers", type=int, default=1, help="jobs at once (per-job RSS/CPU are exact at 1)")
+    parser.add_argument("--tts-latency-ms", type=float, default=40)
+    parser.add_argument("--store-latency-ms", type=float, default=2)
+    parser.add_argument("--store-mbps", type=float, default=2000)
+    parser.add_argument("--warm-cache", action="store_true", help="keep the configured translation/TTS cache")
+    parser.add_argument("--no-checkpoint", action="store_true")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results JSON of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="ignore time changes smaller than this")
+    parser.add_argument("--min-rss-mb", type=float, default=32, help="ignore memory changes smaller than this")
+    args = parser.parse_args()
+
+    videos = prepare_videos(args)
+    results, summary = run_jobs(args, videos)
+    document = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "asr": args.asr,
+            "model": args.model if args.asr == "whisper" else None,
+            "languages": args.languages,
+            "workers": args.workers,
+        },
+        "jobs": results,
+        "summary": summary,
+    }
+    for job in results:
+        print(json.dumps(job))
+    print(json.dumps(summary))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_seconds, args.min_rss_mb)
+        print(json.dumps({"regressions": regressions}))
+        if regressions:
+            sys.exit(1)
+    if summary["failed"]:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Short-job latency under mixed load: FIFO consumer vs. lanes + admission.
+
+A burst of long uploads lands on the queue just ahead of many short
+clips. Each fake job sleeps for its media length times --rtf (the job's
+realtime factor), so the ratio of long to short work is realistic while
+the run stays short. Run from services/orchestrator:
+
+    python benchmarks/bench_scheduler.py --long 3 --short 40 --workers 2
+
+--steady SECONDS runs the starvation case instead: the queue is kept
+topped up with short clips while one long job, too big to run next to any
+of them, waits for room. Without a reservation it is requeued until the
+short traffic stops; with one it starts after --reserve-after seconds.
+The run exits with 1 if the long job still starved with the reservation.
+
+    python benchmarks/bench_scheduler.py --steady 8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import JobConsumer
+from fakes import InMemoryBroker
+from scheduler import JobScheduler, estimate_job_cost
+
+QUEUE = "job.created"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else None
+
+
+def run(mode, jobs, workers, rtf, memory_mb):
+    broker = InMemoryBroker()
+    published = {}
+    finished = {}
+    lock = threading.Lock()
+
+    def handler(body):
+        job = json.loads(body)
+        time.sleep(job["seconds"] * rtf)
+        with lock:
+            finished[job["jobId"]] = time.perf_counter()
+
+    scheduler = None
+    if mode == "lanes":
+        scheduler = JobScheduler(lambda body: estimate_job_cost(json.loads(body)["seconds"]),
+                                 memory_mb=memory_mb, cpus=64, admit_wait=30)
+    consumer = JobConsumer(broker.connect, handler, queue=QUEUE, workers=workers, prefetch=workers,
+                           scheduler=scheduler)
+    for job_id, seconds in jobs:
+        published[job_id] = time.perf_counter()
+        broker.publish(QUEUE, json.dumps({"jobId": job_id, "seconds": seconds}).encode())
+
+    thread = threading.Thread(target=consumer.run)
+    thread.start()
+    while len(finished) < len(jobs):
+        time.sleep(0.005)
+    consumer.stop()
+    thread.join()
+
+    result = {"mode": mode, "workers": workers}
+    for lane, limit in (("short", 900), ("long", float("inf"))):
+        latencies = [finished[j] - published[j] for j, s in jobs if (s <= 900) == (lane == "short")]
+        result[lane] = {
+            "jobs": len(latencies),
+            "p50Seconds": round(percentile(latencies, 0.5), 3) if latencies else None,
+            "p95Seconds": round(percentile(latencies, 0.95), 3) if latencies else None,
+        }
+    result["makespanSeconds"] = round(max(finished.values()) - min(published.values()), 3)
+    if scheduler is not None:
+        result["requeued"] = consumer.stats()["requeued"]
+    return result
+
+
+def run_steady(reserve_after, args):
+    broker = InMemoryBroker()
+    finished = {}
+    lock = threading.Lock()
+    long_cost = estimate_job_cost(args.long_seconds)
+
+    def handler(body):
+        job = json.loads(body)
+        time.sleep(job["seconds"] * args.rtf)
+        with lock:
+            finished[job["jobId"]] = time.perf_counter()
+
+    # The budget holds the long job alone, so it fits only on an idle node
+    scheduler = JobScheduler(lambda body: estimate_job_cost(json.loads(body)["seconds"]),
+                             memory_mb=long_cost.memory_mb, cpus=64, admit_wait=args.admit_wait,
+                             reserve_after=reserve_after)
+    consumer = JobConsumer(broker.connect, handler, queue=QUEUE, workers=args.workers,
+                           prefetch=args.workers, scheduler=scheduler)
+    thread = threading.Thread(target=consumer.run)
+    thread.start()
+
+    shorts = 0
+    started = None
+    stream_end = time.perf_counter() + args.steady
+    while time.perf_counter() < stream_end:
+        if started is None and shorts >= args.workers * 4:
+            # Once short clips occupy the node
+            started = time.perf_counter()
+            broker.publish(QUEUE, json.dumps({"jobId": "long", "seconds": args.long_seconds}).encode())
+        if broker.pending(QUEUE) < args.workers * 2:
+            broker.publish(QUEUE, json.dumps({"jobId": f"short-{shorts}", "seconds": args.short_seconds}).encode())
+            shorts += 1
+        time.sleep(0.002)
+    while "long" not in finished or len(finished) < shorts + 1:
+        time.sleep(0.005)
+    consumer.stop()
+    thread.join()
+
+    stats = consumer.stats()
+    return {
+        "mode": "reserve" if reserve_after != float("inf") else "no-reserve",
+        "shortJobs": shorts,
+        "longSeconds": round(finished["long"] - started, 3),
+        "longStarved": finished["long"] > stream_end,
+        "requeued": stats["requeued"],
+        "reservations": stats["scheduler"]["reservations"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--long", type=int, default=3, help="long uploads at the head of the queue")
+    parser.add_argument("--long-seconds", type=float, default=3 * 3600)
+    parser.add_argument("--short", type=int, default=40, help="short clips behind them")
+    parser.add_argument("--short-seconds", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rtf", type=float, default=0.0002, help="seconds of work per media second")
+    parser.add_argument("--memory-mb", type=int, default=8192, help="memory budget of the lanes mode")
+    parser.add_argument("--steady", type=float, default=0, help="seconds of steady short traffic (starvation case)")
+    parser.add_argument("--admit-wait", type=float, default=0.5, help="ADMIT_WAIT_SECONDS of the starvation case")
+    parser.add_argument("--reserve-after", type=float, default=1.5, help="LONG_JOB_RESERVE_SECONDS of the starvation case")
+    args = parser.parse_args()
+
+    if args.steady:
+        results = [run_steady(reserve, args) for reserve in (float("inf"), args.reserve_after)]
+        for result in results:
+            print(json.dumps(result))
+        sys.exit(1 if results[-1]["longStarved"] else 0)
+
+    jobs = [(f"long-{i}", args.long_seconds) for i in range(args.long)]
+    jobs += [(f"short-{i}", args.short_seconds) for i in range(args.short)]
+    for mode in ("fifo", "lanes"):
+        print(json.dumps(run(mode, jobs, args.workers, args.rtf, args.memory_mb)))
+
+
+if __name__ == "__main__":
+    main()
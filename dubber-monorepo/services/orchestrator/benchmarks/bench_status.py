@@ -0,0 +1,93 @@
+"""
+Does the status reporter deliver every language's output key when the gateway fails?
+
+Each job reports its languages one at a time in `outputObjectKeys`, like
+the fan-out in process_job, then COMPLETED. The fake gateway answers the
+first --failures requests with 503, slowly enough that the next language
+is submitted while a failed update is still in flight, so the failed
+update is merged back under the newer one. The run reports how many
+updates were submitted, sent and merged, and which languages never
+reached the gateway. It exits with 1 if any job lost a language or did
+not end COMPLETED. Run from services/orchestrator:
+
+    python benchmarks/bench_status.py --jobs 4 --languages te,hi,ta --failures 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import status
+from fakes import FakeGateway
+from status import StatusReporter
+
+
+def report_job(reporter, job_id, languages, gap):
+    reporter.submit(job_id, {"status": "PROCESSING", "progress": 0})
+    for i, lang in enumerate(languages):
+        time.sleep(gap)
+        reporter.submit(job_id, {"progress": int(100 * (i + 1) / (len(languages) + 1)),
+                                 "outputObjectKeys": {lang: f"dubbed_{job_id}_{lang}.mp4"}})
+    time.sleep(gap)
+    reporter.submit(job_id, {"status": "COMPLETED", "progress": 100, "outputObjectKey": f"dubbed_{job_id}_{languages[0]}.mp4"})
+
+
+def run(args):
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    gateway = FakeGateway(failures=args.failures, latency_ms=args.latency_ms).start()
+    # Retry quickly; the default backoff only makes the run slower
+    status.STATUS_RETRIES = status.STATUS_TERMINAL_RETRIES = args.failures + 2
+    reporter = StatusReporter(gateway.url, min_interval=0)
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            for job in range(args.jobs):
+                pool.submit(report_job, reporter, str(job), languages, args.latency_ms / 2000)
+        drained = reporter.close(timeout=60)
+    finally:
+        gateway.stop()
+    elapsed = time.perf_counter() - started
+
+    lost = {}
+    for job in range(args.jobs):
+        updates = gateway.updates.get(str(job), [])
+        delivered = set()
+        for update in updates:
+            delivered.update(update.get("outputObjectKeys", {}))
+        missing = [lang for lang in languages if lang not in delivered]
+        if missing:
+            lost[str(job)] = missing
+    return {
+        "jobs": args.jobs,
+        "languages": len(languages),
+        "submitted": args.jobs * (len(languages) + 2),
+        "rejected": len(gateway.rejected),
+        "drained": drained,
+        "seconds": round(elapsed, 3),
+        "reporter": reporter.stats(),
+        "lostLanguages": lost,
+        "notCompleted": [str(job) for job in range(args.jobs) if gateway.status(job) != "COMPLETED"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--languages", default="te,hi,ta")
+    parser.add_argument("--failures", type=int, default=4, help="gateway requests answered with 503")
+    parser.add_argument("--latency-ms", type=int, default=100, help="gateway response time")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result["lostLanguages"] or result["notCompleted"] or not result["drained"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Whole-object transfers vs streaming ranged download / parallel multipart upload.
+
+Uses the SlowObjectStore stand-in (per-request latency, per-connection
+bandwidth) and stands in for ffmpeg with readers/writers that process data
+at a fixed rate, so the numbers show how much of the transfer time the
+streaming layer hides behind extraction and muxing. Run from
+services/orchestrator:
+
+    python benchmarks/bench_storage.py --size-mb 200 --mbps 400
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import MultipartUpload, RangedDownload, READ_CHUNK
+from fakes import SlowObjectStore
+
+BUCKET = "dubber-videos"
+
+
+def consume(chunks, mb_per_second):
+    """Stand-in for ffmpeg reading the source (demux + decode audio)"""
+    for data in chunks:
+        time.sleep(len(data) / (mb_per_second * 1024 * 1024))
+
+
+def produce(sink, size, mb_per_second):
+    """Stand-in for ffmpeg writing the muxed output"""
+    chunk = os.urandom(READ_CHUNK)
+    written = 0
+    while written < size:
+        data = chunk[:min(READ_CHUNK, size - written)]
+        time.sleep(len(data) / (mb_per_second * 1024 * 1024))
+        sink.write(data)
+        written += len(data)
+
+
+def file_chunks(path):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_CHUNK)
+            if not data:
+                return
+            yield data
+
+
+def run_whole(store, size, scratch, args):
+    """fget_object, extract, mux to a file, then upload its parts one after another"""
+    started = time.perf_counter()
+    path = os.path.join(scratch, "input.mp4")
+    with open(path, "wb") as f:
+        f.write(store.get_object(BUCKET, "source.mp4"))
+    consume(file_chunks(path), args.extract_mbps)
+    input_done = time.perf_counter()
+
+    out = os.path.join(scratch, "output.mp4")
+    with open(out, "wb") as f:
+        produce(f, size, args.mux_mbps)
+    part_size = int(args.part_mb * 1024 * 1024)
+    upload_id = store.create_multipart(BUCKET, "whole.mp4")
+    parts = []
+    with open(out, "rb") as f:
+        while True:
+            data = f.read(part_size)
+            if not data:
+                break
+            parts.append((len(parts) + 1, store.upload_part(BUCKET, "whole.mp4", upload_id, len(parts) + 1, data)))
+    store.complete_multipart(BUCKET, "whole.mp4", upload_id, parts)
+    finished = time.perf_counter()
+    return input_done - started, finished - input_done
+
+
+def run_streaming(store, size, scratch, args):
+    """Ranged download read by the extractor as it fills; output uploaded while muxing"""
+    started = time.perf_counter()
+    download = RangedDownload(store, BUCKET, "source.mp4", os.path.join(scratch, "input.mp4"),
+                              range_size=int(args.range_mb * 1024 * 1024), workers=args.workers).start()
+    consume(download.iter_chunks(), args.extract_mbps)
+    download.wait()
+    input_done = time.perf_counter()
+
+    with MultipartUpload(store, BUCKET, "streamed.mp4", part_size=int(args.part_mb * 1024 * 1024),
+                         workers=args.workers) as upload:
+        produce(upload, size, args.mux_mbps)
+    finished = time.perf_counter()
+    assert len(store.objects[(BUCKET, "streamed.mp4")]) == size
+    return input_done - started, finished - input_done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=200)
+    parser.add_argument("--mbps", type=float, default=400, help="bandwidth per connection (megabits/s)")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--extract-mbps", type=float, default=150, help="simulated ffmpeg read rate (MB/s)")
+    parser.add_argument("--mux-mbps", type=float, default=150, help="simulated ffmpeg write rate (MB/s)")
+    parser.add_argument("--range-mb", type=float, default=8)
+    parser.add_argument("--part-mb", type=float, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    store = SlowObjectStore(latency_ms=args.latency_ms, mbps=args.mbps)
+    store.objects[(BUCKET, "source.mp4")] = os.urandom(size)
+
+    results = []
+    for name, fn in (("whole-object", run_whole), ("streaming", run_streaming)):
+        with tempfile.TemporaryDirectory() as scratch:
+            inbound, outbound = fn(store, size, scratch, args)
+        results.append({
+            "mode": name,
+            "sizeMb": args.size_mb,
+            "downloadAndExtractSeconds": round(inbound, 3),
+            "muxAndUploadSeconds": round(outbound, 3),
+            "totalSeconds": round(inbound + outbound, 3),
+        })
+        print(json.dumps(results[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Per-segment CPU cost of the WSOLA stretch versus the old frame-rate trick.
+
+The old path re-labels the frame rate with AudioSegment._spawn and then
+resamples to 44.1 kHz (which also shifts pitch); the new path runs WSOLA at
+the TTS rate and leaves resampling to the mixer. Segments are stretched one
+at a time (fit_to_duration, as the streaming pipeline does) and in batches
+of each --batch size (fit_many, as worker-audio's dub_segments does). Run
+from services/orchestrator:
+
+    python benchmarks/bench_stretch.py --segments 200 --batch 8,16,32
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stretch import fit_many, fit_to_duration
+from mixer import resample_linear
+
+SAMPLE_RATE = 24000
+
+
+def make_items(count, seed=3):
+    rng = np.random.default_rng(seed)
+    items = []
+    for _ in range(count):
+        seconds = rng.uniform(1, 6)
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        # voiced-ish signal: a few harmonics with a slow envelope, plus noise
+        f0 = rng.uniform(100, 250)
+        signal = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 5))
+        signal *= 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+        samples = (signal * 6000 + rng.standard_normal(len(t)) * 300).astype(np.int16)
+        items.append((samples, seconds / rng.uniform(0.7, 1.6)))
+    return items
+
+
+def bench_wsola(items):
+    cpu = time.process_time()
+    for samples, target in items:
+        out = fit_to_duration(samples, SAMPLE_RATE, target)
+        resample_linear(out[:, None], SAMPLE_RATE, 44100)
+    return time.process_time() - cpu
+
+
+def bench_batched(items, size):
+    cpu = time.process_time()
+    for first in range(0, len(items), size):
+        batch = items[first:first + size]
+        for out in fit_many([(samples, SAMPLE_RATE, target) for samples, target in batch]):
+            resample_linear(out[:, None], SAMPLE_RATE, 44100)
+    return time.process_time() - cpu
+
+
+def bench_framerate(items):
+    try:
+        from pydub import AudioSegment
+    except ImportError:
+        return None
+    cpu = time.process_time()
+    for samples, target in items:
+        seg = AudioSegment(data=samples.tobytes(), sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+        speed_factor = len(seg) / (target * 1000)
+        seg = seg._spawn(seg.raw_data, overrides={'frame_rate': int(seg.frame_rate * speed_factor)})
+        seg.set_frame_rate(44100)
+    return time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--batch", default="8,16,32", help="segments per fit_many call")
+    args = parser.parse_args()
+
+    items = make_items(args.segments)
+    audio_seconds = sum(len(s) for s, _ in items) / SAMPLE_RATE
+    result = {"segments": len(items), "audioSeconds": round(audio_seconds, 1)}
+    wsola = bench_wsola(items)
+    result["wsolaCpuMsPerSegment"] = round(wsola * 1000 / len(items), 2)
+    for size in sorted({int(b) for b in args.batch.split(",") if b.strip()}):
+        result[f"wsolaBatch{size}CpuMsPerSegment"] = round(bench_batched(items, size) * 1000 / len(items), 2)
+    old = bench_framerate(items)
+    if old is not None:
+        result["frameRateCpuMsPerSegment"] = round(old * 1000 / len(items), 2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
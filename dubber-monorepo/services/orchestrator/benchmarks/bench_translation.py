@@ -0,0 +1,66 @@
+"""
+Batch size sweep for BatchTranslator against the fake translation backend.
+
+Dubbing workers call translate() one segment at a time; this measures how
+much wall time and how many backend round trips batching saves. Run from
+services/orchestrator:
+
+    python benchmarks/bench_translation.py --segments 500 --batch-items 1,5,20,50
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation import BatchTranslator, FakeTranslationBackend
+
+WORDS = "the quick brown fox jumps over a lazy dog while we dub this video into many languages".split()
+
+
+def make_segments(n, seed=7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20))) for _ in range(n)]
+
+
+def run(segments, max_items, max_chars, wait_ms, workers, latency_ms):
+    backend = FakeTranslationBackend(latency_ms=latency_ms)
+    translator = BatchTranslator(backend, max_chars=max_chars, max_items=max_items, max_wait_ms=wait_ms)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda t: translator.translate(t, dest="hi"), segments))
+    elapsed = time.perf_counter() - started
+    assert results == [f"[hi] {t}" for t in segments], "segment boundaries were not preserved"
+    return {
+        "maxItems": max_items,
+        "seconds": round(elapsed, 3),
+        "segmentsPerSecond": round(len(segments) / elapsed, 1),
+        "backendCalls": backend.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--segments", type=int, default=300)
+    parser.add_argument("--batch-items", default="1,5,20,50")
+    parser.add_argument("--max-chars", type=int, default=4500)
+    parser.add_argument("--wait-ms", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent callers (dubbing threads)")
+    parser.add_argument("--latency-ms", type=float, default=80, help="fake backend round trip")
+    args = parser.parse_args()
+
+    segments = make_segments(args.segments)
+    results = []
+    for items in [int(x) for x in args.batch_items.split(",")]:
+        result = run(segments, items, args.max_chars, args.wait_ms, args.workers, args.latency_ms)
+        results.append(result)
+        print(f"batch<= {items:<4} {result['segmentsPerSecond']:>8} seg/s  {result['backendCalls']:>5} calls", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
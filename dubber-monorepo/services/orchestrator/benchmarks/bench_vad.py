@@ -0,0 +1,120 @@
+"""
+Does trimming keep quiet speech over a noise or music bed?
+
+Each track is a continuous background bed (white noise, or chords like a
+music bed) with loud phrases, quiet phrases --snr dB above the bed, and
+gaps where Whisper "hears" something anyway. Every phrase is a real ASR
+segment (low no_speech_prob); every gap gets a hallucinated one (high
+no_speech_prob). The segments go through vad.trim_segments as in
+process_job. The run reports how many real segments would be dropped on
+the VAD's verdict alone, how many are actually dropped, and how many
+hallucinations are removed. It exits with 1 if a real segment was
+dropped. Run from services/orchestrator:
+
+    python benchmarks/bench_vad.py --snr 20,10,6,3
+"""
+import os
+import sys
+import json
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from bench_pipeline import SAMPLE_RATE, synth_voice
+from vad import VAD_FRAME_MS, VoiceActivity, frame_levels, trim_segments
+
+# no_speech_prob Whisper gives real speech and a hallucination over the bed
+SPEECH_PROB = 0.05
+HALLUCINATION_PROB = 0.9
+
+
+def rms(x):
+    return float(np.sqrt(np.mean(x ** 2))) or 1e-9
+
+
+def bed(kind, seconds, rng):
+    n = int(seconds * SAMPLE_RATE)
+    if kind == "noise":
+        return rng.standard_normal(n).astype(np.float32)
+    # Three-note chords changing every two seconds
+    t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+    out = np.zeros(n, dtype=np.float32)
+    for first in range(0, n, 2 * SAMPLE_RATE):
+        last = min(n, first + 2 * SAMPLE_RATE)
+        for f in 110 * 2 ** (rng.integers(0, 24, size=3) / 12):
+            out[first:last] += np.sin(2 * np.pi * f * t[first:last])
+    return out
+
+
+def make_track(kind, snr_db, args, rng):
+    """(int16 pcm, [real segments], [hallucinated segments])"""
+    audio = bed(kind, args.seconds, rng)
+    audio *= args.bed_level / rms(audio)
+    real, fake = [], []
+    t = 1.0
+    i = 0
+    while t + 3.0 < args.seconds:
+        length = rng.uniform(1.5, 3.0)
+        if i % 3 == 2:
+            fake.append(SimpleNamespace(start=t, end=t + length, text=f"thank you {i}",
+                                        no_speech_prob=HALLUCINATION_PROB))
+        else:
+            # Alternate loud and quiet phrases, so the loudest frames are speech well above the quiet ones
+            gain_db = snr_db + (args.loud_db if i % 3 == 0 else 0.0)
+            voice = synth_voice(length, rng)
+            voice *= args.bed_level * 10 ** (gain_db / 20) / rms(voice)
+            first = int(t * SAMPLE_RATE)
+            audio[first:first + len(voice)] += voice
+            real.append(SimpleNamespace(start=t, end=t + length, text=f"phrase {i}", no_speech_prob=SPEECH_PROB,
+                                        quiet=i % 3 == 1))
+        t += length + rng.uniform(0.5, 1.5)
+        i += 1
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    return pcm, real, fake
+
+
+def run(kind, snr_db, args):
+    rng = np.random.default_rng(args.seed)
+    pcm, real, fake = make_track(kind, snr_db, args, rng)
+    vad = VoiceActivity(frame_levels(pcm, SAMPLE_RATE), VAD_FRAME_MS / 1000)
+    segments = sorted(real + fake, key=lambda s: s.start)
+    kept = {s.text for s in trim_segments(segments, vad)}
+    unvoiced_real = [s for s in real if vad.trim(s.start, s.end) is None]
+    return {
+        "bed": kind,
+        "snrDb": snr_db,
+        "realSegments": len(real),
+        "quietSegments": sum(s.quiet for s in real),
+        "vadOnlyDropped": len(unvoiced_real),
+        "realDropped": sum(s.text not in kept for s in real),
+        "hallucinations": len(fake),
+        "hallucinationsDropped": sum(s.text not in kept for s in fake),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--snr", default="20,10,6,3", help="level of the quiet phrases above the bed (dB)")
+    parser.add_argument("--beds", default="noise,music")
+    parser.add_argument("--loud-db", type=float, default=20, help="loud phrases above the quiet ones (dB)")
+    parser.add_argument("--bed-level", type=float, default=0.01, help="RMS of the background bed")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    failed = False
+    for kind in [b.strip() for b in args.beds.split(",") if b.strip()]:
+        for snr in [float(s) for s in args.snr.split(",") if s.strip()]:
+            result = run(kind, snr, args)
+            failed |= result["realDropped"] > 0
+            print(json.dumps(result))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
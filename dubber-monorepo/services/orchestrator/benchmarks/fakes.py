@@ -0,0 +1,293 @@
+"""
+In-process stand-ins for the services the orchestrator talks to.
+
+They implement just enough of the real client interfaces for the
+benchmarks in this folder to run without RabbitMQ, MinIO, the gateway or
+the TTS service.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue, Empty
+import io
+import json
+import time
+import wave
+import itertools
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class InMemoryBroker:
+    """A single-node queue with pika-style delivery, qos and acks"""
+
+    def __init__(self):
+        self.queues = {}
+        self.tags = itertools.count(1)
+        self.acked = 0
+        self.nacked = 0
+
+    def publish(self, queue_name, body, properties=None):
+        self.queues.setdefault(queue_name, Queue()).put((body, properties, False))
+
+    def connect(self):
+        return InMemoryConnection(self)
+
+    def pending(self, queue_name):
+        return self.queues.setdefault(queue_name, Queue()).qsize()
+
+
+class InMemoryConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.callbacks = Queue()
+        self.channels = []
+        self.is_open = True
+
+    def channel(self):
+        ch = InMemoryChannel(self)
+        self.channels.append(ch)
+        return ch
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def process_data_events(self, time_limit=0):
+        # Deliver up to the qos window, then wait for acks scheduled by workers
+        self.deliver()
+        try:
+            cb = self.callbacks.get(timeout=time_limit) if time_limit else self.callbacks.get_nowait()
+            cb()
+            while True:
+                self.callbacks.get_nowait()()
+        except Empty:
+            pass
+        self.deliver()
+
+    def deliver(self):
+        for ch in self.channels:
+            ch.deliver()
+
+    def close(self):
+        for ch in self.channels:
+            ch.requeue_unacked()
+        self.is_open = False
+
+
+class InMemoryChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.prefetch = 0
+        self.consumers = {}
+        self.unacked = {}
+
+    def queue_declare(self, queue, durable=False):
+        self.broker.queues.setdefault(queue, Queue())
+
+    def basic_qos(self, prefetch_count=0):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False):
+        tag = f"ctag-{len(self.consumers) + 1}"
+        self.consumers[tag] = (queue, on_message_callback)
+        return tag
+
+    def basic_cancel(self, consumer_tag):
+        self.consumers.pop(consumer_tag, None)
+
+    def deliver(self):
+        for queue_name, callback in list(self.consumers.values()):
+            q = self.broker.queues[queue_name]
+            while not self.prefetch or len(self.unacked) < self.prefetch:
+                try:
+                    body, properties, redelivered = q.get_nowait()
+                except Empty:
+                    break
+                tag = next(self.broker.tags)
+                self.unacked[tag] = (queue_name, body, properties)
+                method = SimpleNamespace(delivery_tag=tag, redelivered=redelivered)
+                callback(self, method, properties, body)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.broker.publish(routing_key, body, properties)
+
+    def basic_ack(self, delivery_tag):
+        self.unacked.pop(delivery_tag)
+        self.broker.acked += 1
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        queue_name, body, properties = self.unacked.pop(delivery_tag)
+        self.broker.nacked += 1
+        if requeue:
+            self.broker.queues[queue_name].put((body, properties, True))
+
+    def requeue_unacked(self):
+        for tag in list(self.unacked):
+            self.basic_nack(tag, requeue=True)
+
+
+class SlowObjectStore:
+    """In-memory S3 stand-in with per-request latency and per-connection bandwidth
+
+    Implements the MinioObjectStore interface from storage.py. Each request
+    waits latency_ms and then transfers at mbps (per connection, like a
+    single TCP stream to MinIO), so parallel requests overlap.
+    """
+
+    def __init__(self, latency_ms=20, mbps=100):
+        self.latency = latency_ms / 1000
+        self.bytes_per_second = mbps * 1024 * 1024 / 8
+        self.objects = {}
+        self.uploads = {}
+        self.requests = 0
+        self.upload_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def _transfer(self, nbytes):
+        with self.lock:
+            self.requests += 1
+        time.sleep(self.latency + nbytes / self.bytes_per_second)
+
+    def size(self, bucket, key):
+        self._transfer(0)
+        if (bucket, key) not in self.objects:
+            raise KeyError(f"{bucket}/{key}")
+        return len(self.objects[(bucket, key)])
+
+    def get_object(self, bucket, key):
+        """Whole object over one connection (what fget_object does)"""
+        data = self.objects[(bucket, key)]
+        self._transfer(len(data))
+        return data
+
+    def get_bytes(self, bucket, key):
+        return self.get_object(bucket, key)
+
+    def delete_prefix(self, bucket, prefix):
+        self._transfer(0)
+        names = [k for k in self.objects if k[0] == bucket and k[1].startswith(prefix)]
+        for k in names:
+            del self.objects[k]
+        return len(names)
+
+    def get_range(self, bucket, key, offset, length):
+        data = self.objects[(bucket, key)][offset:offset + length]
+        self._transfer(len(data))
+        return data
+
+    def put_bytes(self, bucket, key, data, content_type="application/octet-stream"):
+        self._transfer(len(data))
+        self.objects[(bucket, key)] = bytes(data)
+
+    def create_multipart(self, bucket, key, content_type="application/octet-stream"):
+        self._transfer(0)
+        upload_id = str(next(self.upload_ids))
+        self.uploads[upload_id] = {}
+        return upload_id
+
+    def upload_part(self, bucket, key, upload_id, part_number, data):
+        self._transfer(len(data))
+        self.uploads[upload_id][part_number] = bytes(data)
+        return f"etag-{part_number}"
+
+    def complete_multipart(self, bucket, key, upload_id, parts):
+        self._transfer(0)
+        stored = self.uploads.pop(upload_id)
+        self.objects[(bucket, key)] = b"".join(stored[n] for n, _ in sorted(parts))
+
+    def abort_multipart(self, bucket, key, upload_id):
+        self.uploads.pop(upload_id, None)
+
+    # The few raw Minio client calls main.py makes next to MinioObjectStore
+    def put_object(self, bucket, key, data, length, content_type="application/octet-stream"):
+        self.put_bytes(bucket, key, data.read(length), content_type)
+
+    def remove_object(self, bucket, key):
+        self._transfer(0)
+        self.objects.pop((bucket, key), None)
+
+
+class FakeGateway:
+    """Local HTTP server answering the gateway's PATCH /api/v1/job/{id}; keeps every update
+
+    The first `failures` requests are answered with 503 (and not kept), each
+    after `latency_ms`.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, failures=0, latency_ms=0):
+        self.updates = {}
+        self.rejected = []
+        self.failures = failures
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_PATCH(self):
+                job_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(gateway.latency)
+                with gateway.lock:
+                    fail = len(gateway.rejected) < gateway.failures
+                    if fail:
+                        gateway.rejected.append(json.loads(body or b"{}"))
+                    else:
+                        gateway.updates.setdefault(job_id, []).append(json.loads(body or b"{}"))
+                self.send_response(503 if fail else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-gateway", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def status(self, job_id):
+        """Latest status the job reported"""
+        with self.lock:
+            statuses = [u["status"] for u in self.updates.get(str(job_id), []) if "status" in u]
+        return statuses[-1] if statuses else None
+
+
+class FakeTtsBackend:
+    """TTS stand-in (tts.py backend interface): a WAV tone as long as the text takes to speak"""
+
+    name = "fake"
+    voice = "fake"
+    format = "wav"
+
+    def __init__(self, latency_ms=40, chars_per_second=15, sample_rate=22050):
+        self.latency = latency_ms / 1000
+        self.chars_per_second = chars_per_second
+        self.sample_rate = sample_rate
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, lang):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        seconds = max(0.3, len(text) / self.chars_per_second)
+        t = np.arange(int(seconds * self.sample_rate)) / self.sample_rate
+        samples = (6000 * np.sin(2 * np.pi * 200 * t) * np.sin(np.pi * t / seconds)).astype(np.int16)
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            w.writeframes(samples.tobytes())
+        return buf.getvalue()
@@ -0,0 +1,294 @@
+"""
+Content-addressed cache for translations and synthesized speech.
+
+Entries are keyed by a SHA-256 of everything that determines the output
+(text, languages, voice), so the same phrase is only translated and
+synthesized once no matter which job or service asks for it. A small
+in-process LRU sits in front of a shared store (local disk or MinIO).
+
+service-translate and service-tts import this module through
+ORCHESTRATOR_PATH, so all three share one key layout and store. Keep it
+free of third-party imports: those services don't install the
+orchestrator's requirements.
+"""
+import os
+import io
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Configuration
+CACHE_STORE = os.getenv("CACHE_STORE", "disk")  # disk | minio | none
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "dubber-cache"))
+CACHE_BUCKET = os.getenv("CACHE_BUCKET", "dubber-cache")
+CACHE_MEMORY_MB = int(os.getenv("CACHE_MEMORY_MB", "64"))
+CACHE_DISK_MAX_MB = int(os.getenv("CACHE_DISK_MAX_MB", "2048"))
+CACHE_TTL_HOURS = float(os.getenv("CACHE_TTL_HOURS", "168"))
+CACHE_LIFECYCLE = os.getenv("CACHE_LIFECYCLE", "true").lower() == "true"
+
+LIFECYCLE_RULE_ID = "dubber-expire-cache"
+
+KEY_VERSION = "v1"
+
+
+def cache_key(kind, *parts):
+    """e.g. cache_key("tts", text, lang, voice) -> "tts/v1/ab/ab12..." """
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f"{kind}/{KEY_VERSION}/{digest[:2]}/{digest}"
+
+
+class MemoryLru:
+    """Byte-bounded LRU with per-entry expiry"""
+
+    def __init__(self, max_bytes, ttl_seconds):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()  # key -> (value, expires_at)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.time() + self.ttl)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+
+    def _remove(self, key):
+        value, _ = self.entries.pop(key)
+        self.size -= len(value)
+
+
+class DiskStore:
+    """Files under a shared directory; evicts least recently read when over the cap"""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_DISK_MAX_MB * 1024 * 1024, ttl_seconds=CACHE_TTL_HOURS * 3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        self.approx_size = None
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            st = os.stat(path)
+            if st.st_mtime + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                value = f.read()
+            # atime is often disabled (noatime), so record reads in mtime;
+            # TTL is therefore measured from the last use, not creation
+            os.utime(path, None)
+            return value
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"Cache read failed for {key}: {e}")
+            return None
+
+    def put(self, key, value):
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers in other processes never see partial files
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Cache write failed for {key}: {e}")
+            return
+        with self.lock:
+            if self.approx_size is None:
+                self.approx_size = self._scan_size()
+            else:
+                self.approx_size += len(value)
+            if self.approx_size > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        # Caller holds self.lock. Trim to 90% so we don't rescan on every put.
+        target = int(self.max_bytes * 0.9)
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        now = time.time()
+        for path, size, mtime in files:
+            if total <= target and mtime + self.ttl >= now:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self.approx_size = total
+
+
+class MinioStore:
+    """Objects in a shared bucket; expiry is checked on read
+
+    Nothing reads the whole bucket to evict by size. Instead, a lifecycle
+    rule installed on startup deletes entries once they are older than the
+    TTL, which bounds the bucket to about one TTL's worth of writes.
+    """
+
+    def __init__(self, client, bucket=CACHE_BUCKET, ttl_seconds=CACHE_TTL_HOURS * 3600, lifecycle=CACHE_LIFECYCLE):
+        self.client = client
+        self.bucket = bucket
+        self.ttl = ttl_seconds
+        try:
+            if not client.bucket_exists(bucket):
+                client.make_bucket(bucket)
+        except Exception as e:
+            print(f"Cache bucket {bucket} unavailable: {e}")
+            return
+        if lifecycle:
+            self.ensure_lifecycle()
+
+    def ensure_lifecycle(self):
+        """Expire entries server-side after the TTL; returns False where lifecycle isn't supported"""
+        from minio.commonconfig import ENABLED, Filter
+        from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+
+        days = max(1, -(-int(self.ttl) // 86400))  # lifecycle granularity is whole days
+        ours = Rule(ENABLED, rule_filter=Filter(prefix=""), rule_id=LIFECYCLE_RULE_ID,
+                    expiration=Expiration(days=days))
+        try:
+            existing = self.client.get_bucket_lifecycle(self.bucket)
+            keep = [r for r in (existing.rules if existing else []) if r.rule_id != LIFECYCLE_RULE_ID]
+            self.client.set_bucket_lifecycle(self.bucket, LifecycleConfig(keep + [ours]))
+        except Exception as e:
+            print(f"Cache bucket {self.bucket}: lifecycle not available ({e}); entries are never deleted")
+            return False
+        return True
+
+    def get(self, key):
+        response = None
+        try:
+            response = self.client.get_object(self.bucket, key)
+            modified = response.headers.get("Last-Modified")
+            if modified:
+                from email.utils import parsedate_to_datetime
+                if parsedate_to_datetime(modified).timestamp() + self.ttl < time.time():
+                    return None
+            return response.read()
+        except Exception:
+            return None
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+
+    def put(self, key, value):
+        try:
+            self.client.put_object(self.bucket, key, io.BytesIO(value), len(value))
+        except Exception as e:
+            print(f"Cache write failed for {key}: {e}")
+
+
+class CacheStats:
+    """Per-job hit/miss counters, one set per cache kind"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def record(self, kind, hit, nbytes=0):
+        with self.lock:
+            c = self.counts.setdefault(kind, {"hits": 0, "misses": 0, "bytesSaved": 0})
+            if hit:
+                c["hits"] += 1
+                c["bytesSaved"] += nbytes
+            else:
+                c["misses"] += 1
+
+    def summary(self):
+        with self.lock:
+            out = {}
+            for kind, c in self.counts.items():
+                total = c["hits"] + c["misses"]
+                out[kind] = dict(c, hitRate=round(c["hits"] / total, 3) if total else 0.0)
+            return out
+
+
+class ContentCache:
+    """In-process LRU in front of an optional shared store"""
+
+    def __init__(self, store=None, memory_bytes=CACHE_MEMORY_MB * 1024 * 1024, ttl_seconds=CACHE_TTL_HOURS * 3600):
+        self.memory = MemoryLru(memory_bytes, ttl_seconds)
+        self.store = store
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def get_or_compute(self, kind, parts, compute, stats=None):
+        """Return cached bytes for (kind, *parts), calling compute() on a miss"""
+        key = cache_key(kind, *parts)
+        value = self.get(key)
+        if stats is not None:
+            stats.record(kind, value is not None, len(value) if value is not None else 0)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def translation(self, text, src, dest, model, translate, stats=None):
+        # model names the engine (e.g. the translation backend), so engines never serve each other's output
+        value = self.get_or_compute("translate", (text, src, dest, model), lambda: translate().encode("utf-8"), stats)
+        return value.decode("utf-8")
+
+
+def create_cache(minio_client=None):
+    if CACHE_STORE == "minio" and minio_client is not None:
+        return ContentCache(MinioStore(minio_client))
+    if CACHE_STORE == "disk":
+        return ContentCache(DiskStore())
+    return ContentCache()
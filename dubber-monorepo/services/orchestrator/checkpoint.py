@@ -0,0 +1,230 @@
+"""
+Per-stage job checkpoints in object storage, so a retried job resumes.
+
+Each job gets a manifest at {CHECKPOINT_PREFIX}{job_id}/manifest.json that
+records which stages have finished and where their outputs are:
+
+    extract     audio.wav                  16 kHz mono ASR input (+ duration)
+    asr         transcript.json            [[start, end, text], ...]
+    segments    segments/{lang}/NNNNN.npz  translated text + time-fitted audio,
+                                           written in batches while dubbing runs
+    mix:{lang}  final_audio.{lang}.wav     the mixed dub track
+    upload:{lang}  -                       the output object exists
+
+Extraction and ASR are shared by all of a job's target languages; the
+later stages are recorded per language.
+
+A redelivered or retried job loads the manifest and skips every stage it
+finds there. Dubbed segments are keyed by their timing and source text, not
+their index, so segments done before a crash are reused even when ASR has
+to run again, and only the missing ones are translated and synthesized.
+
+The manifest also records the job's inputs (source, ASR model); a manifest
+from different inputs is discarded. Checkpoint writes are best
+effort: a failed write is logged and the job carries on without it.
+"""
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from storage import RangedDownload, upload_local_file
+
+# Configuration
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_BUCKET = os.getenv("CHECKPOINT_BUCKET", "dubber-videos")
+CHECKPOINT_PREFIX = os.getenv("CHECKPOINT_PREFIX", "checkpoints/")
+CHECKPOINT_SEGMENT_BATCH = int(os.getenv("CHECKPOINT_SEGMENT_BATCH", "32"))
+CHECKPOINT_FLUSH_SECONDS = float(os.getenv("CHECKPOINT_FLUSH_SECONDS", "30"))
+KEEP_CHECKPOINTS = os.getenv("KEEP_CHECKPOINTS", "false").lower() == "true"
+# Age after which the janitor removes checkpoints of abandoned jobs; well above the
+# longest job and its retries, so running jobs never lose theirs
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", "72"))
+
+MANIFEST_VERSION = 2
+
+
+def segment_key(start, end, text):
+    """Stable id for a transcribed segment across ASR runs"""
+    digest = hashlib.sha1(text.strip().encode("utf-8")).hexdigest()[:16]
+    return f"{start:.2f}-{end:.2f}-{digest}"
+
+
+class JobCheckpoint:
+    def __init__(self, store, job_id, bucket=CHECKPOINT_BUCKET, prefix=CHECKPOINT_PREFIX, enabled=CHECKPOINT_ENABLED):
+        self.store = store
+        self.job_id = job_id
+        self.bucket = bucket
+        self.root = f"{prefix}{job_id}/"
+        self.enabled = enabled
+        self.manifest = None
+        self.lock = threading.Lock()
+        # Segment parts are uploaded off the mixing thread, one at a time and in order
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"checkpoint-{job_id}")
+        self.buffer_lock = threading.Lock()
+        self.pending = {}
+        self.last_flush = {}
+        self.restored = {}
+        self.saved_segments = 0
+
+    def key(self, name):
+        return self.root + name
+
+    # Manifest
+    def load(self, inputs):
+        """Read the manifest for these job inputs; returns the names of finished stages"""
+        self.manifest = {"version": MANIFEST_VERSION, "jobId": self.job_id, "inputs": inputs,
+                         "stages": {}, "segmentParts": {}}
+        if not self.enabled:
+            return []
+        try:
+            existing = json.loads(self.store.get_bytes(self.bucket, self.key("manifest.json")))
+        except Exception:
+            return []
+        if existing.get("version") != MANIFEST_VERSION or existing.get("inputs") != inputs:
+            print(f"Checkpoint for job {self.job_id} was made for other inputs, starting over")
+            return []
+        self.manifest = existing
+        return list(existing["stages"])
+
+    def _save_manifest(self):
+        # Caller holds self.lock, so manifest writes never overtake each other
+        data = json.dumps(self.manifest).encode("utf-8")
+        self.store.put_bytes(self.bucket, self.key("manifest.json"), data, "application/json")
+
+    def done(self, stage):
+        """Info recorded for a finished stage, or None"""
+        return self.manifest["stages"].get(stage) if self.manifest else None
+
+    def mark(self, stage, **info):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.manifest["stages"][stage] = dict(info, at=time.time())
+            try:
+                self._save_manifest()
+            except Exception as e:
+                print(f"Failed to checkpoint stage '{stage}' of job {self.job_id}: {e}")
+
+    # Whole-stage artefacts
+    def save_file(self, stage, name, path, content_type="application/octet-stream", **info):
+        if not self.enabled:
+            return
+        try:
+            upload_local_file(self.store, self.bucket, self.key(name), path, content_type=content_type)
+        except Exception as e:
+            print(f"Failed to checkpoint {name} of job {self.job_id}: {e}")
+            return
+        self.mark(stage, key=self.key(name), **info)
+
+    def fetch_file(self, stage, path):
+        """Download a stage's file to path; False if it's gone"""
+        try:
+            RangedDownload(self.store, self.bucket, self.done(stage)["key"], path).start().wait()
+            return True
+        except Exception as e:
+            print(f"Checkpoint of stage '{stage}' for job {self.job_id} unreadable ({e}), redoing it")
+            return False
+
+    def save_json(self, stage, name, value, **info):
+        if not self.enabled:
+            return
+        try:
+            self.store.put_bytes(self.bucket, self.key(name), json.dumps(value).encode("utf-8"), "application/json")
+        except Exception as e:
+            print(f"Failed to checkpoint {name} of job {self.job_id}: {e}")
+            return
+        self.mark(stage, key=self.key(name), **info)
+
+    def load_json(self, stage):
+        try:
+            return json.loads(self.store.get_bytes(self.bucket, self.done(stage)["key"]))
+        except Exception as e:
+            print(f"Checkpoint of stage '{stage}' for job {self.job_id} unreadable ({e}), redoing it")
+            return None
+
+    # Dubbed segments
+    def load_segments(self, lang):
+        """Segments dubbed into lang by earlier attempts, as {segment_key: (pos_ms, samples, sample_rate, text)}"""
+        restored = {}
+        for key in (self.manifest or {}).get("segmentParts", {}).get(lang, []):
+            try:
+                # Each part["..."] access decompresses that array again: read every array once
+                with np.load(io.BytesIO(self.store.get_bytes(self.bucket, key))) as part:
+                    keys, lengths, positions = part["keys"], part["lengths"], part["positions"]
+                    samples, rates, texts = part["samples"], part["rates"], part["texts"]
+                offsets = np.concatenate([[0], np.cumsum(lengths)])
+                for i, seg in enumerate(keys):
+                    restored[str(seg)] = (int(positions[i]), samples[offsets[i]:offsets[i + 1]],
+                                          int(rates[i]), str(texts[i]))
+            except Exception as e:
+                print(f"Skipping unreadable checkpoint part {key}: {e}")
+        self.restored[lang] = restored
+        return restored
+
+    def add_segment(self, lang, seg_key, pos_ms, samples, sample_rate, text):
+        """Buffer a freshly dubbed segment; uploaded in batches"""
+        if not self.enabled:
+            return
+        with self.buffer_lock:
+            pending = self.pending.setdefault(lang, [])
+            pending.append((seg_key, pos_ms, samples, sample_rate, text))
+            due = (len(pending) >= CHECKPOINT_SEGMENT_BATCH
+                   or time.time() - self.last_flush.setdefault(lang, time.time()) >= CHECKPOINT_FLUSH_SECONDS)
+        if due:
+            self.flush_segments(lang)
+
+    def flush_segments(self, lang, wait=False):
+        with self.buffer_lock:
+            batch = self.pending.pop(lang, None)
+            self.last_flush[lang] = time.time()
+        future = self.writer.submit(self._write_part, lang, batch) if batch else self.writer.submit(lambda: None)
+        if wait:
+            future.result()
+
+    def _write_part(self, lang, batch):
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            keys=np.array([b[0] for b in batch]),
+            positions=np.array([b[1] for b in batch], dtype=np.int64),
+            samples=np.concatenate([np.asarray(b[2], dtype=np.int16).reshape(-1) for b in batch]),
+            lengths=np.array([len(b[2]) for b in batch], dtype=np.int64),
+            rates=np.array([b[3] for b in batch], dtype=np.int64),
+            texts=np.array([b[4] for b in batch]),
+        )
+        with self.lock:
+            parts = self.manifest["segmentParts"].setdefault(lang, [])
+            key = self.key(f"segments/{lang}/{len(parts):05d}.npz")
+            try:
+                self.store.put_bytes(self.bucket, key, buf.getvalue())
+                parts.append(key)
+                self._save_manifest()
+                self.saved_segments += len(batch)
+            except Exception as e:
+                print(f"Failed to checkpoint {len(batch)} segments of job {self.job_id}: {e}")
+
+    def close(self):
+        self.writer.shutdown(wait=True)
+
+    def clear(self):
+        """Drop the job's checkpoints once it completed or failed for good"""
+        self.close()
+        if not self.enabled or KEEP_CHECKPOINTS:
+            return
+        try:
+            self.store.delete_prefix(self.bucket, self.root)
+        except Exception as e:
+            print(f"Failed to remove checkpoints of job {self.job_id}: {e}")
+
+    def stats(self):
+        return {
+            "stagesDone": sorted((self.manifest or {}).get("stages", {})),
+            "segmentsRestored": sum(len(r) for r in self.restored.values()),
+            "segmentsSaved": self.saved_segments,
+        }
@@ -0,0 +1,226 @@
+"""
+Concurrent RabbitMQ consumer for the orchestrator.
+
+Messages are handed to a pool of worker threads and acknowledged only after
+the handler returns, so a job that is still running when the process dies is
+redelivered instead of lost. basic_qos bounds how many unacked jobs a single
+process holds at once.
+
+With a JobScheduler (scheduler.py) the consumer doesn't start jobs in
+arrival order: each message is costed first and started when the scheduler
+admits it, or requeued when it can't be admitted here.
+
+Requeues and retries republish the message with a counter in its headers
+and ack the original: the broker's redelivered flag can't tell a job that
+failed from one that was only given back by admission or by a shutdown.
+A job whose last attempt raised is dropped and handed to on_give_up, so
+its final failure is reported once.
+"""
+import os
+import signal
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+
+# Configuration
+ORCHESTRATOR_WORKERS = int(os.getenv("ORCHESTRATOR_WORKERS", "2"))
+# Unacked messages held per process; defaults to one per worker
+ORCHESTRATOR_PREFETCH = int(os.getenv("ORCHESTRATOR_PREFETCH", "0")) or ORCHESTRATOR_WORKERS
+JOB_QUEUE = os.getenv("JOB_QUEUE", "job.created")
+# Runs of a job whose handler raised before it is dropped, to avoid poison loops
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+
+ATTEMPTS_HEADER = "x-dubber-attempts"  # handler runs that raised
+REQUEUES_HEADER = "x-dubber-requeues"  # times admission gave the job back
+
+
+def _header(properties, name):
+    headers = getattr(properties, "headers", None) or {}
+    return int(headers.get(name, 0))
+
+
+class JobConsumer:
+    """Runs up to `workers` handlers at once on one broker connection
+
+    pika connections are not thread-safe, so workers never touch the channel
+    directly: acks and nacks are scheduled back onto the connection thread
+    with add_callback_threadsafe.
+    """
+
+    def __init__(self, connection_factory, handler, queue=JOB_QUEUE,
+                 workers=ORCHESTRATOR_WORKERS, prefetch=ORCHESTRATOR_PREFETCH, scheduler=None,
+                 on_give_up=None):
+        self.connection_factory = connection_factory
+        self.handler = handler
+        self.on_give_up = on_give_up
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.prefetch = max(self.workers, prefetch)
+        self.scheduler = scheduler
+        if scheduler is not None:
+            # Look past the running jobs so a short one can overtake a long one
+            scheduler.configure(self.workers)
+            self.prefetch += scheduler.lookahead
+        self.connection = None
+        self.channel = None
+        self.consumer_tag = None
+        self.executor = None
+        self.prober = None
+        self.stopping = threading.Event()
+        self.closed = threading.Event()
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+
+    def on_message(self, ch, method, properties, body):
+        with self.lock:
+            self.in_flight += 1
+        if self.scheduler is None:
+            self.executor.submit(self._run, method.delivery_tag, properties, body)
+        else:
+            # Costing probes the source in object storage; keep it off the connection thread
+            self.prober.submit(self._classify, method.delivery_tag, properties, body)
+
+    def _classify(self, delivery_tag, properties, body):
+        self.scheduler.add((delivery_tag, properties, body), self.scheduler.cost_of(body),
+                           requeues=_header(properties, REQUEUES_HEADER))
+
+    def _dispatch(self):
+        while not self.closed.is_set():
+            started, expired = self.scheduler.take(timeout=1, draining=self.stopping.is_set())
+            for (delivery_tag, properties, body), cost in started:
+                self.executor.submit(self._run_admitted, delivery_tag, properties, body, cost)
+            for (delivery_tag, properties, body), cost in expired:
+                if self.stopping.is_set():
+                    self._schedule(self.channel.basic_nack, delivery_tag=delivery_tag, requeue=True)
+                else:
+                    # Didn't fit here in time: another node may have room
+                    self._schedule(self._republish, delivery_tag=delivery_tag, properties=properties,
+                                   body=body, counter=REQUEUES_HEADER)
+                with self.lock:
+                    self.requeued += 1
+                    self.in_flight -= 1
+
+    def _give_up(self, body, error):
+        if self.on_give_up is None:
+            return
+        try:
+            self.on_give_up(body, error)
+        except Exception as e:
+            print(f"Error reporting a dropped job: {e}")
+
+    def _run_admitted(self, delivery_tag, properties, body, cost):
+        try:
+            self._run(delivery_tag, properties, body)
+        finally:
+            self.scheduler.release(cost)
+
+    def _run(self, delivery_tag, properties, body):
+        try:
+            if self.stopping.is_set():
+                # Prefetched but not started: give it back to another consumer
+                self._schedule(self.channel.basic_nack, delivery_tag=delivery_tag, requeue=True)
+                with self.lock:
+                    self.requeued += 1
+                return
+            try:
+                self.handler(body)
+            except Exception as e:
+                # The handler reports permanent job failures itself; what reaches
+                # here is worth another run. Retry up to JOB_MAX_ATTEMPTS, then drop.
+                attempts = _header(properties, ATTEMPTS_HEADER) + 1
+                print(f"Error in job handler (attempt {attempts}/{JOB_MAX_ATTEMPTS}): {e}")
+                if attempts < JOB_MAX_ATTEMPTS:
+                    self._schedule(self._republish, delivery_tag=delivery_tag, properties=properties,
+                                   body=body, counter=ATTEMPTS_HEADER)
+                else:
+                    self._schedule(self.channel.basic_nack, delivery_tag=delivery_tag, requeue=False)
+                    self._give_up(body, e)
+                with self.lock:
+                    self.failed += 1
+                return
+            self._schedule(self.channel.basic_ack, delivery_tag=delivery_tag)
+            with self.lock:
+                self.completed += 1
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _republish(self, delivery_tag, properties, body, counter):
+        """Requeue a copy with counter incremented, then ack the original (connection thread)"""
+        headers = dict(getattr(properties, "headers", None) or {})
+        headers[counter] = int(headers.get(counter, 0)) + 1
+        copy = pika.BasicProperties(
+            content_type=getattr(properties, "content_type", None),
+            delivery_mode=2,  # persistent
+            headers=headers,
+        )
+        self.channel.basic_publish(exchange="", routing_key=self.queue, body=body, properties=copy)
+        self.channel.basic_ack(delivery_tag=delivery_tag)
+
+    def _schedule(self, fn, **kwargs):
+        self.connection.add_callback_threadsafe(functools.partial(fn, **kwargs))
+
+    def stop(self, *args):
+        """Stop taking new jobs; in-flight jobs finish and are acked"""
+        if not self.stopping.is_set():
+            print("Shutdown requested, draining in-flight jobs...")
+            self.stopping.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run(self):
+        self.connection = self.connection_factory()
+        self.channel = self.connection.channel()
+        self.channel.queue_declare(queue=self.queue, durable=True)
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        dispatcher = None
+        if self.scheduler is not None:
+            self.prober = ThreadPoolExecutor(max_workers=2, thread_name_prefix="probe")
+            dispatcher = threading.Thread(target=self._dispatch, name="scheduler", daemon=True)
+            dispatcher.start()
+        self.consumer_tag = self.channel.basic_consume(queue=self.queue, on_message_callback=self.on_message)
+        print(f"Consuming '{self.queue}' with {self.workers} workers (prefetch={self.prefetch})")
+
+        try:
+            while not self.stopping.is_set():
+                self.connection.process_data_events(time_limit=1)
+
+            self.channel.basic_cancel(self.consumer_tag)
+            # Keep servicing the connection so worker acks still go out
+            while True:
+                with self.lock:
+                    if self.in_flight == 0:
+                        break
+                self.connection.process_data_events(time_limit=1)
+            self.connection.process_data_events(time_limit=0)
+        finally:
+            self.closed.set()
+            if dispatcher is not None:
+                dispatcher.join()
+                self.prober.shutdown(wait=True)
+            self.executor.shutdown(wait=True)
+            try:
+                self.connection.close()
+            except Exception as e:
+                print(f"Error closing broker connection: {e}")
+        print(f"Consumer stopped: {self.stats()}")
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                "completed": self.completed,
+                "failed": self.failed,
+                "requeued": self.requeued,
+                "inFlight": self.in_flight,
+            }
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        return stats
@@ -0,0 +1,112 @@
+"""
+Multi-language jobs: transcribe once, dub into every target language.
+
+A job may ask for several target languages (a `targetLanguages` list in the
+message or its options, or a comma-separated `targetLanguage`). Download,
+extraction and ASR run once. SharedSegments replays the ASR stream to one
+reader per language, so each language's translate/TTS/mix pipeline starts
+while ASR is still running, and the languages are dubbed, muxed and
+uploaded in parallel.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import cpu_now
+
+# Configuration
+MAX_TARGET_LANGUAGES = int(os.getenv("MAX_TARGET_LANGUAGES", "8"))
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "0"))  # languages dubbed at once; 0: all of them
+
+
+def parse_target_languages(job_data, options=None):
+    """Ordered, de-duplicated target languages of a job message"""
+    langs = job_data.get("targetLanguages") or (options or {}).get("targetLanguages")
+    if not langs:
+        langs = job_data.get("targetLanguage") or ""
+    if isinstance(langs, str):
+        langs = langs.split(",")
+    seen = []
+    for lang in langs:
+        lang = str(lang).strip()
+        if lang and lang not in seen:
+            seen.append(lang)
+    if len(seen) > MAX_TARGET_LANGUAGES:
+        print(f"Job asks for {len(seen)} languages, dubbing the first {MAX_TARGET_LANGUAGES}")
+        seen = seen[:MAX_TARGET_LANGUAGES]
+    return seen
+
+
+class SharedSegments:
+    """Consumes one segment iterator on a thread and replays it to any number of readers
+
+    Segments are kept in memory (they are only timings and text), so a slow
+    reader never holds back ASR or the other readers.
+    """
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.seconds = 0.0
+        self.cpu = 0.0
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._feed, name="asr-shared", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _feed(self):
+        started = time.time()
+        cpu0 = cpu_now()
+        try:
+            for segment in self.segments:
+                with self.cond:
+                    self.items.append(segment)
+                    self.cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self.cond:
+                self.seconds = time.time() - started
+                self.cpu = cpu_now() - cpu0
+                self.finished = True
+                self.cond.notify_all()
+
+    def reader(self):
+        """A fresh iterator over every segment, blocking until ASR produces the next one"""
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.items) and not self.finished:
+                    self.cond.wait()
+                if i < len(self.items):
+                    segment = self.items[i]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield segment
+            i += 1
+
+    def wait(self):
+        self.thread.join()
+        return len(self.items)
+
+
+def run_languages(languages, dub_fn, workers=FANOUT_WORKERS):
+    """Call dub_fn(lang) for every language in parallel; returns {lang: (result, error)}"""
+    workers = workers or len(languages)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(languages))), thread_name_prefix="lang") as pool:
+        futures = {lang: pool.submit(dub_fn, lang) for lang in languages}
+        for lang, future in futures.items():
+            try:
+                results[lang] = (future.result(), None)
+            except Exception as e:
+                print(f"Dubbing into '{lang}' failed: {e}")
+                results[lang] = (None, e)
+    return results
@@ -0,0 +1,262 @@
+"""
+Scheduled cleanup of old processed files in MinIO.
+
+This used to run at the end of every job, listing every dubbed_ object
+and deleting them one request at a time, so job latency grew with the
+bucket. The janitor runs on its own schedule instead. Each run scans at
+most JANITOR_MAX_OBJECTS_PER_RUN keys, starting after the key where the
+previous run stopped (the cursor is checkpointed in the bucket, so
+restarts and other replicas resume rather than rescan). Expired keys are
+deleted in batched DeleteObjects requests under a rate limit. Where the
+store supports it, a bucket lifecycle rule expires the same objects
+server-side and the sweep only catches what it hasn't reached yet.
+
+Checkpoints of abandoned jobs (checkpoint.py) are swept by a second
+janitor with its own retention, CHECKPOINT_MAX_AGE_HOURS. Each janitor
+keeps its own cursor and lifecycle rule, derived from its prefix.
+
+Run standalone with `python janitor.py`, or in a background thread of
+the orchestrator (JANITOR_ENABLED).
+"""
+import io
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+from checkpoint import CHECKPOINT_BUCKET, CHECKPOINT_ENABLED, CHECKPOINT_MAX_AGE_HOURS, CHECKPOINT_PREFIX
+
+# Configuration
+JANITOR_ENABLED = os.getenv("JANITOR_ENABLED", os.getenv("CLEANUP_PROCESSED_FILES", "false")).lower() == "true"
+JANITOR_BUCKET = os.getenv("JANITOR_BUCKET", "dubber-videos")
+JANITOR_PREFIX = os.getenv("JANITOR_PREFIX", "dubbed_")
+JANITOR_MAX_AGE_MINUTES = int(os.getenv("JANITOR_MAX_AGE_MINUTES", os.getenv("CLEANUP_AFTER_MINUTES", "60")))
+JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "300"))
+JANITOR_MAX_OBJECTS_PER_RUN = int(os.getenv("JANITOR_MAX_OBJECTS_PER_RUN", "10000"))
+JANITOR_BATCH_SIZE = min(1000, int(os.getenv("JANITOR_BATCH_SIZE", "500")))  # S3 caps DeleteObjects at 1000
+JANITOR_DELETES_PER_SECOND = float(os.getenv("JANITOR_DELETES_PER_SECOND", "1000"))
+# Defaults to one derived from the prefix (cursor_key_for)
+JANITOR_CURSOR_KEY = os.getenv("JANITOR_CURSOR_KEY") or None
+JANITOR_LIFECYCLE = os.getenv("JANITOR_LIFECYCLE", "true").lower() == "true"
+JANITOR_CHECKPOINTS = os.getenv("JANITOR_CHECKPOINTS", "true").lower() == "true"
+
+PROCESSED_PREFIX = "dubbed_"
+LIFECYCLE_RULE_ID = "dubber-expire-processed"
+LIFECYCLE_MULTIPART_RULE_ID = "dubber-abort-incomplete-uploads"
+
+
+def _slug(prefix):
+    return re.sub(r"[^A-Za-z0-9]+", "-", prefix).strip("-") or "all"
+
+
+def cursor_key_for(prefix):
+    """Listing cursor of the janitor sweeping prefix; janitors of other prefixes keep their own"""
+    if prefix == PROCESSED_PREFIX:
+        return "_janitor/cursor.json"
+    return f"_janitor/{_slug(prefix)}/cursor.json"
+
+
+def lifecycle_rule_id(prefix):
+    """Expiry rule of the janitor sweeping prefix, so janitors don't replace each other's rules"""
+    if prefix == PROCESSED_PREFIX:
+        return LIFECYCLE_RULE_ID
+    return f"dubber-expire-{_slug(prefix)}"
+
+
+class RateLimiter:
+    """Spaces out work to at most rate units per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+
+    def acquire(self, units=1):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + units * self.interval
+
+
+class StorageJanitor:
+    def __init__(self, client, bucket=JANITOR_BUCKET, prefix=JANITOR_PREFIX, max_age_minutes=JANITOR_MAX_AGE_MINUTES,
+                 max_objects=JANITOR_MAX_OBJECTS_PER_RUN, batch_size=JANITOR_BATCH_SIZE,
+                 deletes_per_second=JANITOR_DELETES_PER_SECOND, cursor_key=JANITOR_CURSOR_KEY):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_age = timedelta(minutes=max_age_minutes)
+        self.max_objects = max_objects
+        self.batch_size = max(1, batch_size)
+        self.limiter = RateLimiter(deletes_per_second)
+        self.cursor_key = cursor_key or cursor_key_for(prefix)
+        self.rule_id = lifecycle_rule_id(prefix)
+        self.stopping = threading.Event()
+        self.totals = {"runs": 0, "deleted": 0, "bytesReclaimed": 0, "errors": 0}
+
+    # Cursor checkpoint, stored next to the objects it tracks
+    def load_cursor(self):
+        try:
+            response = self.client.get_object(self.bucket, self.cursor_key)
+            try:
+                return json.loads(response.read()).get("startAfter") or None
+            finally:
+                response.close()
+                response.release_conn()
+        except Exception:
+            return None
+
+    def save_cursor(self, start_after):
+        data = json.dumps({"startAfter": start_after or "", "savedAt": datetime.now(timezone.utc).isoformat()}).encode()
+        try:
+            self.client.put_object(self.bucket, self.cursor_key, io.BytesIO(data), len(data),
+                                   content_type="application/json")
+        except Exception as e:
+            print(f"Janitor: failed to save cursor: {e}")
+
+    def ensure_lifecycle(self, max_age_minutes=None):
+        """Install expiry rules on the bucket; returns False where lifecycle isn't supported"""
+        from minio.commonconfig import ENABLED, Filter
+        from minio.lifecycleconfig import AbortIncompleteMultipartUpload, Expiration, LifecycleConfig, Rule
+
+        minutes = max_age_minutes if max_age_minutes is not None else self.max_age.total_seconds() / 60
+        days = max(1, -(-int(minutes) // 1440))  # lifecycle granularity is whole days
+        ours = [
+            Rule(ENABLED, rule_filter=Filter(prefix=self.prefix), rule_id=self.rule_id,
+                 expiration=Expiration(days=days)),
+            Rule(ENABLED, rule_filter=Filter(prefix=""), rule_id=LIFECYCLE_MULTIPART_RULE_ID,
+                 abort_incomplete_multipart_upload=AbortIncompleteMultipartUpload(days_after_initiation=1)),
+        ]
+        try:
+            existing = self.client.get_bucket_lifecycle(self.bucket)
+            keep = [r for r in (existing.rules if existing else [])
+                    if r.rule_id not in (self.rule_id, LIFECYCLE_MULTIPART_RULE_ID)]
+            self.client.set_bucket_lifecycle(self.bucket, LifecycleConfig(keep + ours))
+        except Exception as e:
+            print(f"Janitor: bucket lifecycle not available ({e}); relying on sweeps")
+            return False
+        print(f"Janitor: lifecycle expires {self.prefix}* after {days} day(s)")
+        return True
+
+    def _delete_batch(self, batch, report):
+        self.limiter.acquire(len(batch))
+        failed = set()
+        try:
+            from minio.deleteobjects import DeleteObject
+            # remove_objects is lazy: errors only arrive while iterating
+            for error in self.client.remove_objects(self.bucket, [DeleteObject(name) for name, _ in batch]):
+                failed.add(error.name)
+                print(f"Janitor: failed to delete {error.name}: {error.message}")
+        except Exception as e:
+            print(f"Janitor: batch delete failed: {e}")
+            report["errors"] += len(batch)
+            return
+        report["errors"] += len(failed)
+        for name, size in batch:
+            if name not in failed:
+                report["deleted"] += 1
+                report["bytesReclaimed"] += size
+
+    def run_once(self):
+        """One bounded sweep; returns what was scanned and reclaimed"""
+        started = time.time()
+        cutoff = datetime.now(timezone.utc) - self.max_age
+        cursor = self.load_cursor()
+        report = {"bucket": self.bucket, "startAfter": cursor, "scanned": 0, "deleted": 0,
+                  "bytesReclaimed": 0, "errors": 0, "wrapped": False}
+        batch = []
+        last_key = cursor
+        try:
+            objects = self.client.list_objects(self.bucket, prefix=self.prefix, recursive=True, start_after=cursor)
+            for obj in objects:
+                if self.stopping.is_set() or report["scanned"] >= self.max_objects:
+                    break
+                report["scanned"] += 1
+                last_key = obj.object_name
+                modified = obj.last_modified
+                if modified is not None and modified.tzinfo is None:
+                    modified = modified.replace(tzinfo=timezone.utc)
+                if modified is not None and modified < cutoff:
+                    batch.append((obj.object_name, obj.size or 0))
+                    if len(batch) >= self.batch_size:
+                        self._delete_batch(batch, report)
+                        batch = []
+            else:
+                # Reached the end of the listing; the next run starts over
+                report["wrapped"] = True
+                last_key = None
+            if batch:
+                self._delete_batch(batch, report)
+        except Exception as e:
+            print(f"Janitor: listing {self.bucket} failed: {e}")
+            report["errors"] += 1
+        self.save_cursor(last_key)
+        report["nextStartAfter"] = last_key
+        report["seconds"] = round(time.time() - started, 3)
+        self.totals["runs"] += 1
+        for key in ("deleted", "bytesReclaimed", "errors"):
+            self.totals[key] += report[key]
+        return report
+
+    def run_forever(self, interval=JANITOR_INTERVAL_SECONDS, lifecycle=JANITOR_LIFECYCLE):
+        if lifecycle:
+            self.ensure_lifecycle()
+        while not self.stopping.is_set():
+            report = self.run_once()
+            if report["deleted"] or report["errors"]:
+                print(f"Janitor: {json.dumps(report)}")
+            # A partial sweep means there is more to scan; carry on after a short pause
+            self.stopping.wait(interval if report["wrapped"] else min(interval, 5.0))
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, name=f"storage-janitor-{_slug(self.prefix)}", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopping.set()
+
+
+def checkpoint_janitor(client):
+    """Janitor for checkpoints left by jobs that were abandoned mid-run"""
+    return StorageJanitor(client, bucket=CHECKPOINT_BUCKET, prefix=CHECKPOINT_PREFIX,
+                          max_age_minutes=CHECKPOINT_MAX_AGE_HOURS * 60, cursor_key=cursor_key_for(CHECKPOINT_PREFIX))
+
+
+def start_janitors(client):
+    """Start the processed-files janitor, plus the checkpoint one (JANITOR_CHECKPOINTS)"""
+    janitors = [StorageJanitor(client)]
+    if JANITOR_CHECKPOINTS and CHECKPOINT_ENABLED:
+        janitors.append(checkpoint_janitor(client))
+    for janitor in janitors:
+        janitor.start()
+    return janitors
+
+
+def main():
+    from minio import Minio
+    client = Minio(
+        os.getenv("MINIO_ENDPOINT", "localhost:9000"),
+        access_key=os.getenv("MINIO_ACCESS_KEY", "minio"),
+        secret_key=os.getenv("MINIO_SECRET_KEY", "minio123"),
+        secure=False,
+    )
+    janitors = start_janitors(client)
+    for janitor in janitors:
+        print(f"Storage janitor sweeping {janitor.bucket}/{janitor.prefix}* every {JANITOR_INTERVAL_SECONDS:.0f}s")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for janitor in janitors:
+            janitor.stop()
+    for janitor in janitors:
+        print(f"Janitor totals ({janitor.prefix}): {janitor.totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Adaptive concurrency limits for the translate and TTS backends.
+
+Each backend gets one AdaptiveLimiter per orchestrator process, shared by
+every running job, so two jobs can't each assume they have the backend to
+themselves. The limit follows AIMD, like TCP congestion control:
+
+- every call that comes back fast while the limit was in use raises the
+  limit by 1/limit (about +1 per round trip)
+- a throttled call (429/503, timeouts), a server error, or latency rising
+  to LIMIT_LATENCY_TOLERANCE times the no-load baseline cuts it by
+  LIMIT_BACKOFF, at most once per round trip
+
+The no-load baseline is the lowest latency seen, drifting up slowly so a
+backend that became slower for good is followed.
+"""
+import os
+import time
+import threading
+
+# Configuration
+ADAPTIVE_CONCURRENCY = os.getenv("ADAPTIVE_CONCURRENCY", "true").lower() == "true"  # false: fixed limits
+LIMIT_LATENCY_TOLERANCE = float(os.getenv("LIMIT_LATENCY_TOLERANCE", "2.0"))
+LIMIT_BACKOFF = float(os.getenv("LIMIT_BACKOFF", "0.7"))
+
+LATENCY_SMOOTHING = 0.2  # weight of the newest call in the latency average
+BASELINE_DRIFT = 0.002  # per call, so the baseline can recover from one lucky fast call
+MIN_SAMPLES = 10  # calls before latency may lower the limit
+THROTTLE_STATUS = (429, 503)
+
+
+def classify(error):
+    """'throttled', 'rejected' (the request's own fault, says nothing about load) or 'error'"""
+    response = getattr(error, "response", None)  # requests
+    if response is None:
+        response = getattr(error, "rsp", None)  # gTTS
+    status = getattr(response, "status_code", None)
+    if status in THROTTLE_STATUS or "timeout" in type(error).__name__.lower():
+        return "throttled"
+    if status is not None and 400 <= status < 500:
+        return "rejected"
+    return "error"
+
+
+class AdaptiveLimiter:
+    def __init__(self, name, initial, max_limit, min_limit=1, adaptive=ADAPTIVE_CONCURRENCY,
+                 tolerance=LIMIT_LATENCY_TOLERANCE, backoff=LIMIT_BACKOFF):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.latency = None
+        self.baseline = None
+        self.last_decrease = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.increases = 0
+        self.decreases = 0
+        self.waited = 0.0
+
+    def acquire(self):
+        started = time.monotonic()
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.waited += time.monotonic() - started
+
+    def release(self, latency, outcome="ok"):
+        with self.cond:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.calls += 1
+            if outcome == "throttled":
+                self.throttled += 1
+            elif outcome != "ok":
+                self.errors += 1
+            if outcome == "ok":
+                self._observe(latency)
+            if self.adaptive:
+                if outcome in ("throttled", "error") or self._too_slow():
+                    self._decrease()
+                elif outcome == "ok" and saturated and self.limit < self.max_limit:
+                    # Only grow a limit that is actually used, or an idle backend would
+                    # collect a large limit it never proved it can take
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                    self.increases += 1
+            self.cond.notify_all()
+
+    def _observe(self, latency):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline = min(self.latency, self.baseline * (1 + BASELINE_DRIFT))
+
+    def _too_slow(self):
+        return (self.calls >= MIN_SAMPLES and self.baseline
+                and self.latency > self.tolerance * self.baseline)
+
+    def _decrease(self):
+        # Calls in flight when the backend pushed back all saw the same overload; cut once per round trip
+        now = time.monotonic()
+        if now - self.last_decrease < (self.latency or 0.0):
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.decreases += 1
+
+    def call(self, fn):
+        """Run fn() once a slot is free, feeding its outcome back into the limit"""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            self.release(time.monotonic() - started, classify(e))
+            raise
+        self.release(time.monotonic() - started)
+        return result
+
+    def stats(self):
+        with self.cond:
+            return {
+                "limit": round(self.limit, 2),
+                "inFlight": self.in_flight,
+                "peakInFlight": self.peak_in_flight,
+                "calls": self.calls,
+                "errors": self.errors,
+                "throttled": self.throttled,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "latencyMs": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "baselineMs": round(self.baseline * 1000, 1) if self.baseline is not None else None,
+                "waitedSeconds": round(self.waited, 3),
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, initial, max_limit, min_limit=1):
+    """Process-wide limiter for a backend; the first caller's budget wins"""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name, initial, max_limit, min_limit)
+        return _limiters[name]
+
+
+def limiter_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
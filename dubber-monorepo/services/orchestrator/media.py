@@ -0,0 +1,212 @@
+"""
+ffmpeg helpers for the dubbing pipeline.
+
+Only the audio track changes during dubbing, so the output is produced by
+copying the original video stream and encoding just the new audio, instead
+of decoding and re-encoding every frame through MoviePy. Audio for Whisper
+is decoded straight to 16 kHz mono PCM in the same spirit.
+"""
+import os
+import re
+import shutil
+import threading
+import subprocess
+
+from metrics import child_cpu
+
+# Configuration
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "")
+MUX_AUDIO_CODEC = os.getenv("MUX_AUDIO_CODEC", "aac")
+MUX_AUDIO_BITRATE = os.getenv("MUX_AUDIO_BITRATE", "192k")
+# Pipe the muxed output straight into the upload (fragmented MP4, no local copy)
+MUX_STREAM_UPLOAD = os.getenv("MUX_STREAM_UPLOAD", "true").lower() == "true"
+PIPE_CHUNK = 1024 * 1024
+ASR_SAMPLE_RATE = 16000
+
+DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class MediaError(Exception):
+    pass
+
+
+def ffmpeg_binary():
+    if FFMPEG_BINARY:
+        return FFMPEG_BINARY
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+    # MoviePy ships a static ffmpeg through imageio-ffmpeg
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def wait_child(process, cpu):
+    """process.wait(), adding the child's CPU time (rusage from wait4) to cpu, a metrics.ChildCpu"""
+    if not hasattr(os, "wait4"):
+        return process.wait()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait()  # already reaped by poll()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    cpu.add(usage.ru_utime + usage.ru_stime)
+    return process.returncode
+
+
+def _run(cmd):
+    """(returncode, stderr) of cmd; its CPU time counts toward the calling thread's span"""
+    cpu = child_cpu()
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        stderr = process.stderr.read()
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stderr.close()
+        returncode = wait_child(process, cpu)
+    return returncode, stderr
+
+
+def run_ffmpeg(args):
+    cmd = [ffmpeg_binary(), "-hide_banner", "-nostdin", "-y"] + args
+    returncode, stderr = _run(cmd)
+    if returncode != 0:
+        tail = stderr.decode("utf-8", "replace").strip().splitlines()[-5:]
+        raise MediaError(f"ffmpeg failed ({returncode}): {' | '.join(tail)}")
+
+
+def probe_duration(path):
+    """Container duration in seconds, read from ffmpeg's input banner"""
+    _, stderr = _run([ffmpeg_binary(), "-hide_banner", "-nostdin", "-i", path])
+    match = DURATION_RE.search(stderr.decode("utf-8", "replace"))
+    if not match:
+        raise MediaError(f"Could not read duration of {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def extract_asr_audio(video_path, wav_path, sample_rate=ASR_SAMPLE_RATE):
+    """Decode the first audio track to mono 16-bit PCM WAV at Whisper's rate"""
+    run_ffmpeg([
+        "-i", video_path,
+        "-map", "0:a:0", "-vn",
+        "-ac", "1", "-ar", str(sample_rate),
+        "-c:a", "pcm_s16le", "-f", "wav",
+        wav_path,
+    ])
+    return wav_path
+
+
+def mux_audio(video_path, audio_path, output_path):
+    """Replace the audio track, stream-copying the video"""
+    run_ffmpeg([
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", MUX_AUDIO_CODEC, "-b:a", MUX_AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        output_path,
+    ])
+    return output_path
+
+
+class StreamingExtraction:
+    """extract_asr_audio fed through stdin while the source is still arriving
+
+    chunks is any iterator of bytes (e.g. RangedDownload.iter_chunks()).
+    MP4s whose index (moov) is at the end can't be demuxed from a pipe; wait()
+    raises MediaError for those and the caller extracts from the file instead.
+    """
+
+    def __init__(self, chunks, wav_path, sample_rate=ASR_SAMPLE_RATE):
+        self.wav_path = wav_path
+        cmd = [ffmpeg_binary(), "-hide_banner", "-y",
+               "-i", "pipe:0",
+               "-map", "0:a:0", "-vn",
+               "-ac", "1", "-ar", str(sample_rate),
+               "-c:a", "pcm_s16le", "-f", "wav",
+               wav_path]
+        self.cpu = child_cpu()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self.feed_error = None
+        self.stderr = b""
+        self.feeder = threading.Thread(target=self._feed, args=(chunks,), name="extract-feed", daemon=True)
+        self.reader = threading.Thread(target=self._read_stderr, name="extract-stderr", daemon=True)
+        self.feeder.start()
+        self.reader.start()
+
+    def _feed(self, chunks):
+        try:
+            for data in chunks:
+                self.process.stdin.write(data)
+        except BrokenPipeError:
+            pass  # ffmpeg gave up (or finished); its exit code tells us which
+        except Exception as e:
+            self.feed_error = e
+            self.process.kill()
+        finally:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+    def _read_stderr(self):
+        self.stderr = self.process.stderr.read()
+
+    def wait(self):
+        returncode = wait_child(self.process, self.cpu)
+        self.feeder.join()
+        self.reader.join()
+        if self.feed_error is not None:
+            raise MediaError(f"Source stream failed: {self.feed_error}")
+        if returncode != 0:
+            tail = self.stderr.decode("utf-8", "replace").strip().splitlines()[-5:]
+            raise MediaError(f"ffmpeg failed ({returncode}): {' | '.join(tail)}")
+        return self.wav_path
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        wait_child(self.process, self.cpu)
+
+
+def mux_audio_to_stream(video_path, audio_path, sink):
+    """mux_audio, writing a fragmented MP4 to sink.write() as ffmpeg produces it
+
+    faststart needs a seekable output, so the streamed file is fragmented
+    instead; browsers and players start it just as quickly.
+    """
+    cmd = [ffmpeg_binary(), "-hide_banner", "-nostdin", "-y",
+           "-i", video_path,
+           "-i", audio_path,
+           "-map", "0:v:0", "-map", "1:a:0",
+           "-c:v", "copy",
+           "-c:a", MUX_AUDIO_CODEC, "-b:a", MUX_AUDIO_BITRATE,
+           "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+           "-f", "mp4", "pipe:1"]
+    cpu = child_cpu()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    written = 0
+    try:
+        while True:
+            data = process.stdout.read(PIPE_CHUNK)
+            if not data:
+                break
+            sink.write(data)
+            written += len(data)
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        returncode = wait_child(process, cpu)
+        reader.join()
+    if returncode != 0:
+        tail = b"".join(stderr).decode("utf-8", "replace").strip().splitlines()[-5:]
+        raise MediaError(f"ffmpeg failed ({returncode}): {' | '.join(tail)}")
+    return written
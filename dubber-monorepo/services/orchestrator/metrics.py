@@ -0,0 +1,256 @@
+"""
+Per-stage timing for dubbing jobs.
+
+Every job records spans for its stages (wall time, CPU time, bytes moved,
+segments handled). Spans feed Prometheus metrics when prometheus_client is
+installed, a JSON timing report stored next to the job's output, and the
+per-stage throughput history that ProgressTracker uses to predict the time
+remaining.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Configuration
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9400"))  # 0 disables the /metrics endpoint
+# Weight of the newest job in the per-stage throughput average
+ETR_SMOOTHING = float(os.getenv("ETR_SMOOTHING", "0.3"))
+
+# Stages that run one after another; their summed wall time is the job's wall time
+SEQUENTIAL_STAGES = ["download", "extract", "vad", "model_load", "dubbing", "mix", "mux", "upload"]
+# Stages measured inside "dubbing", which overlap each other
+PIPELINE_STAGES = ["asr", "translate", "tts", "stretch"]
+
+# Seconds of processing per second of media, used until real history exists.
+# Roughly the old "processing takes as long as the video" heuristic.
+DEFAULT_SECONDS_PER_MEDIA_SECOND = {
+    "download": 0.01,
+    "extract": 0.01,
+    "vad": 0.001,
+    "model_load": 0.0,
+    "dubbing": 0.9,
+    "mix": 0.01,
+    "mux": 0.02,
+    "upload": 0.01,
+}
+
+try:
+    from prometheus_client import Counter, Histogram, start_http_server
+    STAGE_SECONDS = Histogram(
+        "dubber_stage_seconds", "Wall time per job stage", ["stage"],
+        buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200),
+    )
+    STAGE_CPU = Counter("dubber_stage_cpu_seconds_total", "CPU time per job stage", ["stage"])
+    STAGE_BYTES = Counter("dubber_stage_bytes_total", "Bytes processed per job stage", ["stage"])
+    STAGE_SEGMENTS = Counter("dubber_stage_segments_total", "Segments processed per job stage", ["stage"])
+    MEDIA_SECONDS = Counter("dubber_media_seconds_total", "Seconds of media processed")
+except ImportError:
+    start_http_server = None
+
+
+def start_metrics_server(port=METRICS_PORT):
+    if not port:
+        return
+    if start_http_server is None:
+        print("prometheus_client not installed; /metrics disabled")
+        return
+    start_http_server(port)
+    print(f"Prometheus metrics on :{port}/metrics")
+
+
+class ChildCpu:
+    """CPU seconds of the subprocesses one thread started, added as they are reaped"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.seconds += seconds
+
+
+_local = threading.local()
+
+
+def child_cpu():
+    """The calling thread's ChildCpu; take it before starting a subprocess and add its rusage on exit"""
+    holder = getattr(_local, "child_cpu", None)
+    if holder is None:
+        holder = _local.child_cpu = ChildCpu()
+    return holder
+
+
+def cpu_now():
+    # Thread CPU plus the ffmpeg processes this thread started. Process-wide
+    # RUSAGE_CHILDREN would credit one job's ffmpeg to whichever span of
+    # another job happens to be open.
+    return time.thread_time() + child_cpu().seconds
+
+
+class StageStats:
+    __slots__ = ("wall", "cpu", "bytes", "segments", "calls", "started", "ended")
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes = 0
+        self.segments = 0
+        self.calls = 0
+        self.started = None
+        self.ended = None
+
+    def as_dict(self):
+        return {
+            "wallSeconds": round(self.wall, 3),
+            "cpuSeconds": round(self.cpu, 3),
+            "bytes": self.bytes,
+            "segments": self.segments,
+            "calls": self.calls,
+        }
+
+
+class JobTimings:
+    """Stage measurements for one job; safe to record from worker threads"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.time()
+        self.media_seconds = 0.0
+        self.stages = {}
+        self.current = None
+        self.current_started = None
+        self.extra = {}
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        with self.lock:
+            return self.stages.setdefault(name, StageStats())
+
+    @contextmanager
+    def span(self, name, nbytes=0, segments=0):
+        """Time a sequential stage; yields the StageStats so callers can add bytes later"""
+        stats = self.stage(name)
+        wall0 = time.perf_counter()
+        cpu0 = cpu_now()
+        with self.lock:
+            self.current = name
+            self.current_started = time.time()
+            if stats.started is None:
+                stats.started = self.current_started
+        try:
+            yield stats
+        finally:
+            self.record(name, time.perf_counter() - wall0, cpu_now() - cpu0, nbytes, segments)
+            with self.lock:
+                stats.ended = time.time()
+                if self.current == name:
+                    self.current = None
+
+    def record(self, name, wall, cpu=0.0, nbytes=0, segments=0):
+        """Add one measurement (e.g. a single segment's translation) to a stage"""
+        stats = self.stage(name)
+        with self.lock:
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.bytes += nbytes
+            stats.segments += segments
+            stats.calls += 1
+        if start_http_server is not None:
+            STAGE_SECONDS.labels(name).observe(wall)
+            STAGE_CPU.labels(name).inc(max(0.0, cpu))
+            STAGE_BYTES.labels(name).inc(nbytes)
+            STAGE_SEGMENTS.labels(name).inc(segments)
+
+    @contextmanager
+    def measure(self, name, nbytes=0, segments=1):
+        """Time a call from a worker thread and add it to a (possibly overlapping) stage"""
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - wall0, time.thread_time() - cpu0, nbytes, segments)
+
+    def add_bytes(self, name, nbytes):
+        stats = self.stage(name)
+        with self.lock:
+            stats.bytes += nbytes
+        if start_http_server is not None:
+            STAGE_BYTES.labels(name).inc(nbytes)
+
+    def report(self):
+        with self.lock:
+            stages = {name: s.as_dict() for name, s in self.stages.items()}
+        total = time.time() - self.started
+        for name, s in stages.items():
+            if self.media_seconds and name in SEQUENTIAL_STAGES:
+                s["secondsPerMediaSecond"] = round(s["wallSeconds"] / self.media_seconds, 4)
+            if s["wallSeconds"] > 0 and s["bytes"]:
+                s["bytesPerSecond"] = int(s["bytes"] / s["wallSeconds"])
+        report = {
+            "jobId": self.job_id,
+            "mediaSeconds": round(self.media_seconds, 3),
+            "wallSeconds": round(total, 3),
+            "realtimeFactor": round(total / self.media_seconds, 4) if self.media_seconds else None,
+            "stages": stages,
+        }
+        report.update(self.extra)
+        return report
+
+
+class ThroughputModel:
+    """Smoothed seconds-per-media-second for each sequential stage, across jobs"""
+
+    def __init__(self, smoothing=ETR_SMOOTHING):
+        self.smoothing = smoothing
+        self.rates = dict(DEFAULT_SECONDS_PER_MEDIA_SECOND)
+        self.observed = set()
+        self.lock = threading.Lock()
+
+    def observe(self, timings):
+        """Learn from a finished job"""
+        if not timings.media_seconds:
+            return
+        if start_http_server is not None:
+            MEDIA_SECONDS.inc(timings.media_seconds)
+        with timings.lock:
+            walls = {name: s.wall for name, s in timings.stages.items() if name in SEQUENTIAL_STAGES}
+        with self.lock:
+            for name, wall in walls.items():
+                rate = wall / timings.media_seconds
+                if name in self.observed:
+                    self.rates[name] += self.smoothing * (rate - self.rates[name])
+                else:
+                    self.rates[name] = rate
+                    self.observed.add(name)
+
+    def estimate_remaining(self, timings, media_seconds, stage_fraction=None):
+        """Seconds left for a job, given which stages it has finished
+
+        stage_fraction is the running stage's completion in [0, 1] when the
+        caller knows it; once it is meaningful the stage's own pace is used.
+        """
+        with timings.lock:
+            done = {name for name, s in timings.stages.items() if s.ended is not None and name != timings.current}
+            current = timings.current
+            current_started = timings.current_started
+        with self.lock:
+            rates = dict(self.rates)
+        remaining = 0.0
+        for name in SEQUENTIAL_STAGES:
+            if name in done and name != current:
+                continue
+            expected = rates.get(name, 0.0) * media_seconds
+            if name == current and current_started is not None:
+                elapsed = time.time() - current_started
+                if stage_fraction is not None and stage_fraction >= 0.05:
+                    expected = elapsed * (1.0 - min(1.0, stage_fraction)) / stage_fraction
+                else:
+                    expected = max(0.0, expected - elapsed)
+            remaining += expected
+        return remaining
+
+
+throughput_model = ThroughputModel()
@@ -0,0 +1,116 @@
+"""
+NumPy timeline mixer for dubbed speech.
+
+pydub's overlay() returns a new AudioSegment, copying the whole track for
+every segment, so building a long timeline is quadratic. TimelineMixer
+allocates the full-length buffer once, adds each segment into its slice in
+place (saturating at the sample limits) and writes the result once.
+"""
+import os
+import wave
+
+import numpy as np
+
+# Configuration
+MIX_SAMPLE_RATE = int(os.getenv("MIX_SAMPLE_RATE", "44100"))
+MIX_CHANNELS = int(os.getenv("MIX_CHANNELS", "1"))
+MIX_DTYPE = os.getenv("MIX_DTYPE", "int16")  # int16 | float32
+
+INT16_MIN = -32768
+INT16_MAX = 32767
+
+
+def segment_to_pcm(audio_segment):
+    """pydub AudioSegment -> (int16 samples shaped [frames, channels], sample_rate)"""
+    seg = audio_segment.set_sample_width(2)
+    samples = np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, seg.channels)
+    return samples, seg.frame_rate
+
+
+def resample_linear(samples, from_rate, to_rate):
+    """Cheap linear-interpolation resample, good enough for speech"""
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    n_out = max(1, int(round(len(samples) * to_rate / from_rate)))
+    src_pos = np.arange(n_out) * (from_rate / to_rate)
+    idx = np.arange(len(samples))
+    out = np.empty((n_out, samples.shape[1]), dtype=np.float32)
+    for ch in range(samples.shape[1]):
+        out[:, ch] = np.interp(src_pos, idx, samples[:, ch])
+    return out
+
+
+class TimelineMixer:
+    """Fixed-length PCM timeline that segments are summed into"""
+
+    def __init__(self, duration_seconds, sample_rate=MIX_SAMPLE_RATE, channels=MIX_CHANNELS, dtype=MIX_DTYPE):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.frames = int(round(duration_seconds * sample_rate))
+        # np.zeros maps untouched pages lazily, so silence costs nothing until written
+        self.buffer = np.zeros((self.frames, channels), dtype=self.dtype)
+        self.segments = 0
+        self.clipped_samples = 0
+
+    def _match_format(self, samples, sample_rate):
+        samples = np.asarray(samples)
+        if self.dtype != np.int16 and np.issubdtype(samples.dtype, np.integer):
+            samples = samples.astype(np.float32) / 32768.0
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        if samples.shape[1] != self.channels:
+            mono = samples.mean(axis=1, keepdims=True)
+            samples = np.repeat(mono, self.channels, axis=1)
+        return resample_linear(samples, sample_rate, self.sample_rate)
+
+    def add(self, position_ms, samples, sample_rate):
+        """Sum int16 (or float in [-1, 1] for float32 mixers) samples in at position_ms"""
+        samples = self._match_format(samples, sample_rate)
+        start = int(round(position_ms * self.sample_rate / 1000))
+        if start >= self.frames or start + len(samples) <= 0:
+            return
+        if start < 0:
+            samples = samples[-start:]
+            start = 0
+        end = min(self.frames, start + len(samples))
+        samples = samples[:end - start]
+        target = self.buffer[start:end]
+
+        if self.dtype == np.int16:
+            # Widen only the touched slice, then saturate back into place
+            mixed = target.astype(np.int32)
+            mixed += samples.astype(np.int32)
+            self.clipped_samples += int(np.count_nonzero((mixed > INT16_MAX) | (mixed < INT16_MIN)))
+            np.clip(mixed, INT16_MIN, INT16_MAX, out=mixed)
+            target[...] = mixed
+        else:
+            target += samples
+            np.clip(target, -1.0, 1.0, out=target)
+        self.segments += 1
+
+    def add_segment(self, position_ms, audio_segment):
+        samples, sample_rate = segment_to_pcm(audio_segment)
+        self.add(position_ms, samples, sample_rate)
+
+    def export_wav(self, path):
+        """Write the timeline once as 16-bit PCM WAV"""
+        with wave.open(path, "wb") as w:
+            w.setnchannels(self.channels)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            step = self.sample_rate * 60  # a minute at a time keeps the extra copy small
+            for start in range(0, self.frames, step):
+                chunk = self.buffer[start:start + step]
+                if self.dtype != np.int16:
+                    chunk = (chunk * 32767.0).astype(np.int16)
+                w.writeframes(np.ascontiguousarray(chunk).tobytes())
+        return path
+
+    def stats(self):
+        return {
+            "segments": self.segments,
+            "clippedSamples": self.clipped_samples,
+            "durationSeconds": round(self.frames / self.sample_rate, 3),
+            "bufferMb": round(self.buffer.nbytes / (1024 * 1024), 1),
+        }
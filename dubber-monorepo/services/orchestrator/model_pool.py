@@ -0,0 +1,163 @@
+"""
+Process-wide pool of faster-whisper models.
+
+Loading a WhisperModel costs seconds and hundreds of MB, so every worker
+process keeps each (size, compute_type, cpu_threads) combination resident
+and hands the same instance to every job that asks for it.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Configuration
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0 = let CTranslate2 decide
+# Comma separated model sizes loaded when the worker starts
+WHISPER_WARM_MODELS = os.getenv("WHISPER_WARM_MODELS", WHISPER_MODEL_SIZE)
+# Upper bound for the estimated memory of all resident models
+WHISPER_POOL_MAX_MB = int(os.getenv("WHISPER_POOL_MAX_MB", "4096"))
+# Sizes a job may request through optionsJson
+WHISPER_ALLOWED_SIZES = [s.strip() for s in os.getenv(
+    "WHISPER_ALLOWED_SIZES", "tiny,base,small,medium"
+).split(",") if s.strip()]
+
+# Rough resident size of an int8 CPU model, used for the memory cap
+MODEL_MEMORY_MB = {
+    "tiny": 120,
+    "tiny.en": 120,
+    "base": 250,
+    "base.en": 250,
+    "small": 600,
+    "small.en": 600,
+    "medium": 1600,
+    "medium.en": 1600,
+    "large-v1": 3200,
+    "large-v2": 3200,
+    "large-v3": 3200,
+    "large": 3200,
+}
+COMPUTE_TYPE_SCALE = {
+    "int8": 1.0,
+    "int8_float32": 1.0,
+    "int8_float16": 1.2,
+    "int16": 1.6,
+    "float16": 2.0,
+    "float32": 3.5,
+}
+
+
+def estimate_model_mb(size, compute_type):
+    base = MODEL_MEMORY_MB.get(size, MODEL_MEMORY_MB["large"])
+    return int(base * COMPUTE_TYPE_SCALE.get(compute_type, 1.0))
+
+
+def load_whisper_model(size, compute_type, cpu_threads):
+    # Imported here so the pool can be used (and benchmarked) without faster-whisper
+    from faster_whisper import WhisperModel
+    return WhisperModel(size, device=WHISPER_DEVICE, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+class WhisperModelPool:
+    """LRU registry of loaded models keyed by (size, compute_type, cpu_threads)"""
+
+    def __init__(self, max_mb=WHISPER_POOL_MAX_MB, loader=load_whisper_model):
+        self.max_mb = max_mb
+        self.loader = loader
+        self.models = OrderedDict()  # key -> (model, estimated_mb)
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    def key(self, size=None, compute_type=None, cpu_threads=None):
+        return (
+            size or WHISPER_MODEL_SIZE,
+            compute_type or WHISPER_COMPUTE_TYPE,
+            WHISPER_CPU_THREADS if cpu_threads is None else cpu_threads,
+        )
+
+    def resident_mb(self):
+        return sum(mb for _, mb in self.models.values())
+
+    def get(self, size=None, compute_type=None, cpu_threads=None):
+        """Return a loaded model, loading it on first use"""
+        key = self.key(size, compute_type, cpu_threads)
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.hits += 1
+                return self.models[key][0]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the pool lock so other sizes stay available,
+        # but only once per key even if several jobs ask at the same time
+        with key_lock:
+            with self.lock:
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    self.hits += 1
+                    return self.models[key][0]
+                self.misses += 1
+
+            print(f"Loading Whisper model {key[0]} ({key[1]}, cpu_threads={key[2]})...")
+            started = time.time()
+            model = self.loader(*key)
+            elapsed = time.time() - started
+            print(f"Loaded Whisper model {key[0]} in {elapsed:.2f}s")
+
+            model_mb = estimate_model_mb(key[0], key[1])
+            with self.lock:
+                self.load_seconds[key] = elapsed
+                self._evict_for(model_mb)
+                self.models[key] = (model, model_mb)
+            return model
+
+    def _evict_for(self, needed_mb):
+        # Caller holds self.lock. Jobs still holding an evicted model keep it
+        # alive until they finish; the pool simply stops handing it out.
+        while self.models and self.resident_mb() + needed_mb > self.max_mb:
+            old_key, _ = self.models.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted Whisper model {old_key[0]} ({old_key[1]}, cpu_threads={old_key[2]}) from pool")
+
+    def warm(self, sizes=None):
+        """Load the configured models before the first job arrives"""
+        if sizes is None:
+            sizes = [s.strip() for s in WHISPER_WARM_MODELS.split(",") if s.strip()]
+        for size in sizes:
+            try:
+                self.get(size)
+            except Exception as e:
+                print(f"Failed to warm Whisper model {size}: {e}")
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "residentMb": self.resident_mb(),
+                "maxMb": self.max_mb,
+                "resident": ["/".join(str(p) for p in key) for key in self.models],
+                "loadSeconds": {"/".join(str(p) for p in key): round(s, 3) for key, s in self.load_seconds.items()},
+            }
+
+
+def model_size_from_options(options):
+    """Pick the Whisper size requested in a job's optionsJson, if it is allowed"""
+    size = (options or {}).get("modelSize") or (options or {}).get("whisperModel")
+    if size and size in WHISPER_ALLOWED_SIZES:
+        return size
+    if size:
+        print(f"Ignoring unsupported model size '{size}', using {WHISPER_MODEL_SIZE}")
+    return WHISPER_MODEL_SIZE
+
+
+model_pool = WhisperModelPool()
@@ -0,0 +1,197 @@
+"""
+Streaming ASR -> translate/TTS -> mix pipeline.
+
+faster-whisper yields segments lazily while it decodes, so instead of
+collecting the whole transcript first each segment is handed to the dubbing
+workers as soon as it exists. Bounded queues between the stages keep a fast
+ASR stage from running arbitrarily far ahead of dubbing (and vice versa).
+Dubbed segments are mixed in the order they finish, so one slow segment
+doesn't hold back the ones after it.
+"""
+import os
+import time
+import threading
+from queue import Queue, Empty, Full
+
+from metrics import cpu_now
+
+# Configuration
+# Threads per job; translate/TTS calls in flight are bounded by the shared backend limiters
+DUB_WORKERS = int(os.getenv("DUB_WORKERS", "16"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class StreamingPipeline:
+    """Runs ASR in a producer thread, dubbing on worker threads and mixing on the caller
+
+    dub_fn(i, segment) returns whatever mix_fn accepts (or None to skip the
+    segment); mix_fn is only ever called from the thread that calls run(),
+    so it may mutate non thread-safe state such as the output timeline.
+    """
+
+    def __init__(self, dub_fn, mix_fn, workers=DUB_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, on_progress=None):
+        self.dub_fn = dub_fn
+        self.mix_fn = mix_fn
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.on_progress = on_progress
+        self.aborted = threading.Event()
+        self.lock = threading.Lock()
+        self.duration = 0
+        self.transcribed = 0
+        self.dubbed = 0
+        self.mixed = 0
+        self.skipped = 0
+        self.asr_position = 0.0
+        self.asr_finished = False
+        self.asr_seconds = 0.0
+        self.asr_cpu = 0.0
+        self.started = None
+
+    # Progress of each stage in [0, 1]
+    def asr_fraction(self):
+        if self.asr_finished:
+            return 1.0
+        if not self.duration:
+            return 0.0
+        return min(1.0, self.asr_position / self.duration)
+
+    def dub_fraction(self):
+        # Share of the audio whose segments have been dubbed and mixed
+        with self.lock:
+            done = self.mixed + self.skipped
+            transcribed = self.transcribed
+        if not transcribed:
+            return 1.0 if self.asr_finished else 0.0
+        return self.asr_fraction() * done / transcribed
+
+    def _put(self, q, item):
+        while True:
+            if self.aborted.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self.aborted.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.5)
+            except Empty:
+                continue
+
+    def run(self, segments, duration):
+        """Consume the segment iterator; returns the stage counters"""
+        self.duration = duration
+        self.started = time.time()
+        asr_q = Queue(maxsize=self.queue_size)
+        mix_q = Queue(maxsize=self.queue_size)
+        errors = []
+
+        def produce():
+            # Decoding happens in this thread as the iterator is consumed (or in the
+            # ASR worker processes, whose CPU transcribe_chunked credits to it)
+            cpu0 = cpu_now()
+            try:
+                for i, segment in enumerate(segments):
+                    with self.lock:
+                        self.transcribed += 1
+                        self.asr_position = segment.end
+                    self._put(asr_q, (i, segment))  # blocks while dubbing catches up
+            except PipelineAborted:
+                return
+            except Exception as e:
+                errors.append(e)
+                self.aborted.set()
+                return
+            finally:
+                self.asr_seconds = time.time() - self.started
+                self.asr_cpu = cpu_now() - cpu0
+                self.asr_finished = True
+            try:
+                for _ in range(self.workers):
+                    self._put(asr_q, _DONE)
+            except PipelineAborted:
+                pass
+
+        def dub():
+            try:
+                while True:
+                    item = self._get(asr_q)
+                    if item is _DONE:
+                        break
+                    i, segment = item
+                    result = self.dub_fn(i, segment)
+                    with self.lock:
+                        self.dubbed += 1
+                    self._put(mix_q, (i, result))
+                self._put(mix_q, _DONE)
+            except PipelineAborted:
+                pass
+            except Exception as e:
+                errors.append(e)
+                self.aborted.set()
+
+        threads = [threading.Thread(target=produce, name="asr", daemon=True)]
+        threads += [threading.Thread(target=dub, name=f"dub-{n}", daemon=True) for n in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        try:
+            finished_workers = 0
+            while finished_workers < self.workers:
+                try:
+                    item = mix_q.get(timeout=1)
+                except Empty:
+                    if self.aborted.is_set():
+                        break
+                    self._report()
+                    continue
+                if item is _DONE:
+                    finished_workers += 1
+                    continue
+                i, result = item
+                if result is None:
+                    with self.lock:
+                        self.skipped += 1
+                else:
+                    self.mix_fn(result)
+                    with self.lock:
+                        self.mixed += 1
+                self._report()
+        except BaseException:
+            self.aborted.set()
+            raise
+        finally:
+            for t in threads:
+                t.join(timeout=5)
+
+        if errors:
+            raise errors[0]
+        return self.stats()
+
+    def _report(self):
+        if self.on_progress:
+            self.on_progress(self)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "segments": self.transcribed,
+                "dubbed": self.dubbed,
+                "mixed": self.mixed,
+                "skipped": self.skipped,
+                "asrSeconds": round(self.asr_seconds, 3),
+                "asrCpuSeconds": round(self.asr_cpu, 3),
+                "totalSeconds": round(time.time() - self.started, 3) if self.started else 0.0,
+            }
@@ -0,0 +1,268 @@
+"""
+Duration-aware job scheduling and admission control.
+
+The consumer prefetches a few more messages than it has workers and
+probes each job's source before starting it: ffmpeg reads the container
+header straight from object storage, so the length is known without
+downloading the video. Jobs then go into one of two lanes:
+
+- short: videos up to SHORT_JOB_MAX_SECONDS; always picked first
+- long: the rest; they never occupy more than LONG_JOB_WORKERS workers,
+  so at least one worker is left for short clips while hours-long uploads
+  run
+
+Each job also gets an estimated memory and CPU cost (mix buffers per
+target language, ASR audio, Whisper threads) and starts only when it fits
+what the node has left; a node that is idle always takes the next job. A
+job that doesn't fit within ADMIT_WAIT_SECONDS is requeued to the broker,
+where a node with room can pick it up.
+
+A long job too big to run next to short ones would otherwise never start
+under steady short-job traffic. Its wait is therefore counted across
+requeues, and once the oldest long job has waited LONG_JOB_RESERVE_SECONDS
+it reserves the node: no other job starts until it fits, and it is no
+longer requeued.
+"""
+import os
+import time
+import threading
+from collections import deque, namedtuple
+
+from asr import ASR_CPU_THREADS, ASR_WORKERS, should_chunk
+from mixer import MIX_CHANNELS, MIX_DTYPE, MIX_SAMPLE_RATE
+from model_pool import WHISPER_CPU_THREADS, WHISPER_POOL_MAX_MB
+
+# Configuration
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+SHORT_JOB_MAX_SECONDS = float(os.getenv("SHORT_JOB_MAX_SECONDS", "900"))
+LONG_JOB_WORKERS = int(os.getenv("LONG_JOB_WORKERS", "0"))  # 0: all workers but one
+SCHEDULER_LOOKAHEAD = int(os.getenv("SCHEDULER_LOOKAHEAD", "4"))  # messages held beyond the workers
+ADMIT_WAIT_SECONDS = float(os.getenv("ADMIT_WAIT_SECONDS", "60"))
+# Wait (across requeues) after which a long job stops yielding to short ones
+LONG_JOB_RESERVE_SECONDS = float(os.getenv("LONG_JOB_RESERVE_SECONDS", "120"))
+# Memory and CPUs jobs may use on this node; 0 derives them from the machine
+NODE_MEMORY_MB = int(os.getenv("NODE_MEMORY_MB", "0"))
+NODE_CPUS = int(os.getenv("NODE_CPUS", "0"))
+NODE_MEMORY_FRACTION = float(os.getenv("NODE_MEMORY_FRACTION", "0.8"))
+JOB_BASE_MEMORY_MB = int(os.getenv("JOB_BASE_MEMORY_MB", "256"))
+JOB_CPUS = int(os.getenv("JOB_CPUS", "4"))  # Whisper threads of an unchunked job when WHISPER_CPU_THREADS=0
+# Used when a source can't be probed: its size over this bitrate gives the duration
+FALLBACK_BITRATE_KBPS = float(os.getenv("FALLBACK_BITRATE_KBPS", "2000"))
+
+MB = 1024 * 1024
+ASR_MB_PER_MINUTE = 16000 * 2 * 60 / MB  # 16 kHz 16-bit mono
+MIX_MB_PER_MINUTE = MIX_SAMPLE_RATE * MIX_CHANNELS * (4 if MIX_DTYPE == "float32" else 2) * 60 / MB
+
+JobCost = namedtuple("JobCost", ["seconds", "memory_mb", "cpus", "lane"])
+
+
+def node_memory_mb():
+    """Memory jobs may use: the container's limit or the machine's RAM, less the Whisper model pool"""
+    if NODE_MEMORY_MB:
+        return NODE_MEMORY_MB
+    total = None
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != "max" and int(value) < 1 << 60:
+                total = int(value) // MB
+                break
+        except (OSError, ValueError):
+            continue
+    if total is None:
+        try:
+            total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // MB
+        except (ValueError, OSError, AttributeError):
+            total = 8192
+    return max(JOB_BASE_MEMORY_MB, int(total * NODE_MEMORY_FRACTION) - WHISPER_POOL_MAX_MB)
+
+
+def node_cpus():
+    if NODE_CPUS:
+        return NODE_CPUS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def seconds_from_size(size_bytes):
+    return size_bytes * 8 / (FALLBACK_BITRATE_KBPS * 1000)
+
+
+def estimate_job_cost(seconds, languages=1):
+    """Peak memory and CPUs of a job on a source of this length
+
+    The timeline mixer holds the whole dub track per language (plus a copy
+    while exporting) and ASR reads the 16 kHz audio; Whisper models are
+    shared by all jobs and are budgeted separately.
+    """
+    minutes = seconds / 60
+    memory = JOB_BASE_MEMORY_MB + minutes * (ASR_MB_PER_MINUTE + 2 * MIX_MB_PER_MINUTE * max(1, languages))
+    if should_chunk(seconds):
+        cpus = ASR_WORKERS * ASR_CPU_THREADS
+    else:
+        cpus = WHISPER_CPU_THREADS or JOB_CPUS
+    lane = "short" if seconds <= SHORT_JOB_MAX_SECONDS else "long"
+    return JobCost(seconds, int(memory), cpus + 1, lane)  # +1: stretch, mix and mux
+
+
+class _Waiting:
+    __slots__ = ("job", "cost", "since", "waited_before")
+
+    def __init__(self, job, cost, waited_before=0.0):
+        self.job = job
+        self.cost = cost
+        self.since = time.monotonic()
+        self.waited_before = waited_before  # on this or other nodes, before it was requeued
+
+    def age(self, now):
+        return self.waited_before + now - self.since
+
+
+class JobScheduler:
+    """Short/long lanes with a per-node memory and CPU budget
+
+    cost_fn(body) returns the JobCost of a queued message. JobConsumer adds
+    jobs as they arrive, takes the ones that may start and releases their
+    cost when they finish.
+    """
+
+    def __init__(self, cost_fn, memory_mb=None, cpus=None, long_workers=LONG_JOB_WORKERS,
+                 admit_wait=ADMIT_WAIT_SECONDS, reserve_after=LONG_JOB_RESERVE_SECONDS,
+                 lookahead=SCHEDULER_LOOKAHEAD):
+        self.cost_fn = cost_fn
+        self.memory_mb = memory_mb or node_memory_mb()
+        self.cpus = cpus or node_cpus()
+        self.long_workers = long_workers
+        self.admit_wait = admit_wait
+        self.reserve_after = reserve_after
+        self.lookahead = lookahead
+        self.workers = 1
+        self.lanes = {"short": deque(), "long": deque()}
+        self.running = {"short": 0, "long": 0}
+        self.used_memory = 0
+        self.used_cpus = 0
+        self.cond = threading.Condition()
+        self.changed = False
+        self.admitted = {"short": 0, "long": 0}
+        self.requeued = 0
+        self.reservations = 0
+        self.reserved = None
+        self.waited = 0.0
+
+    def configure(self, workers):
+        self.workers = workers
+        if not self.long_workers:
+            self.long_workers = max(1, workers - 1)
+
+    def cost_of(self, body):
+        try:
+            return self.cost_fn(body)
+        except Exception as e:
+            # Unknown length: schedule it as a long job of base size rather than not at all
+            print(f"Could not estimate job cost ({e}), scheduling it as a long job")
+            return JobCost(None, JOB_BASE_MEMORY_MB, JOB_CPUS + 1, "long")
+
+    def add(self, job, cost, requeues=0):
+        """Queue a job; requeues is how often admission already gave it back to the broker"""
+        with self.cond:
+            self.lanes[cost.lane].append(_Waiting(job, cost, requeues * self.admit_wait))
+            self.changed = True
+            self.cond.notify_all()
+
+    def release(self, cost):
+        with self.cond:
+            self.running[cost.lane] -= 1
+            self.used_memory -= cost.memory_mb
+            self.used_cpus -= cost.cpus
+            self.changed = True
+            self.cond.notify_all()
+
+    def _fits(self, cost):
+        if not any(self.running.values()):
+            return True  # an idle node runs even a job larger than its budget
+        return (self.used_memory + cost.memory_mb <= self.memory_mb
+                and self.used_cpus + cost.cpus <= self.cpus)
+
+    def _reserve(self, now):
+        """The long job that has waited past reserve_after and may take a long worker, if any"""
+        if not self.lanes["long"] or self.running["long"] >= self.long_workers:
+            return None  # waiting for a long worker, which short jobs don't take
+        oldest = max(self.lanes["long"], key=lambda w: w.age(now))
+        if oldest.age(now) < self.reserve_after:
+            return None
+        if self.reserved is not oldest:
+            self.reserved = oldest
+            self.reservations += 1
+            print(f"Long job waited {oldest.age(now):.0f}s for room, holding back other jobs until it fits")
+        return oldest
+
+    def _pick(self, now):
+        if sum(self.running.values()) >= self.workers:
+            return None
+        reserved = self._reserve(now)
+        if reserved is not None:
+            # Running jobs drain without new ones taking their room, so it fits eventually
+            return reserved if self._fits(reserved.cost) else None
+        for lane in ("short", "long"):
+            if lane == "long" and self.running["long"] >= self.long_workers:
+                continue
+            for waiting in self.lanes[lane]:
+                if self._fits(waiting.cost):
+                    return waiting
+        return None
+
+    def take(self, timeout=1.0, draining=False):
+        """(jobs to start, jobs to requeue) as [(job, cost)]; waits up to timeout for a change"""
+        with self.cond:
+            if not self.changed:
+                self.cond.wait(timeout)
+            self.changed = False
+            now = time.monotonic()
+            if draining:
+                expired = [w for lane in self.lanes.values() for w in lane]
+                for lane in self.lanes.values():
+                    lane.clear()
+                self.reserved = None
+                return [], [(w.job, w.cost) for w in expired]
+
+            started = []
+            while True:
+                waiting = self._pick(now)
+                if waiting is None:
+                    break
+                lane = waiting.cost.lane
+                self.lanes[lane].remove(waiting)
+                self.running[lane] += 1
+                self.used_memory += waiting.cost.memory_mb
+                self.used_cpus += waiting.cost.cpus
+                self.admitted[lane] += 1
+                if waiting is self.reserved:
+                    self.reserved = None
+                self.waited += now - waiting.since
+                started.append((waiting.job, waiting.cost))
+
+            expired = []
+            for lane in self.lanes.values():
+                # A requeued job would lose its place; the reserved one stays until it fits
+                for waiting in [w for w in lane if now - w.since >= self.admit_wait and w is not self.reserved]:
+                    lane.remove(waiting)
+                    expired.append((waiting.job, waiting.cost))
+            self.requeued += len(expired)
+            return started, expired
+
+    def stats(self):
+        with self.cond:
+            admitted = sum(self.admitted.values())
+            return {
+                "waiting": {lane: len(jobs) for lane, jobs in self.lanes.items()},
+                "running": dict(self.running),
+                "admitted": dict(self.admitted),
+                "requeued": self.requeued,
+                "reservations": self.reservations,
+                "avgWaitSeconds": round(self.waited / admitted, 2) if admitted else 0.0,
+                "memoryMb": {"used": self.used_memory, "budget": self.memory_mb},
+                "cpus": {"used": self.used_cpus, "budget": self.cpus},
+            }
@@ -0,0 +1,202 @@
+"""
+Background job-status reporting to the API gateway.
+
+Pipeline stages call submit() and return immediately. Updates for the same
+job are merged while they wait (the newest value of each field wins), each
+job is sent at most once per STATUS_MIN_INTERVAL_SECONDS, and requests go
+out over one keep-alive session. Terminal updates (COMPLETED/FAILED) skip
+the rate limit and are retried until delivered.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Configuration
+STATUS_MIN_INTERVAL_SECONDS = float(os.getenv("STATUS_MIN_INTERVAL_SECONDS", "2"))
+STATUS_TIMEOUT_SECONDS = float(os.getenv("STATUS_TIMEOUT_SECONDS", "5"))
+STATUS_POOL_SIZE = int(os.getenv("STATUS_POOL_SIZE", "4"))
+STATUS_RETRIES = int(os.getenv("STATUS_RETRIES", "2"))  # non-terminal updates
+STATUS_TERMINAL_RETRIES = int(os.getenv("STATUS_TERMINAL_RETRIES", "10"))
+FINISHED_JOBS_REMEMBERED = 10000
+
+TERMINAL_STATES = ("COMPLETED", "FAILED")
+
+
+def _merge(current, data):
+    """Apply the newer fields in data over current, in place"""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(current.get(key), dict):
+            # e.g. outputObjectKeys: one language per update, keep them all
+            current[key] = dict(current[key], **value)
+        else:
+            current[key] = value
+    return current
+
+
+def default_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=STATUS_POOL_SIZE, pool_maxsize=STATUS_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class StatusReporter:
+    """Coalescing, rate-limited PATCH /api/v1/job/{id} sender"""
+
+    def __init__(self, base_url, session=None, min_interval=STATUS_MIN_INTERVAL_SECONDS,
+                 timeout=STATUS_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.cond = threading.Condition()
+        self.pending = {}     # job_id -> merged fields
+        self.attempts = {}    # job_id -> failed sends of the pending update
+        self.retry_at = {}    # job_id -> earliest retry time after a failure
+        self.last_sent = {}   # job_id -> time of the last successful send
+        self.finished = OrderedDict()  # jobs whose terminal state was delivered
+        self.sending = None
+        self.closing = False
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name="status-reporter", daemon=True)
+        self.thread.start()
+
+    def submit(self, job_id, data):
+        """Queue fields for job_id; never blocks on the network"""
+        if not data:
+            return
+        with self.cond:
+            if job_id in self.finished:
+                if data.get("status") == "PROCESSING":
+                    # The job is being retried from scratch
+                    del self.finished[job_id]
+                else:
+                    # Late heartbeat after COMPLETED/FAILED; sending it would regress the job
+                    self.dropped += 1
+                    return
+            current = self.pending.get(job_id)
+            if current is not None:
+                if self._is_terminal(current) and not self._is_terminal(data):
+                    # Terminal state already queued; progress behind it is stale
+                    self.dropped += 1
+                    return
+                _merge(current, data)
+                self.merged += 1
+            else:
+                self.pending[job_id] = dict(data)
+            self.cond.notify()
+
+    def _is_terminal(self, data):
+        return data.get("status") in TERMINAL_STATES
+
+    def _due_at(self, job_id, data):
+        if job_id in self.retry_at:
+            return self.retry_at[job_id]
+        if self._is_terminal(data):
+            return 0
+        return self.last_sent.get(job_id, 0) + self.min_interval
+
+    def _run(self):
+        if self.session is None:
+            self.session = default_session()
+        while True:
+            with self.cond:
+                while True:
+                    if not self.pending:
+                        if self.closing:
+                            return
+                        self.cond.wait()
+                        continue
+                    now = time.monotonic()
+                    due = {job_id: self._due_at(job_id, data) for job_id, data in self.pending.items()}
+                    job_id = min(due, key=due.get)
+                    if due[job_id] <= now:
+                        break
+                    self.cond.wait(timeout=due[job_id] - now)
+                data = self.pending.pop(job_id)
+                self.retry_at.pop(job_id, None)
+                self.sending = job_id
+            try:
+                self._send(job_id, data)
+            finally:
+                with self.cond:
+                    self.sending = None
+                    self.cond.notify_all()
+
+    def _send(self, job_id, data):
+        url = f"{self.base_url}/api/v1/job/{job_id}"
+        try:
+            resp = self.session.patch(url, json=data, timeout=self.timeout)
+            resp.raise_for_status()
+        except Exception as e:
+            self._on_failure(job_id, data, e)
+            return
+        with self.cond:
+            self.sent += 1
+            self.last_sent[job_id] = time.monotonic()
+            self.attempts.pop(job_id, None)
+            if self._is_terminal(data):
+                self.finished[job_id] = True
+                if len(self.finished) > FINISHED_JOBS_REMEMBERED:
+                    self.finished.popitem(last=False)
+                self.last_sent.pop(job_id, None)
+
+    def _on_failure(self, job_id, data, error):
+        terminal = self._is_terminal(data)
+        with self.cond:
+            self.failed += 1
+            attempts = self.attempts.get(job_id, 0) + 1
+            limit = STATUS_TERMINAL_RETRIES if terminal else STATUS_RETRIES
+            if attempts > limit:
+                print(f"Failed to update job {job_id} after {attempts} attempts, dropping update: {error}")
+                self.dropped += 1
+                self.attempts.pop(job_id, None)
+                return
+            print(f"Failed to update job {job_id} (attempt {attempts}): {error}")
+            self.attempts[job_id] = attempts
+            # Put it back underneath anything newer that arrived meanwhile
+            newer = self.pending.pop(job_id, None)
+            if newer is not None:
+                if terminal and not self._is_terminal(newer):
+                    self.dropped += 1
+                else:
+                    self.merged += 1
+                    data = _merge(dict(data), newer)
+            self.pending[job_id] = data
+            self.retry_at[job_id] = time.monotonic() + min(30.0, 0.5 * 2 ** attempts)
+
+    def flush(self, timeout=30):
+        """Wait until nothing is pending (e.g. before shutdown); returns True if drained"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.sending is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(timeout=remaining)
+        return True
+
+    def close(self, timeout=30):
+        drained = self.flush(timeout)
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        self.thread.join(timeout=1)
+        return drained
+
+    def stats(self):
+        with self.cond:
+            return {
+                "sent": self.sent,
+                "merged": self.merged,
+                "dropped": self.dropped,
+                "failedRequests": self.failed,
+                "pending": len(self.pending),
+            }
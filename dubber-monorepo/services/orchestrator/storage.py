@@ -0,0 +1,315 @@
+"""
+Streaming object-storage transfers and per-job scratch space.
+
+fget_object/fput_object move a whole object over one connection before the
+next stage may start. Here the source is fetched with parallel ranged GETs
+into a preallocated scratch file, and readers can follow the part of the
+file that is already complete (so ffmpeg can start extracting audio while
+the rest is still downloading). Outputs are uploaded as parallel multipart
+parts while they are still being written.
+"""
+import io
+import os
+import time
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration
+STORAGE_RANGE_SIZE_MB = float(os.getenv("STORAGE_RANGE_SIZE_MB", "8"))
+STORAGE_DOWNLOAD_WORKERS = int(os.getenv("STORAGE_DOWNLOAD_WORKERS", "4"))
+STORAGE_PART_SIZE_MB = float(os.getenv("STORAGE_PART_SIZE_MB", "16"))
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "4"))
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "3"))
+JOB_SCRATCH_DIR = os.getenv("JOB_SCRATCH_DIR", "")  # empty: the system temp dir
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+READ_CHUNK = 1024 * 1024
+
+
+class MinioObjectStore:
+    """The handful of S3 calls the transfers need, on top of a Minio client"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def size(self, bucket, key):
+        return self.client.stat_object(bucket, key).size
+
+    def get_range(self, bucket, key, offset, length):
+        response = self.client.get_object(bucket, key, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def put_bytes(self, bucket, key, data, content_type="application/octet-stream"):
+        self.client.put_object(bucket, key, io.BytesIO(data), len(data), content_type=content_type)
+
+    def get_bytes(self, bucket, key):
+        response = self.client.get_object(bucket, key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def delete_prefix(self, bucket, prefix):
+        """Remove every object under prefix in batched requests; returns how many were deleted"""
+        from minio.deleteobjects import DeleteObject
+        names = [obj.object_name for obj in self.client.list_objects(bucket, prefix=prefix, recursive=True)]
+        failed = 0
+        for i in range(0, len(names), 1000):
+            for error in self.client.remove_objects(bucket, [DeleteObject(n) for n in names[i:i + 1000]]):
+                failed += 1
+                print(f"Failed to delete {error.name}: {error.message}")
+        return len(names) - failed
+
+    # minio-py only exposes multipart as part of put_object, which uploads
+    # parts from one stream one at a time; these are its underlying calls.
+    # They are private, so requirements.txt pins minio to the tested 7.2
+    # series, and they are called by keyword so a changed signature fails
+    # loudly instead of passing arguments in the wrong places.
+    def create_multipart(self, bucket, key, content_type="application/octet-stream"):
+        return self.client._create_multipart_upload(bucket_name=bucket, object_name=key,
+                                                    headers={"Content-Type": content_type})
+
+    def upload_part(self, bucket, key, upload_id, part_number, data):
+        return self.client._upload_part(bucket_name=bucket, object_name=key, data=data, headers=None,
+                                        upload_id=upload_id, part_number=part_number)
+
+    def complete_multipart(self, bucket, key, upload_id, parts):
+        from minio.datatypes import Part
+        self.client._complete_multipart_upload(bucket_name=bucket, object_name=key, upload_id=upload_id,
+                                               parts=[Part(n, etag) for n, etag in parts])
+
+    def abort_multipart(self, bucket, key, upload_id):
+        self.client._abort_multipart_upload(bucket_name=bucket, object_name=key, upload_id=upload_id)
+
+
+def with_retries(fn, retries=STORAGE_RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(min(5.0, 0.2 * 2 ** attempt))
+
+
+class RangedDownload:
+    """Parallel ranged GETs into a local file, readable in order as it fills"""
+
+    def __init__(self, store, bucket, key, path, range_size=None, workers=STORAGE_DOWNLOAD_WORKERS):
+        self.store = store
+        self.bucket = bucket
+        self.key = key
+        self.path = path
+        self.range_size = int((range_size or STORAGE_RANGE_SIZE_MB * 1024 * 1024))
+        self.workers = max(1, workers)
+        self.cond = threading.Condition()
+        self.size = None
+        self.ranges = 0
+        self.done = set()
+        self.available = 0  # bytes from the start of the file that are complete
+        self.error = None
+        self.finished = False
+        self.started = None
+        self.elapsed = 0.0
+        self.executor = None
+
+    def start(self):
+        """Stat the object and start fetching; raises if it doesn't exist"""
+        self.started = time.time()
+        self.size = self.store.size(self.bucket, self.key)
+        with open(self.path, "wb") as f:
+            f.truncate(self.size)
+        self.ranges = max(1, -(-self.size // self.range_size))
+        if self.size == 0:
+            self._finish()
+            return self
+        # Ranges are submitted in order, so the readable prefix grows steadily
+        self.executor = ThreadPoolExecutor(max_workers=min(self.workers, self.ranges), thread_name_prefix="download")
+        for index in range(self.ranges):
+            self.executor.submit(self._fetch, index)
+        self.executor.shutdown(wait=False)
+        return self
+
+    def _fetch(self, index):
+        if self.error is not None:
+            return
+        offset = index * self.range_size
+        length = min(self.range_size, self.size - offset)
+        try:
+            data = with_retries(lambda: self.store.get_range(self.bucket, self.key, offset, length))
+            if len(data) != length:
+                raise IOError(f"Short read of {self.key} at {offset}: {len(data)} of {length} bytes")
+            with open(self.path, "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+        except Exception as e:
+            with self.cond:
+                if self.error is None:
+                    self.error = e
+                self.cond.notify_all()
+            return
+        with self.cond:
+            self.done.add(index)
+            while self.available < self.size and self.available // self.range_size in self.done:
+                self.available = min(self.size, self.available + self.range_size)
+            if len(self.done) == self.ranges:
+                self._finish()
+            self.cond.notify_all()
+
+    def _finish(self):
+        self.finished = True
+        self.elapsed = time.time() - self.started
+
+    def wait(self, timeout=None):
+        """Block until the whole object is on disk"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.finished or self.error is not None, timeout=timeout):
+                raise TimeoutError(f"Download of {self.key} timed out")
+            if self.error is not None:
+                raise self.error
+
+    def iter_chunks(self, chunk_size=READ_CHUNK):
+        """Yield the file's bytes in order, waiting for ranges that are still in flight"""
+        position = 0
+        with open(self.path, "rb") as f:
+            while True:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.available > position or self.finished or self.error is not None)
+                    if self.error is not None:
+                        raise self.error
+                    available = self.available
+                if position >= available:
+                    return
+                f.seek(position)
+                data = f.read(min(chunk_size, available - position))
+                position += len(data)
+                yield data
+
+
+class MultipartUpload:
+    """File-like sink that uploads parts in parallel as they fill
+
+    Small outputs (a single part) are sent with one PUT. On any error the
+    multipart upload is aborted so no orphaned parts are left behind.
+    """
+
+    def __init__(self, store, bucket, key, part_size=None, workers=STORAGE_UPLOAD_WORKERS,
+                 content_type="application/octet-stream"):
+        self.store = store
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(MIN_PART_SIZE, int(part_size or STORAGE_PART_SIZE_MB * 1024 * 1024))
+        self.workers = max(1, workers)
+        self.content_type = content_type
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.executor = None
+        self.futures = []
+        self.slots = threading.BoundedSemaphore(self.workers + 1)  # parts held in memory at once
+        self.part_number = 0
+        self.bytes = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        elif not self.closed:
+            self.close()
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self._submit(part)
+        return len(data)
+
+    def _submit(self, data):
+        if self.upload_id is None:
+            self.upload_id = self.store.create_multipart(self.bucket, self.key, self.content_type)
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        for future in self.futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        self.part_number += 1
+        self.slots.acquire()  # back-pressure: the writer waits while parts are in flight
+        self.futures.append(self.executor.submit(self._upload, self.part_number, data))
+
+    def _upload(self, part_number, data):
+        try:
+            etag = with_retries(lambda: self.store.upload_part(self.bucket, self.key, self.upload_id, part_number, data))
+            return part_number, etag
+        finally:
+            self.slots.release()
+
+    def close(self):
+        """Upload what's left and complete the object"""
+        self.closed = True
+        try:
+            if self.upload_id is None:
+                data = bytes(self.buffer)
+                with_retries(lambda: self.store.put_bytes(self.bucket, self.key, data, self.content_type))
+                return
+            if self.buffer:
+                self._submit(bytes(self.buffer))
+                self.buffer = bytearray()
+            parts = [future.result() for future in self.futures]
+            with_retries(lambda: self.store.complete_multipart(self.bucket, self.key, self.upload_id, parts))
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            if self.executor:
+                self.executor.shutdown(wait=False)
+
+    def abort(self):
+        self.closed = True
+        if self.executor:
+            for future in self.futures:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+        if self.upload_id is not None:
+            try:
+                self.store.abort_multipart(self.bucket, self.key, self.upload_id)
+            except Exception as e:
+                print(f"Failed to abort multipart upload of {self.key}: {e}")
+            self.upload_id = None
+
+
+def upload_local_file(store, bucket, key, path, content_type="application/octet-stream"):
+    """Upload a local file with parallel parts; returns bytes sent"""
+    with MultipartUpload(store, bucket, key, content_type=content_type) as upload:
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(upload.part_size)
+                if not data:
+                    break
+                upload.write(data)
+    return upload.bytes
+
+
+class JobScratch:
+    """Private temp directory for one job's intermediate files, removed afterwards"""
+
+    def __init__(self, job_id, root=None):
+        root = root or JOB_SCRATCH_DIR or None
+        if root:
+            os.makedirs(root, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix=f"dubber-{job_id}-", dir=root)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def cleanup(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,199 @@
+"""
+Pitch-preserving time stretch for fitting dubbed speech into its slot.
+
+Re-labelling the frame rate (the old approach) changes speed and pitch
+together, so fast segments sounded chipmunked. WSOLA (waveform similarity
+overlap-add) instead re-spaces short windows of the signal, picking each
+window's exact position within a small tolerance so that it lines up with
+the previous one, which keeps the pitch intact.
+
+fit_many stretches a batch of segments together: frame k of every segment
+is placed in one vectorized step, with the alignment search done as a
+batched FFT cross-correlation. Per segment this costs less than stretch()
+once a batch holds a few segments, and searches at full resolution. The
+streaming pipeline fits one segment at a time and uses fit_to_duration.
+"""
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Configuration
+# speed = synthesized duration / slot duration; outside these bounds we stop stretching
+STRETCH_MIN_RATIO = float(os.getenv("STRETCH_MIN_RATIO", "0.6"))
+STRETCH_MAX_RATIO = float(os.getenv("STRETCH_MAX_RATIO", "1.8"))
+# Ratios this close to 1 aren't audible; skip the work
+STRETCH_TOLERANCE = float(os.getenv("STRETCH_TOLERANCE", "0.03"))
+WSOLA_FRAME_MS = float(os.getenv("WSOLA_FRAME_MS", "30"))
+WSOLA_SEEK_MS = float(os.getenv("WSOLA_SEEK_MS", "10"))
+# Correlate every Nth sample when searching; speech is band-limited enough that
+# this barely changes the chosen offsets and cuts the search cost by N
+WSOLA_DECIMATE = int(os.getenv("WSOLA_DECIMATE", "4"))
+
+
+def clamp_ratio(current_seconds, target_seconds):
+    """Speed factor needed to fit current into target, bounded to sane values"""
+    if current_seconds <= 0:
+        return 1.0
+    if target_seconds <= 0:
+        return STRETCH_MAX_RATIO
+    return min(STRETCH_MAX_RATIO, max(STRETCH_MIN_RATIO, current_seconds / target_seconds))
+
+
+class Wsola:
+    """WSOLA stretcher for one sample rate; reusable across segments"""
+
+    def __init__(self, sample_rate, frame_ms=WSOLA_FRAME_MS, seek_ms=WSOLA_SEEK_MS, decimate=WSOLA_DECIMATE):
+        self.sample_rate = sample_rate
+        self.decimate = max(1, decimate)
+        self.frame = max(64, int(sample_rate * frame_ms / 1000) // 2 * 2)
+        self.hop = self.frame // 2
+        self.seek = max(1, int(sample_rate * seek_ms / 1000))
+        self.window = np.hanning(self.frame).astype(np.float32)
+
+    def stretch(self, samples, speed):
+        """samples: float32 mono array; speed > 1 shortens, < 1 lengthens"""
+        n = len(samples)
+        if n < self.frame * 2 or abs(speed - 1.0) < 1e-3:
+            return samples.astype(np.float32, copy=False)
+
+        frame, hop, seek, step = self.frame, self.hop, self.seek, self.decimate
+        out_len = int(n / speed)
+        n_frames = max(1, (out_len - frame) // hop + 1)
+        # Pad so every analysis position plus seek range is addressable
+        padded = np.concatenate([np.zeros(seek, np.float32), samples.astype(np.float32),
+                                 np.zeros(frame + 2 * seek + int(hop * speed) + hop, np.float32)])
+        candidates = sliding_window_view(padded, frame)
+
+        out = np.zeros(n_frames * hop + frame, dtype=np.float32)
+        norm = np.zeros_like(out)
+        prev = 0  # position (in padded) of the last frame we copied
+        for k in range(n_frames):
+            nominal = int(round(k * hop * speed)) + seek
+            if k == 0:
+                pos = nominal
+            else:
+                # Continue the previous frame naturally, then find the candidate
+                # around the nominal position that best matches that continuation
+                template = padded[prev + hop:prev + hop + frame:step]
+                lo = nominal - seek
+                block = candidates[lo:lo + 2 * seek + 1, ::step]
+                scores = block @ template
+                pos = lo + int(np.argmax(scores))
+            start = k * hop
+            out[start:start + frame] += candidates[pos] * self.window
+            norm[start:start + frame] += self.window
+            prev = pos
+
+        out = out[:out_len]
+        norm = norm[:out_len]
+        np.divide(out, norm, out=out, where=norm > 1e-3)
+        return out
+
+    def stretch_many(self, items):
+        """stretch() for a list of (samples, speed), frame k of every segment at once"""
+        frame, hop, seek = self.frame, self.hop, self.seek
+        results = [None] * len(items)
+        batch = []
+        for i, (samples, speed) in enumerate(items):
+            if len(samples) < frame * 2 or abs(speed - 1.0) < 1e-3:
+                results[i] = samples.astype(np.float32, copy=False)
+            else:
+                batch.append(i)
+        if not batch:
+            return results
+
+        # Every segment's padded input and output live at an offset in one shared buffer
+        speeds = np.array([items[i][1] for i in batch], dtype=np.float64)
+        out_lens = np.array([int(len(items[i][0]) / items[i][1]) for i in batch], dtype=np.int64)
+        n_frames = np.maximum(1, (out_lens - frame) // hop + 1)
+        padded = [np.concatenate([np.zeros(seek, np.float32), items[i][0].astype(np.float32),
+                                  np.zeros(frame + 2 * seek + int(hop * speed) + hop, np.float32)])
+                  for i, speed in zip(batch, speeds)]
+        bases = np.cumsum([0] + [len(p) for p in padded[:-1]])
+        out_bases = np.cumsum(np.concatenate([[0], n_frames[:-1] * hop + frame]))
+        source = np.concatenate(padded)
+        candidates = sliding_window_view(source, frame)
+        out = np.zeros(int(out_bases[-1] + n_frames[-1] * hop + frame), dtype=np.float32)
+        norm = np.zeros_like(out)
+
+        frame_idx = np.arange(frame)
+        region_idx = np.arange(2 * seek + frame)
+        nfft = 1 << (2 * seek + 2 * frame - 1).bit_length()
+        prev = np.zeros(len(batch), dtype=np.int64)
+        for k in range(int(n_frames.max())):
+            active = np.flatnonzero(n_frames > k)
+            nominal = bases[active] + np.round(k * hop * speeds[active]).astype(np.int64) + seek
+            if k == 0:
+                pos = nominal
+            else:
+                # Same search as stretch(), as one cross-correlation per segment
+                template = source[(prev[active] + hop)[:, None] + frame_idx]
+                lo = nominal - seek
+                region = source[lo[:, None] + region_idx]
+                spectrum = np.fft.rfft(region, nfft) * np.conj(np.fft.rfft(template, nfft))
+                scores = np.fft.irfft(spectrum, nfft)[:, :2 * seek + 1]
+                pos = lo + scores.argmax(axis=1)
+            # Output frames of different segments never overlap, so one fancy-indexed add is safe
+            dest = (out_bases[active] + k * hop)[:, None] + frame_idx
+            out[dest] += candidates[pos] * self.window
+            norm[dest] += self.window
+            prev[active] = pos
+
+        for j, i in enumerate(batch):
+            first = out_bases[j]
+            seg = out[first:first + out_lens[j]]
+            seg_norm = norm[first:first + out_lens[j]]
+            np.divide(seg, seg_norm, out=seg, where=seg_norm > 1e-3)
+            results[i] = seg
+        return results
+
+
+_stretchers = {}
+
+
+def stretcher_for(sample_rate):
+    if sample_rate not in _stretchers:
+        _stretchers[sample_rate] = Wsola(sample_rate)
+    return _stretchers[sample_rate]
+
+
+def _mono_and_speed(samples, sample_rate, target_seconds):
+    if samples.ndim == 2:
+        mono = samples.mean(axis=1)
+    else:
+        mono = samples.astype(np.float32)
+    return mono, clamp_ratio(len(mono) / sample_rate, target_seconds)
+
+
+def _to_int16(samples):
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def fit_to_duration(samples, sample_rate, target_seconds):
+    """Stretch int16 PCM ([frames] or [frames, channels]) towards target_seconds
+
+    Returns mono int16 samples; speech is downmixed before stretching.
+    """
+    mono, speed = _mono_and_speed(samples, sample_rate, target_seconds)
+    if abs(speed - 1.0) < STRETCH_TOLERANCE:
+        return mono.astype(np.int16)
+    return _to_int16(stretcher_for(sample_rate).stretch(mono.astype(np.float32), speed))
+
+
+def fit_many(items):
+    """fit_to_duration for a list of (samples, sample_rate, target_seconds), stretched as one batch per rate"""
+    results = [None] * len(items)
+    by_rate = {}
+    for i, (samples, sample_rate, target_seconds) in enumerate(items):
+        mono, speed = _mono_and_speed(samples, sample_rate, target_seconds)
+        if abs(speed - 1.0) < STRETCH_TOLERANCE:
+            results[i] = mono.astype(np.int16)
+        else:
+            by_rate.setdefault(sample_rate, []).append((i, mono.astype(np.float32), speed))
+    for sample_rate, group in by_rate.items():
+        stretched = stretcher_for(sample_rate).stretch_many([(mono, speed) for _, mono, speed in group])
+        for (i, _, _), out in zip(group, stretched):
+            results[i] = _to_int16(out)
+    return results
+
@@ -0,0 +1,295 @@
+"""
+Batched translation for the dubbing pipeline.
+
+Segments are short, so one HTTP round trip per segment is mostly latency.
+BatchTranslator collects the texts that dubbing workers ask for within a
+short window, packs them into size-limited batches and sends each batch to a
+TranslationBackend in a single call. Batches in flight are bounded by the
+backend's process-wide AdaptiveLimiter (limiter.py).
+"""
+import os
+import re
+import time
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from limiter import get_limiter
+
+# Configuration
+TRANSLATE_BACKEND = os.getenv("TRANSLATE_BACKEND", "google")  # google | http | fake
+TRANSLATE_URL = os.getenv("TRANSLATE_URL", "http://localhost:8200")
+TRANSLATE_BATCH_MAX_CHARS = int(os.getenv("TRANSLATE_BATCH_MAX_CHARS", "4500"))
+TRANSLATE_BATCH_MAX_ITEMS = int(os.getenv("TRANSLATE_BATCH_MAX_ITEMS", "50"))
+TRANSLATE_BATCH_WAIT_MS = int(os.getenv("TRANSLATE_BATCH_WAIT_MS", "50"))
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "4"))  # starting limit
+TRANSLATE_CONCURRENCY_MAX = int(os.getenv("TRANSLATE_CONCURRENCY_MAX", "16"))
+TRANSLATE_RETRIES = int(os.getenv("TRANSLATE_RETRIES", "3"))
+TRANSLATE_BACKOFF_SECONDS = float(os.getenv("TRANSLATE_BACKOFF_SECONDS", "0.5"))
+TRANSLATE_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_TIMEOUT_SECONDS", "30"))
+
+# Numbered markers survive machine translation far better than punctuation,
+# and the numbers let us check that nothing was merged or reordered.
+SENTINEL = "\n[[[{}]]]\n"
+SENTINEL_RE = re.compile(r"\s*\[\[\[\s*(\d+)\s*\]\]\]\s*")
+
+
+class TranslationError(Exception):
+    pass
+
+
+def join_with_sentinels(texts):
+    return "".join(SENTINEL.format(n) + text for n, text in enumerate(texts))
+
+
+def split_on_sentinels(packed, expected):
+    parts = SENTINEL_RE.split(packed)
+    # split() gives [prefix, n0, text0, n1, text1, ...]
+    numbers = parts[1::2]
+    texts = [t.strip() for t in parts[2::2]]
+    if len(texts) != expected or numbers != [str(n) for n in range(expected)]:
+        raise TranslationError(f"Batch boundaries lost: expected {expected} segments, got {len(texts)}")
+    return texts
+
+
+def pack_batches(texts, max_chars=TRANSLATE_BATCH_MAX_CHARS, max_items=TRANSLATE_BATCH_MAX_ITEMS):
+    """Split texts into consecutive batches that fit the request limits"""
+    batches = []
+    current = []
+    size = 0
+    for text in texts:
+        cost = len(text) + len(SENTINEL.format(len(current)))
+        if current and (size + cost > max_chars or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            size = 0
+            cost = len(text) + len(SENTINEL.format(0))
+        current.append(text)
+        size += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def with_retries(fn, retries=TRANSLATE_RETRIES, backoff=TRANSLATE_BACKOFF_SECONDS):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (0.5 + random.random())
+            print(f"Translation attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+
+class TranslationBackend:
+    """Translates a list of texts in one call, preserving order"""
+
+    name = "base"
+
+    def translate_batch(self, texts, src, dest):
+        raise NotImplementedError
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    """googletrans with sentinel-packed requests
+
+    googletrans.Translator wraps an httpx client that is not safe to share
+    between threads, so each thread gets its own.
+    """
+
+    name = "google"
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def translator(self):
+        if not hasattr(self.local, "translator"):
+            from googletrans import Translator
+            self.local.translator = Translator()
+        return self.local.translator
+
+    def translate_batch(self, texts, src, dest):
+        translator = self.translator()
+        if len(texts) == 1:
+            return [translator.translate(texts[0], src=src, dest=dest).text]
+        packed = translator.translate(join_with_sentinels(texts), src=src, dest=dest).text
+        try:
+            return split_on_sentinels(packed, len(texts))
+        except TranslationError as e:
+            # Rare, but when the engine mangles a marker fall back to one call per text
+            print(f"{e}; translating {len(texts)} segments individually")
+            return [translator.translate(t, src=src, dest=dest).text for t in texts]
+
+
+class HttpTranslateBackend(TranslationBackend):
+    """service-translate's /translate/batch endpoint"""
+
+    name = "http"
+
+    def __init__(self, base_url=TRANSLATE_URL, timeout=TRANSLATE_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            import requests
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def translate_batch(self, texts, src, dest):
+        resp = self.session().post(
+            f"{self.base_url}/translate/batch",
+            json={"texts": texts, "source_lang": src, "target_lang": dest},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        translations = resp.json()["translations"]
+        if len(translations) != len(texts):
+            raise TranslationError(f"Expected {len(texts)} translations, got {len(translations)}")
+        return translations
+
+
+class FakeTranslationBackend(TranslationBackend):
+    """Local stand-in with a configurable round trip, for benchmarks"""
+
+    name = "fake"
+
+    def __init__(self, latency_ms=80, per_char_ms=0.01):
+        self.latency_ms = latency_ms
+        self.per_char_ms = per_char_ms
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def translate_batch(self, texts, src, dest):
+        with self.lock:
+            self.calls += 1
+        packed = join_with_sentinels(texts)
+        time.sleep((self.latency_ms + self.per_char_ms * len(packed)) / 1000)
+        translated = SENTINEL_RE.sub(lambda m: m.group(0) + f"[{dest}] ", packed)
+        return split_on_sentinels(translated, len(texts))
+
+
+class BatchTranslator:
+    """Thread-safe front end that coalesces concurrent translate() calls into batches"""
+
+    def __init__(self, backend, max_chars=TRANSLATE_BATCH_MAX_CHARS, max_items=TRANSLATE_BATCH_MAX_ITEMS,
+                 max_wait_ms=TRANSLATE_BATCH_WAIT_MS, concurrency=TRANSLATE_CONCURRENCY,
+                 max_concurrency=TRANSLATE_CONCURRENCY_MAX):
+        self.backend = backend
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self.pending = {}  # (src, dest) -> [(text, future)]
+        self.first_pending_at = {}
+        self.cond = threading.Condition()
+        max_concurrency = max(concurrency, max_concurrency)
+        self.limiter = get_limiter(f"translate:{backend.name}", concurrency, max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="translate")
+        self.batches_sent = 0
+        self.texts_sent = 0
+        self.flusher = threading.Thread(target=self._flush_loop, name="translate-batcher", daemon=True)
+        self.flusher.start()
+
+    def translate(self, text, dest, src="auto"):
+        """Translate one text; blocks until its batch comes back"""
+        return self.submit(text, dest, src).result()
+
+    def submit(self, text, dest, src="auto"):
+        future = Future()
+        key = (src, dest)
+        with self.cond:
+            if key not in self.pending:
+                self.pending[key] = []
+                self.first_pending_at[key] = time.monotonic()
+            self.pending[key].append((text, future))
+            self.cond.notify()
+        return future
+
+    def translate_many(self, texts, dest, src="auto"):
+        """Translate a known list of texts, batched without waiting for stragglers"""
+        futures = [self.executor.submit(self._send, batch, src, dest)
+                   for batch in pack_batches(texts, self.max_chars, self.max_items)]
+        results = []
+        for f in futures:
+            results.extend(f.result())
+        return results
+
+    def _ready(self, key, now):
+        items = self.pending[key]
+        size = sum(len(t) for t, _ in items)
+        return (len(items) >= self.max_items or size >= self.max_chars
+                or now - self.first_pending_at[key] >= self.max_wait)
+
+    def _flush_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                now = time.monotonic()
+                ready = [k for k in self.pending if self._ready(k, now)]
+                if not ready:
+                    oldest = min(self.first_pending_at.values())
+                    self.cond.wait(timeout=max(0.0, oldest + self.max_wait - now))
+                    continue
+                taken = [(k, self.pending.pop(k)) for k in ready]
+                for k in ready:
+                    del self.first_pending_at[k]
+            for (src, dest), items in taken:
+                texts = [t for t, _ in items]
+                offset = 0
+                for batch in pack_batches(texts, self.max_chars, self.max_items):
+                    futures = [f for _, f in items[offset:offset + len(batch)]]
+                    offset += len(batch)
+                    self.executor.submit(self._send_to_futures, batch, src, dest, futures)
+
+    def _send(self, texts, src, dest):
+        # Every attempt takes a slot, so a throttled batch waits for the lowered limit before retrying
+        result = with_retries(lambda: self.limiter.call(lambda: self.backend.translate_batch(texts, src, dest)))
+        with self.cond:
+            self.batches_sent += 1
+            self.texts_sent += len(texts)
+        return result
+
+    def _send_to_futures(self, texts, src, dest, futures):
+        try:
+            translations = self._send(texts, src, dest)
+        except Exception as e:
+            for f in futures:
+                f.set_exception(e)
+            return
+        for f, t in zip(futures, translations):
+            f.set_result(t)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "backend": self.backend.name,
+                "batches": self.batches_sent,
+                "texts": self.texts_sent,
+                "avgBatchSize": round(self.texts_sent / self.batches_sent, 2) if self.batches_sent else 0.0,
+                "limit": self.limiter.stats()["limit"],
+            }
+
+
+def create_backend(name=TRANSLATE_BACKEND):
+    if name == "http":
+        return HttpTranslateBackend()
+    if name == "fake":
+        return FakeTranslationBackend()
+    return GoogleTranslateBackend()
+
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """Process-wide BatchTranslator so concurrent jobs share batches and connections"""
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            _translator = BatchTranslator(create_backend())
+        return _translator
@@ -0,0 +1,100 @@
+"""
+Text-to-speech backends that return audio in memory.
+
+Backends produce encoded audio bytes (which is what gets cached); decode_pcm
+turns those bytes into 16-bit PCM without writing temp files. MP3 is decoded
+in-process by libsndfile when available and falls back to piping through
+ffmpeg via pydub otherwise. Calls to the backend go through its
+process-wide AdaptiveLimiter (limiter.py), see tts_limiter().
+"""
+import io
+import os
+import threading
+
+import numpy as np
+
+from limiter import get_limiter
+
+# Configuration
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")  # gtts | http
+TTS_URL = os.getenv("TTS_URL", "http://localhost:8300")
+TTS_TIMEOUT_SECONDS = float(os.getenv("TTS_TIMEOUT_SECONDS", "60"))
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))  # starting limit
+TTS_CONCURRENCY_MAX = int(os.getenv("TTS_CONCURRENCY_MAX", "16"))
+
+
+class TtsBackend:
+    name = "base"
+    voice = "default"
+    format = "mp3"
+
+    def synthesize(self, text, lang):
+        """Return encoded audio bytes for text"""
+        raise NotImplementedError
+
+
+class GttsBackend(TtsBackend):
+    name = "gtts"
+    voice = "gtts"
+    format = "mp3"
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+        buf = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buf)
+        return buf.getvalue()
+
+
+class HttpTtsBackend(TtsBackend):
+    """service-tts /synthesize with the audio streamed back in the response"""
+
+    name = "http"
+    format = "wav"
+
+    def __init__(self, base_url=TTS_URL, voice=None, timeout=TTS_TIMEOUT_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.voice = voice or "default"
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            import requests
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def synthesize(self, text, lang):
+        resp = self.session().post(
+            f"{self.base_url}/synthesize",
+            json={"text": text, "lang": lang, "voice": self.voice, "stream": True},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        return resp.content
+
+
+def create_tts_backend(name=TTS_BACKEND):
+    if name == "http":
+        return HttpTtsBackend()
+    return GttsBackend()
+
+
+def tts_limiter(backend):
+    """Concurrency limit for backend, shared by every job in this process"""
+    return get_limiter(f"tts:{backend.name}", TTS_CONCURRENCY, TTS_CONCURRENCY_MAX)
+
+
+def decode_pcm(data, format="mp3"):
+    """Decode encoded audio bytes to (int16 samples shaped [frames, channels], sample_rate)"""
+    try:
+        import soundfile as sf
+        samples, sample_rate = sf.read(io.BytesIO(data), dtype="int16", always_2d=True)
+        return samples, sample_rate
+    except Exception:
+        # Older libsndfile builds can't read MP3; let ffmpeg decode from a pipe
+        from pydub import AudioSegment
+        seg = AudioSegment.from_file(io.BytesIO(data), format=format)
+        seg = seg.set_sample_width(2)
+        samples = np.frombuffer(seg.raw_data, dtype=np.int16).reshape(-1, seg.channels)
+        return samples, seg.frame_rate
+
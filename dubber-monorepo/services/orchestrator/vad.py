@@ -0,0 +1,181 @@
+"""
+Energy-based voice activity over the extracted ASR audio.
+
+One vectorized pass computes the level of every 30 ms frame of the 16 kHz
+WAV (in blocks, so hours of audio never have to sit in memory as floats).
+Frames are voiced when they stand clearly above the noise floor; short
+blips are dropped and speech is padded a little at both ends. The result
+is used three ways:
+
+- speech_clips(): the spans Whisper should decode; long silences between
+  them are skipped (faster-whisper clip_timestamps)
+- trim(): shrink a Whisper segment to its first and last voiced frame, so
+  the dub is timed to the speech and not to the silence around it. A
+  segment without voiced frames is only dropped when Whisper's own
+  no_speech_prob agrees: on continuous speech or speech over music the
+  noise floor is itself speech, and quiet phrases fall below the threshold
+- merge_segments(): join very short neighbouring segments into one
+  translate/TTS unit
+"""
+import os
+
+import numpy as np
+
+from asr import Segment, wav_pcm
+
+# Configuration
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_FRAME_MS = float(os.getenv("VAD_FRAME_MS", "30"))
+# A frame is voiced when it is VAD_MARGIN_DB above the noise floor (and not
+# more than VAD_RANGE_DB below the loud parts, so a noisy floor can't win)
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+VAD_RANGE_DB = float(os.getenv("VAD_RANGE_DB", "35"))
+VAD_MIN_SPEECH_MS = float(os.getenv("VAD_MIN_SPEECH_MS", "120"))
+VAD_PAD_MS = float(os.getenv("VAD_PAD_MS", "150"))
+VAD_MIN_SKIP_SECONDS = float(os.getenv("VAD_MIN_SKIP_SECONDS", "2.0"))  # shorter silences are still decoded
+VAD_DROP_SILENT_SEGMENTS = os.getenv("VAD_DROP_SILENT_SEGMENTS", "true").lower() == "true"
+# ...and Whisper rates the segment at least this likely to be silence (its own no_speech_threshold)
+VAD_NO_SPEECH_PROB = float(os.getenv("VAD_NO_SPEECH_PROB", "0.6"))
+MERGE_MIN_SECONDS = float(os.getenv("MERGE_MIN_SECONDS", "1.5"))  # segments shorter than this get merged
+MERGE_MAX_SECONDS = float(os.getenv("MERGE_MAX_SECONDS", "12"))
+MERGE_MAX_GAP_SECONDS = float(os.getenv("MERGE_MAX_GAP_SECONDS", "0.4"))
+
+BLOCK_FRAMES = 20000  # frames converted to float at a time (10 minutes at 30 ms)
+SILENCE_DB = -90.0
+
+
+def frame_levels(pcm, sample_rate, frame_ms=VAD_FRAME_MS):
+    """dBFS of every frame of int16 PCM ([samples] or [samples, channels])"""
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    n = len(pcm) // frame
+    levels = np.empty(n, dtype=np.float32)
+    for first in range(0, n, BLOCK_FRAMES):
+        last = min(n, first + BLOCK_FRAMES)
+        block = np.asarray(pcm[first * frame:last * frame])
+        if block.ndim == 2:
+            block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        block = block.astype(np.float32).reshape(last - first, frame) / 32768.0
+        power = np.einsum("ij,ij->i", block, block) / frame
+        levels[first:last] = 10 * np.log10(np.maximum(power, 1e-9))
+    return levels
+
+
+def _runs(mask):
+    """(start, end) frame indices of the True runs in mask"""
+    edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class VoiceActivity:
+    def __init__(self, levels, frame_seconds, margin_db=VAD_MARGIN_DB, range_db=VAD_RANGE_DB,
+                 min_speech_ms=VAD_MIN_SPEECH_MS, pad_ms=VAD_PAD_MS):
+        self.frame_seconds = frame_seconds
+        self.duration = len(levels) * frame_seconds
+        if len(levels):
+            floor = float(np.percentile(levels, 10))
+            loud = float(np.percentile(levels, 98))
+        else:
+            floor = loud = SILENCE_DB
+        self.threshold = max(floor + margin_db, loud - range_db)
+        voiced = levels > self.threshold
+
+        # Drop blips shorter than min_speech_ms (clicks, door slams)
+        starts, ends = _runs(voiced)
+        too_short = (ends - starts) * frame_seconds * 1000 < min_speech_ms
+        for s, e in zip(starts[too_short], ends[too_short]):
+            voiced[s:e] = False
+
+        # Pad speech at both ends: a frame is kept if any voiced frame is within pad frames
+        pad = int(round(pad_ms / 1000 / frame_seconds))
+        if pad:
+            counts = np.concatenate([[0], np.cumsum(voiced, dtype=np.int64)])
+            idx = np.arange(len(voiced))
+            lo = np.clip(idx - pad, 0, len(voiced))
+            hi = np.clip(idx + pad + 1, 0, len(voiced))
+            voiced = (counts[hi] - counts[lo]) > 0
+        self.voiced = voiced
+        # Prefix sums answer "any speech in [a, b)?" in O(1) for trim()
+        self.counts = np.concatenate([[0], np.cumsum(voiced, dtype=np.int64)])
+
+    @classmethod
+    def from_wav(cls, path, **kwargs):
+        pcm, sample_rate = wav_pcm(path)
+        return cls(frame_levels(pcm, sample_rate), VAD_FRAME_MS / 1000, **kwargs)
+
+    def speech_fraction(self):
+        return float(self.voiced.mean()) if len(self.voiced) else 0.0
+
+    def speech_clips(self, min_skip_seconds=VAD_MIN_SKIP_SECONDS, lo=0.0, hi=None):
+        """[(start, end)] seconds worth decoding within [lo, hi); silences under min_skip_seconds are kept"""
+        hi = self.duration if hi is None else hi
+        first = int(lo / self.frame_seconds)
+        last = int(np.ceil(hi / self.frame_seconds))
+        starts, ends = _runs(self.voiced[first:last])
+        if not len(starts):
+            return []
+        # Close gaps too short to be worth a separate decode window
+        gaps = (starts[1:] - ends[:-1]) * self.frame_seconds
+        keep = np.concatenate([[True], gaps >= min_skip_seconds])
+        starts = starts[keep]
+        ends = np.concatenate([ends[:-1][keep[1:]], ends[-1:]])
+        return [(max(lo, float((first + s) * self.frame_seconds)), min(hi, float((first + e) * self.frame_seconds)))
+                for s, e in zip(starts, ends)]
+
+    def trim(self, start, end):
+        """(start, end) shrunk to the voiced frames inside it; None if it holds no speech"""
+        first = max(0, int(start / self.frame_seconds))
+        last = min(len(self.voiced), int(np.ceil(end / self.frame_seconds)))
+        if last <= first or self.counts[last] == self.counts[first]:
+            return None
+        voiced = np.flatnonzero(self.voiced[first:last])
+        return (max(start, float((first + voiced[0]) * self.frame_seconds)),
+                min(end, float((first + voiced[-1] + 1) * self.frame_seconds)))
+
+
+def clip_timestamps(clips):
+    """faster-whisper's flat [start, end, start, end, ...] form"""
+    return [round(t, 3) for clip in clips for t in clip]
+
+
+def trim_segments(segments, vad, drop_silent=VAD_DROP_SILENT_SEGMENTS, no_speech_prob=VAD_NO_SPEECH_PROB, stats=None):
+    """Trim every segment to its speech
+
+    A segment without voiced frames is a Whisper hallucination only if
+    Whisper also thought it was silence; segments that don't carry a
+    no_speech_prob (chunked ASR, checkpoints) are never dropped.
+    """
+    for seg in segments:
+        bounds = vad.trim(seg.start, seg.end)
+        if bounds is None:
+            prob = getattr(seg, "no_speech_prob", None)
+            if drop_silent and prob is not None and prob >= no_speech_prob:
+                if stats is not None:
+                    stats["dropped"] = stats.get("dropped", 0) + 1
+                continue
+            if stats is not None:
+                stats["keptUnvoiced"] = stats.get("keptUnvoiced", 0) + 1
+            bounds = (seg.start, seg.end)
+        if stats is not None:
+            stats["trimmedSeconds"] = stats.get("trimmedSeconds", 0.0) + (seg.end - seg.start) - (bounds[1] - bounds[0])
+        yield Segment(bounds[0], bounds[1], seg.text)
+
+
+def merge_segments(segments, min_seconds=MERGE_MIN_SECONDS, max_seconds=MERGE_MAX_SECONDS,
+                   max_gap=MERGE_MAX_GAP_SECONDS, stats=None):
+    """Join short neighbours into one TTS unit; streams, holding back at most one segment"""
+    pending = None
+    for seg in segments:
+        if not seg.text.strip():
+            continue
+        seg = Segment(seg.start, seg.end, seg.text)
+        if pending is not None:
+            short = (pending.end - pending.start) < min_seconds or (seg.end - seg.start) < min_seconds
+            if short and seg.start - pending.end <= max_gap and seg.end - pending.start <= max_seconds:
+                pending = pending._replace(end=seg.end, text=f"{pending.text.strip()} {seg.text.strip()}")
+                if stats is not None:
+                    stats["merged"] = stats.get("merged", 0) + 1
+                continue
+            yield pending
+        pending = seg
+    if pending is not None:
+        yield pending
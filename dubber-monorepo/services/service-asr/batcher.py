@@ -0,0 +1,136 @@
+"""
+Dynamic micro-batching for the resident ASR model.
+
+Requests are split into speech windows and every window is submitted as
+one item. The batcher takes the first waiting item, then keeps collecting
+compatible items (same language/task/beam size) until it has
+ASR_MAX_BATCH_SIZE of them or ASR_MAX_WAIT_MS has passed. The whole batch
+goes to the model in one call on a worker thread, so the event loop never
+blocks. While the model is busy, new items queue up and form the next
+(larger) batch.
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class WorkItem:
+    audio: np.ndarray  # float32 mono at the model's sample rate
+    offset: float      # where this window starts in the request's audio (seconds)
+    key: Tuple         # items are only batched with items of the same key
+    future: Optional[asyncio.Future] = None
+    submitted: float = field(default_factory=time.monotonic)
+
+
+class MicroBatcher:
+    def __init__(self, run_batch: Callable[[List[WorkItem]], List[Any]], executor, max_batch_size: int,
+                 max_wait_ms: float, concurrency: int = 1):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.slots = asyncio.Semaphore(max(1, concurrency))
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.deferred: deque = deque()  # items that didn't match the last batch's key
+        self.task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    def submit(self, item: WorkItem) -> asyncio.Future:
+        item.future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(item)
+        return item.future
+
+    def pending(self) -> int:
+        return self.queue.qsize() + len(self.deferred)
+
+    async def _next(self, timeout=None):
+        if self.deferred:
+            return self.deferred.popleft()
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    async def _collect(self) -> List[WorkItem]:
+        first = await self._next()
+        batch = [first]
+        # Matching items deferred earlier go first, in arrival order
+        for item in list(self.deferred):
+            if len(batch) >= self.max_batch_size:
+                break
+            if item.key == first.key:
+                self.deferred.remove(item)
+                batch.append(item)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and self.queue.empty():
+                break
+            try:
+                item = self.queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self.queue.get(), remaining)
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if item.key == first.key:
+                batch.append(item)
+            else:
+                self.deferred.append(item)
+        return batch
+
+    async def _loop(self):
+        while True:
+            # Wait for a free model slot first, so items pile up while it's busy
+            await self.slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self.slots.release()
+                raise
+            asyncio.get_running_loop().create_task(self._execute(batch))
+
+    async def _execute(self, batch: List[WorkItem]):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            results = await loop.run_in_executor(self.executor, self.run_batch, batch)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+            self.batches += 1
+            self.items += len(batch)
+            self.busy_seconds += time.monotonic() - started
+            self.queue_wait_seconds += sum(started - item.submitted for item in batch)
+        for item, result in zip(batch, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avgBatchSize": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "avgQueueWaitMs": round(1000 * self.queue_wait_seconds / self.items, 1) if self.items else 0.0,
+            "busySeconds": round(self.busy_seconds, 3),
+            "pending": self.pending(),
+        }
@@ -0,0 +1,153 @@
+"""
+Load test for the ASR service: latency percentiles and throughput per concurrency level.
+
+Start the service with a small model, e.g.
+
+    WHISPER_MODEL_SIZE=tiny uvicorn main:app --port 8100
+
+then run from services/service-asr:
+
+    python benchmarks/loadtest.py --concurrency 1,4,16 --requests 32
+
+Each request uploads the same clip (--audio, or a generated one) and reads
+the NDJSON stream; "first" is the time to the first segment line and
+"latency" the time to the final line. Results are printed as JSON lines,
+together with the server's batching counters for that level.
+"""
+import io
+import sys
+import json
+import time
+import uuid
+import wave
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def synthetic_wav(seconds, sample_rate=16000):
+    """Bursts of voiced-sounding tones separated by pauses, so VAD finds several windows"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    voiced = sum(np.sin(2 * np.pi * k * np.cumsum(pitch) / sample_rate) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 0.25 * t) > -0.3).astype(np.float32)
+    samples = (0.3 * voiced * envelope + 0.01 * np.random.randn(len(t))).clip(-1, 1)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((samples * 32767).astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+def multipart(fields, filename, data):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def one_request(url, body, content_type, timeout):
+    started = time.perf_counter()
+    first = None
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        for line in response:
+            event = json.loads(line)
+            if event["type"] == "segment" and first is None:
+                first = time.perf_counter() - started
+            elif event["type"] == "error":
+                raise RuntimeError(event["detail"])
+    latency = time.perf_counter() - started
+    return latency, first if first is not None else latency
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def run_level(base_url, concurrency, requests, body, content_type, audio_seconds, timeout):
+    before = (get_json(f"{base_url}/health").get("batching") or {})
+    latencies, firsts, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(_):
+        try:
+            latency, first = one_request(f"{base_url}/transcribe", body, content_type, timeout)
+            with lock:
+                latencies.append(latency)
+                firsts.append(first)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(requests)))
+    elapsed = time.perf_counter() - started
+    after = (get_json(f"{base_url}/health").get("batching") or {})
+    batches = after.get("batches", 0) - before.get("batches", 0)
+    items = after.get("items", 0) - before.get("items", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "p50LatencyMs": round(1000 * percentile(latencies, 50), 1),
+        "p99LatencyMs": round(1000 * percentile(latencies, 99), 1),
+        "p50FirstSegmentMs": round(1000 * percentile(firsts, 50), 1),
+        "p99FirstSegmentMs": round(1000 * percentile(firsts, 99), 1),
+        "requestsPerSecond": round(len(latencies) / elapsed, 2),
+        "audioSecondsPerSecond": round(len(latencies) * audio_seconds / elapsed, 2),
+        "avgBatchSize": round(items / batches, 2) if batches else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8100")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--audio", help="audio file to upload (default: generated)")
+    parser.add_argument("--seconds", type=float, default=20, help="length of the generated clip")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            data = f.read()
+        try:
+            with wave.open(io.BytesIO(data)) as w:
+                audio_seconds = w.getnframes() / w.getframerate()
+        except wave.Error:
+            audio_seconds = args.seconds
+    else:
+        data = synthetic_wav(args.seconds)
+        audio_seconds = args.seconds
+    body, content_type = multipart({"language": args.language, "stream": "true"}, "clip.wav", data)
+
+    for _ in range(args.warmup):
+        one_request(f"{args.url}/transcribe", body, content_type, args.timeout)
+
+    for level in [int(c) for c in args.concurrency.split(",")]:
+        result = run_level(args.url, level, args.requests, body, content_type, audio_seconds, args.timeout)
+        print(json.dumps(result))
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
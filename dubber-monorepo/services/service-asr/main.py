@@ -1,23 +1,170 @@
-from fastapi import FastAPI, UploadFile, File
-from pydantic import BaseModel
-from typing import List
-
-app = FastAPI(title="ASR Service")
-
-class Segment(BaseModel):
-    start: float
-    end: float
-    text: str
-
-class TranscriptionResponse(BaseModel):
-    segments: List[Segment]
-
-@app.post("/transcribe", response_model=TranscriptionResponse)
-async def transcribe(file: UploadFile = File(...)):
-    # TODO: save file, run Whisper, parse segments
-    dummy = Segment(start=0.0, end=5.0, text="Dummy transcription.")
-    return TranscriptionResponse(segments=[dummy])
-
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import json
+import time
+import asyncio
+import numpy as np
+from batcher import MicroBatcher, WorkItem
+
+# Configuration
+ASR_BACKEND = os.getenv("ASR_BACKEND", "whisper")  # whisper | fake (no model, for load-test plumbing)
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))  # 0: CTranslate2 default
+ASR_MAX_BATCH_SIZE = int(os.getenv("ASR_MAX_BATCH_SIZE", "8"))
+ASR_MAX_WAIT_MS = float(os.getenv("ASR_MAX_WAIT_MS", "20"))
+ASR_INFERENCE_WORKERS = int(os.getenv("ASR_INFERENCE_WORKERS", "1"))  # batches running at once
+ASR_BEAM_SIZE = int(os.getenv("ASR_BEAM_SIZE", "5"))
+ASR_WINDOW_SECONDS = float(os.getenv("ASR_WINDOW_SECONDS", "30"))  # Whisper's context length
+ASR_VAD = os.getenv("ASR_VAD", "true").lower() == "true"
+FAKE_BATCH_MS = float(os.getenv("FAKE_BATCH_MS", "200"))
+FAKE_ITEM_MS = float(os.getenv("FAKE_ITEM_MS", "40"))
+
+SAMPLE_RATE = 16000
+
+app = FastAPI(title="ASR Service")
+
+class Segment(BaseModel):
+    start: float
+    end: float
+    text: str
+
+class TranscriptionResponse(BaseModel):
+    segments: List[Segment]
+
+# Model and batcher live for the whole process
+model = None
+pipeline = None
+inference_executor = ThreadPoolExecutor(max_workers=max(1, ASR_INFERENCE_WORKERS), thread_name_prefix="asr-batch")
+batcher: Optional[MicroBatcher] = None
+
+def load_model():
+    global model, pipeline
+    if ASR_BACKEND == "fake":
+        return
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+    print(f"Loading faster-whisper '{WHISPER_MODEL_SIZE}' ({WHISPER_DEVICE}, {WHISPER_COMPUTE_TYPE})...")
+    model = WhisperModel(WHISPER_MODEL_SIZE, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE,
+                         cpu_threads=WHISPER_CPU_THREADS)
+    pipeline = BatchedInferencePipeline(model)
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Any container/codec ffmpeg understands -> float32 mono 16 kHz"""
+    if ASR_BACKEND == "fake":
+        import soundfile as sf
+        samples, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+        samples = samples.mean(axis=1)
+        if rate != SAMPLE_RATE:
+            positions = np.arange(int(len(samples) * SAMPLE_RATE / rate)) * (rate / SAMPLE_RATE)
+            samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        return samples
+    from faster_whisper import decode_audio as fw_decode_audio
+    return fw_decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
+
+def split_windows(audio: np.ndarray):
+    """(start_sample, end_sample) windows of at most ASR_WINDOW_SECONDS, on speech when VAD is on"""
+    window = int(ASR_WINDOW_SECONDS * SAMPLE_RATE)
+    if ASR_VAD and ASR_BACKEND != "fake":
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        speech = get_speech_timestamps(audio, VadOptions(max_speech_duration_s=ASR_WINDOW_SECONDS,
+                                                         min_silence_duration_ms=160))
+        return [(s["start"], s["end"]) for s in speech]
+    return [(start, min(len(audio), start + window)) for start in range(0, len(audio), window)]
+
+def run_batch(items: List[WorkItem]) -> List[List[Segment]]:
+    """One model call for all windows in the batch; returns each window's segments"""
+    if ASR_BACKEND == "fake":
+        time.sleep((FAKE_BATCH_MS + FAKE_ITEM_MS * len(items)) / 1000)
+        return [[Segment(start=round(item.offset, 3), end=round(item.offset + len(item.audio) / SAMPLE_RATE, 3),
+                         text="Fake transcription.")] for item in items]
+
+    language, task, beam_size = items[0].key
+    # Windows are laid end to end in one array and marked as clips, so the
+    # pipeline encodes and decodes them as a single batch
+    starts, clips, t = [], [], 0.0
+    for item in items:
+        duration = len(item.audio) / SAMPLE_RATE
+        starts.append(t)
+        clips.append({"start": t, "end": t + duration})
+        t += duration
+    audio = np.concatenate([item.audio for item in items])
+    segments, _ = pipeline.transcribe(
+        audio, language=language, task=task, beam_size=beam_size,
+        clip_timestamps=clips, batch_size=len(items), vad_filter=False,
+        without_timestamps=False, multilingual=language is None,
+    )
+    results = [[] for _ in items]
+    for s in segments:
+        i = max(0, bisect_right(starts, s.start + 1e-3) - 1)
+        window_end = clips[i]["end"]
+        shift = items[i].offset - starts[i]
+        results[i].append(Segment(start=round(s.start + shift, 3), end=round(min(s.end, window_end) + shift, 3),
+                                  text=s.text.strip()))
+    return results
+
+@app.on_event("startup")
+async def startup():
+    global batcher
+    await run_in_threadpool(load_model)
+    batcher = MicroBatcher(run_batch, inference_executor, ASR_MAX_BATCH_SIZE, ASR_MAX_WAIT_MS,
+                           concurrency=ASR_INFERENCE_WORKERS)
+    batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if batcher:
+        await batcher.stop()
+    inference_executor.shutdown(wait=False)
+
+async def submit_windows(data: bytes, language: Optional[str], task: str, beam_size: int):
+    audio = await run_in_threadpool(decode_audio, data)
+    windows = await run_in_threadpool(split_windows, audio)
+    key = (language or None, task, beam_size)
+    futures = [batcher.submit(WorkItem(audio=audio[a:b], offset=a / SAMPLE_RATE, key=key)) for a, b in windows]
+    return futures, len(audio) / SAMPLE_RATE
+
+@app.post("/transcribe")
+async def transcribe(file: UploadFile = File(...), language: Optional[str] = Form(None),
+                     task: str = Form("transcribe"), beam_size: int = Form(ASR_BEAM_SIZE),
+                     stream: bool = Form(False)):
+    data = await file.read()
+    try:
+        futures, duration = await submit_windows(data, language, task, beam_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode audio: {e}")
+
+    if not stream:
+        results = await asyncio.gather(*futures)
+        return TranscriptionResponse(segments=[s for window in results for s in window])
+
+    async def ndjson():
+        # One line per segment, in timeline order, as soon as its window is decoded
+        count = 0
+        try:
+            for future in futures:
+                for s in await future:
+                    count += 1
+                    yield json.dumps({"type": "segment", "start": s.start, "end": s.end, "text": s.text}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        yield json.dumps({"type": "done", "segments": count, "duration": round(duration, 3)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok" if batcher else "starting",
+        "backend": ASR_BACKEND,
+        "model": WHISPER_MODEL_SIZE if ASR_BACKEND != "fake" else None,
+        "batching": batcher.stats() if batcher else None,
+    }
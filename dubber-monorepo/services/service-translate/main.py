@@ -1,22 +1,95 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-
-app = FastAPI(title="Translate Service")
-
-class TranslateRequest(BaseModel):
-    text: str
-    source_lang: str
-    target_lang: str
-
-class TranslateResponse(BaseModel):
-    translated_text: str
-
-@app.post("/translate", response_model=TranslateResponse)
-async def translate(req: TranslateRequest):
-    # TODO: call NLLB/IndicTrans2 here
-    # For now, echo with prefix
-    return TranslateResponse(translated_text=f"[{req.target_lang}] {req.text}")
-
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+from fastapi import FastAPI
+from pydantic import BaseModel
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import asyncio
+
+# cache.py is shared with the orchestrator; the Dockerfile copies it to ORCHESTRATOR_PATH
+ORCHESTRATOR_PATH = os.getenv(
+    "ORCHESTRATOR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "orchestrator"))
+sys.path.append(os.path.abspath(ORCHESTRATOR_PATH))
+
+from cache import create_cache, cache_key, CACHE_STORE
+
+# Configuration
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", str(os.cpu_count() or 2)))  # cache + model threads
+# Part of every cache key; change it with the model so its cached output isn't served for another
+TRANSLATE_MODEL = os.getenv("TRANSLATE_MODEL", "echo")
+
+def minio_client_from_env():
+    if CACHE_STORE != "minio":
+        return None
+    from minio import Minio
+    return Minio(
+        os.getenv("MINIO_ENDPOINT", "localhost:9000"),
+        access_key=os.getenv("MINIO_ACCESS_KEY", "minio"),
+        secret_key=os.getenv("MINIO_SECRET_KEY", "minio123"),
+        secure=False,
+    )
+
+# Same key layout as the orchestrator's cache, so both can share one store (keys name the model)
+content_cache = create_cache(minio_client_from_env())
+
+app = FastAPI(title="Translate Service")
+
+# Cache I/O and the model block, so they run on a fixed pool and never on the event loop
+translate_executor = ThreadPoolExecutor(max_workers=max(1, TRANSLATE_WORKERS), thread_name_prefix="translate")
+
+class TranslateRequest(BaseModel):
+    text: str
+    source_lang: str
+    target_lang: str
+
+class TranslateResponse(BaseModel):
+    translated_text: str
+
+class BatchTranslateRequest(BaseModel):
+    texts: List[str]
+    source_lang: str
+    target_lang: str
+
+class BatchTranslateResponse(BaseModel):
+    translations: List[str]
+
+def run_model(texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+    # TODO: call NLLB/IndicTrans2 here (one forward pass per batch)
+    # For now, echo with prefix
+    return [f"[{target_lang}] {text}" for text in texts]
+
+def translate_texts(texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+    results = {}
+    misses = []
+    for i, text in enumerate(texts):
+        cached = content_cache.get(cache_key("translate", text, source_lang, target_lang, TRANSLATE_MODEL))
+        if cached is None:
+            misses.append(i)
+        else:
+            results[i] = cached.decode("utf-8")
+    if misses:
+        translated = run_model([texts[i] for i in misses], source_lang, target_lang)
+        for i, text in zip(misses, translated):
+            content_cache.put(cache_key("translate", texts[i], source_lang, target_lang, TRANSLATE_MODEL),
+                              text.encode("utf-8"))
+            results[i] = text
+    return [results[i] for i in range(len(texts))]
+
+async def translate_in_pool(texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(translate_executor, translate_texts, texts, source_lang, target_lang)
+
+@app.post("/translate", response_model=TranslateResponse)
+async def translate(req: TranslateRequest):
+    translated = (await translate_in_pool([req.text], req.source_lang, req.target_lang))[0]
+    return TranslateResponse(translated_text=translated)
+
+@app.post("/translate/batch", response_model=BatchTranslateResponse)
+async def translate_batch(req: BatchTranslateRequest):
+    # Order is preserved: translations[i] belongs to texts[i]
+    translations = await translate_in_pool(req.texts, req.source_lang, req.target_lang)
+    return BatchTranslateResponse(translations=translations)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
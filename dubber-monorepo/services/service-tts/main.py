@@ -1,41 +1,234 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from fastapi.responses import FileResponse
-import uuid
-import os
-import tempfile
-from typing import Optional
-
-app = FastAPI(title="TTS Service")
-
-class TtsRequest(BaseModel):
-    text: str
-    lang: str
-    voice: Optional[str] = None
-
-class TtsResponse(BaseModel):
-    audio_path: str
-
-# Use a cross-platform temp directory so the service works on Windows and Linux
-OUTPUT_DIR = os.path.join(tempfile.gettempdir(), "tts-output")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-@app.post("/synthesize", response_model=TtsResponse)
-async def synthesize(req: TtsRequest):
-    # TODO: call Coqui TTS; for now create dummy file
-    filename = f"{uuid.uuid4()}.wav"
-    path = os.path.join(OUTPUT_DIR, filename)
-    with open(path, "wb") as f:
-        f.write(b"")  # dummy
-    return TtsResponse(audio_path=path)
-
-@app.get("/audio/{filename}")
-async def get_audio(filename: str):
-    path = os.path.join(OUTPUT_DIR, filename)
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="Audio file not found")
-    return FileResponse(path, media_type="audio/wav")
-
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from fastapi.responses import FileResponse, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import sys
+import json
+import wave
+import asyncio
+import tempfile
+import threading
+from typing import Dict, List, Optional
+from output_dir import OutputDir
+
+# cache.py is shared with the orchestrator; the Dockerfile copies it to ORCHESTRATOR_PATH
+ORCHESTRATOR_PATH = os.getenv(
+    "ORCHESTRATOR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "orchestrator"))
+sys.path.append(os.path.abspath(ORCHESTRATOR_PATH))
+
+from cache import create_cache, cache_key, CACHE_STORE
+
+# Configuration
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", str(os.cpu_count() or 2)))  # synthesis threads
+TTS_MAX_PENDING = int(os.getenv("TTS_MAX_PENDING", "256"))  # distinct texts queued or running; beyond that 503
+TTS_BATCH_MAX_ITEMS = int(os.getenv("TTS_BATCH_MAX_ITEMS", "1000"))
+TTS_OUTPUT_MAX_MB = int(os.getenv("TTS_OUTPUT_MAX_MB", "1024"))
+# Use a cross-platform temp directory so the service works on Windows and Linux
+OUTPUT_DIR = os.getenv("TTS_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "tts-output"))
+
+app = FastAPI(title="TTS Service")
+
+class TtsRequest(BaseModel):
+    text: str
+    lang: str
+    voice: Optional[str] = None
+    # Return the audio bytes in the response body instead of a file path
+    stream: bool = False
+
+class TtsResponse(BaseModel):
+    audio_path: str
+
+class BatchItem(BaseModel):
+    text: str
+    id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    lang: str
+    voice: Optional[str] = None
+    items: List[BatchItem]
+    # Emit one NDJSON line per item as it finishes instead of one JSON body at the end
+    stream: bool = False
+
+class BatchResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    filename: str
+    audio_path: str
+    bytes: int
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
+
+outputs = OutputDir(OUTPUT_DIR, TTS_OUTPUT_MAX_MB * 1024 * 1024)
+
+def minio_client_from_env():
+    if CACHE_STORE != "minio":
+        return None
+    from minio import Minio
+    return Minio(
+        os.getenv("MINIO_ENDPOINT", "localhost:9000"),
+        access_key=os.getenv("MINIO_ACCESS_KEY", "minio"),
+        secret_key=os.getenv("MINIO_SECRET_KEY", "minio123"),
+        secure=False,
+    )
+
+# Same key layout as the orchestrator's cache, so both can share one store
+content_cache = create_cache(minio_client_from_env())
+
+SAMPLE_RATE = 22050
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Synthesis is CPU-bound, so it runs on a fixed pool and never on the event loop
+synth_executor = ThreadPoolExecutor(max_workers=max(1, TTS_WORKERS), thread_name_prefix="tts-synth")
+# Cache key -> task for texts being synthesized right now; identical concurrent requests share it
+inflight: Dict[str, asyncio.Future] = {}
+stats = {"requests": 0, "synthesized": 0, "deduplicated": 0, "rejected": 0}
+stats_lock = threading.Lock()  # counted on the event loop and on pool threads
+
+def count(name: str):
+    with stats_lock:
+        stats[name] += 1
+
+def synthesize_audio(text: str, lang: str, voice: Optional[str]) -> bytes:
+    # TODO: call Coqui TTS; for now return silence roughly as long as the text would take to speak
+    frames = int(SAMPLE_RATE * max(0.5, len(text) / 15))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(b"\x00\x00" * frames)
+    return buf.getvalue()
+
+def iter_chunks(data: bytes):
+    view = memoryview(data)
+    for start in range(0, len(data), STREAM_CHUNK_BYTES):
+        yield bytes(view[start:start + STREAM_CHUNK_BYTES])
+
+def output_filename(key: str) -> str:
+    return key.rsplit("/", 1)[-1] + ".wav"
+
+def synthesize_to_output(text: str, lang: str, voice: str, key: str, write_file: bool = True):
+    """Runs on the pool: cache lookup, synthesis on a miss, then the served file (unless streamed)"""
+    def compute():
+        count("synthesized")
+        return synthesize_audio(text, lang, voice)
+    audio = content_cache.get_or_compute("tts", (text, lang, voice), compute)
+    path = outputs.write(output_filename(key), audio) if write_file else None
+    return audio, path
+
+async def synthesize_once(text: str, lang: str, voice: str, write_file: bool = True):
+    """(audio, path) for the text, joining an in-flight synthesis of the same text if there is one
+
+    path is None when write_file is False (the audio is streamed, no file is served).
+    """
+    count("requests")
+    key = cache_key("tts", text, lang, voice)
+    loop = asyncio.get_running_loop()
+    task = inflight.get(key)
+    if task is not None:
+        count("deduplicated")
+    else:
+        if len(inflight) >= TTS_MAX_PENDING:
+            count("rejected")
+            raise HTTPException(status_code=503, detail="TTS queue is full, retry later",
+                                headers={"Retry-After": "1"})
+        task = asyncio.ensure_future(loop.run_in_executor(
+            synth_executor, synthesize_to_output, text, lang, voice, key, write_file))
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    # Shielded so one client disconnecting doesn't cancel the work for the others
+    audio, path = await asyncio.shield(task)
+    if write_file and path is None:
+        # Joined a streamed synthesis, which skipped the file
+        path = await loop.run_in_executor(synth_executor, outputs.write, output_filename(key), audio)
+    return audio, path
+
+@app.post("/synthesize", response_model=TtsResponse)
+async def synthesize(req: TtsRequest):
+    voice = req.voice or "default"
+    audio, path = await synthesize_once(req.text, req.lang, voice, write_file=not req.stream)
+    if req.stream:
+        return StreamingResponse(
+            iter_chunks(audio),
+            media_type="audio/wav",
+            headers={"Content-Length": str(len(audio))},
+        )
+    return TtsResponse(audio_path=path)
+
+@app.post("/synthesize/batch", response_model=BatchResponse)
+async def synthesize_batch(req: BatchRequest):
+    """All of a job's segments in one request; items are synthesized concurrently on the pool"""
+    if len(req.items) > TTS_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {TTS_BATCH_MAX_ITEMS} items per batch")
+    voice = req.voice or "default"
+    # Keep only a few of the batch's items in flight, so one big job can't fill the queue for everyone
+    gate = asyncio.Semaphore(max(1, 2 * TTS_WORKERS))
+
+    async def one(index: int, item: BatchItem):
+        async with gate:
+            audio, path = await synthesize_once(item.text, req.lang, voice)
+        return {"index": index, "id": item.id, "filename": os.path.basename(path), "audio_path": path,
+                "bytes": len(audio)}
+
+    tasks = [asyncio.ensure_future(one(i, item)) for i, item in enumerate(req.items)]
+    if not req.stream:
+        try:
+            return BatchResponse(results=await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def ndjson():
+        # Completion order; "index" ties each line back to its item
+        pending = {task: i for i, task in enumerate(tasks)}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        line = {"type": "result", **task.result()}
+                    except HTTPException as e:
+                        line = {"type": "error", "index": index, "detail": e.detail}
+                    except Exception as e:
+                        line = {"type": "error", "index": index, "detail": str(e)}
+                    yield json.dumps(line) + "\n"
+            yield json.dumps({"type": "done", "items": len(tasks)}) + "\n"
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.get("/audio/{filename}")
+async def get_audio(filename: str):
+    path = outputs.touch(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    return FileResponse(path, media_type="audio/wav")
+
+@app.on_event("startup")
+async def startup():
+    outputs.clear_stale_temp()
+
+@app.on_event("shutdown")
+async def shutdown():
+    synth_executor.shutdown(wait=False)
+
+def synthesis_stats():
+    with stats_lock:
+        return dict(stats)
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "workers": TTS_WORKERS,
+        "inflight": len(inflight),
+        "synthesis": synthesis_stats(),
+        "output": outputs.stats(),
+    }
@@ -0,0 +1,107 @@
+"""
+Size-capped directory of synthesized files served by /audio/{filename}.
+
+Files are named after the content cache key, so the same text/lang/voice
+always maps to the same file and repeated requests don't add new ones.
+When the directory grows past its cap, the least recently used files
+(by mtime, which is refreshed on every write and read) are removed.
+"""
+import os
+import time
+import tempfile
+import threading
+from typing import Optional
+
+
+class OutputDir:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.approx_size: Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, filename: str) -> Optional[str]:
+        """Absolute path for a served filename; None for anything that isn't a plain name"""
+        if not filename or os.path.basename(filename) != filename or filename.startswith("."):
+            return None
+        return os.path.join(self.root, filename)
+
+    def write(self, filename: str, data: bytes) -> str:
+        path = self.path(filename)
+        if os.path.exists(path):
+            os.utime(path, None)
+            return path
+        # Write then rename so a concurrent reader never sees a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self.lock:
+            if self.approx_size is None:
+                self.approx_size = self._scan_size()
+            else:
+                self.approx_size += len(data)
+            if self.approx_size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def touch(self, filename: str) -> Optional[str]:
+        """Mark a file as used; returns its path, or None if it has been evicted"""
+        path = self.path(filename)
+        if path is None:
+            return None
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _files(self):
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self, keep: str):
+        # Caller holds self.lock. Trim to 90% so we don't rescan on every write.
+        target = int(self.max_bytes * 0.9)
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self.approx_size = total
+
+    def stats(self):
+        with self.lock:
+            if self.approx_size is None:
+                self.approx_size = self._scan_size()
+            return {"bytes": self.approx_size, "maxBytes": self.max_bytes}
+
+    def clear_stale_temp(self, max_age_seconds: float = 3600):
+        """Remove .tmp files left by a crash mid-write"""
+        now = time.time()
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") and entry.name.endswith(".tmp"):
+                    try:
+                        if entry.stat().st_mtime + max_age_seconds < now:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass